@@ -0,0 +1,275 @@
+# alertas.py
+# Registro de avisos de vencimiento ya enviados (tabla ALERTAS_ENVIADAS, ver
+# sql/alertas_enviadas.sql). Una fila por (licencia, tipo de alerta, umbral,
+# FECHA_FIN): cada licencia recibe un aviso al entrar en cada umbral de días
+# (ALERTA_UMBRALES_DIAS) y vuelve a recibirlos si se renueva (cambia FECHA_FIN).
+# Los próximos mantenimientos usan el mismo registro, con 'MP-<ID_OPERACION>'
+# como ID y PROX_MANTENIMIENTO como fecha.
+# La verificación toma los vencimientos de la ventana, con cliente y correo, del
+# índice en memoria (indice_vencimientos.py) y los reclama en el registro: el
+# INSERT rechaza por clave primaria los ya avisados, que se cuentan como omitidos.
+# La fila se inserta como PENDIENTE antes de encolar el correo (así dos
+# verificaciones a la vez no avisan dos veces), pasa a ENVIADO cuando el hilo de
+# envío confirma el correo y se borra si termina fallido. La cola de correo está
+# en memoria: un PENDIENTE que supera ALERTA_PENDIENTE_MINUTOS sin confirmarse
+# (el proceso se reinició antes del envío) se vuelve a reclamar.
+import logging
+import threading
+from datetime import datetime, timedelta
+import oracledb
+from config import Config
+from db import conexion
+from indice_vencimientos import licencias_entre, mantenimientos_entre
+from correo_salida import encolar, mensaje_aviso
+from correos import alertar_cliente
+
+logger = logging.getLogger(__name__)
+
+ORA_TABLA_NO_EXISTE = 942
+ORA_COLUMNA_NO_EXISTE = 904
+ORA_CLAVE_DUPLICADA = 1
+
+ALERTA_VENCIMIENTO = 'VENCIMIENTO_LICENCIA'
+ALERTA_MANTENIMIENTO = 'PROX_MANTENIMIENTO'
+# Umbral de las licencias que aún no entran en ninguno de los configurados
+SIN_UMBRAL = -1
+
+_lock = threading.Lock()
+_disponible = None  # None: aún no comprobado
+
+
+def _codigo_error(e):
+    error = e.args[0] if e.args else None
+    return getattr(error, 'code', None)
+
+def disponible(cursor):
+    """True si existe ALERTAS_ENVIADAS con ESTADO (se comprueba una vez por proceso)."""
+    global _disponible
+    if _disponible is None:
+        with _lock:
+            if _disponible is None:
+                try:
+                    cursor.execute("SELECT ESTADO FROM ALERTAS_ENVIADAS WHERE ROWNUM = 1")
+                    cursor.fetchall()
+                    _disponible = True
+                except oracledb.DatabaseError as e:
+                    if _codigo_error(e) not in (ORA_TABLA_NO_EXISTE, ORA_COLUMNA_NO_EXISTE):
+                        raise
+                    logger.warning("ALERTAS_ENVIADAS no existe o le falta ESTADO (ver sql/alertas_enviadas.sql); "
+                                   "los avisos de vencimiento se enviarán en cada verificación.")
+                    _disponible = False
+    return _disponible
+
+
+def _umbrales():
+    return sorted(set(Config.ALERTA_UMBRALES_DIAS))
+
+def umbral(dias_restantes):
+    """Menor umbral configurado que alcanza a `dias_restantes`, o SIN_UMBRAL."""
+    for dias in _umbrales():
+        if dias_restantes <= dias:
+            return dias
+    return SIN_UMBRAL
+
+def _dia(fecha):
+    return datetime(fecha.year, fecha.month, fecha.day)
+
+
+def reclamar(cursor, alertas, forzar=False, tipo_alerta=ALERTA_VENCIMIENTO):
+    """
+    Inserta en el registro, como PENDIENTE, las alertas [{id_licencia, umbral,
+    fecha_fin, correo}] y devuelve los índices de las que quedaron a nombre de
+    esta llamada (las demás ya estaban registradas). Antes borra las que siguen
+    PENDIENTE tras ALERTA_PENDIENTE_MINUTOS (su correo se perdió), o todas las
+    existentes con forzar=True. No confirma.
+    """
+    if not alertas:
+        return set()
+    params = [{'id_licencia': a['id_licencia'], 'tipo': tipo_alerta, 'umbral': a['umbral'],
+               'fecha_fin': a['fecha_fin'], 'correo': a['correo']} for a in alertas]
+    claves = [{k: p[k] for k in ('id_licencia', 'tipo', 'umbral', 'fecha_fin')} for p in params]
+    if forzar:
+        cursor.executemany("""
+            DELETE FROM ALERTAS_ENVIADAS
+            WHERE ID_LICENCIA = :id_licencia AND TIPO_ALERTA = :tipo
+              AND DIAS_UMBRAL = :umbral AND FECHA_FIN = TRUNC(:fecha_fin)
+        """, claves)
+    else:
+        cursor.executemany("""
+            DELETE FROM ALERTAS_ENVIADAS
+            WHERE ID_LICENCIA = :id_licencia AND TIPO_ALERTA = :tipo
+              AND DIAS_UMBRAL = :umbral AND FECHA_FIN = TRUNC(:fecha_fin)
+              AND ESTADO = 'PENDIENTE' AND FECHA_ENVIO < SYSDATE - :minutos / 1440
+        """, [dict(c, minutos=Config.ALERTA_PENDIENTE_MINUTOS) for c in claves])
+    cursor.executemany("""
+        INSERT INTO ALERTAS_ENVIADAS (ID_LICENCIA, TIPO_ALERTA, DIAS_UMBRAL, FECHA_FIN, CORREO, FECHA_ENVIO, ESTADO)
+        VALUES (:id_licencia, :tipo, :umbral, TRUNC(:fecha_fin), :correo, SYSDATE, 'PENDIENTE')
+    """, params, batcherrors=True)
+    repetidas = set()
+    for error in cursor.getbatcherrors():
+        if error.code != ORA_CLAVE_DUPLICADA:
+            raise oracledb.DatabaseError(error)
+        repetidas.add(error.offset)
+    return {i for i in range(len(alertas)) if i not in repetidas}
+
+def enviada_el(cursor, id_licencia, dias_umbral, fecha_fin, tipo_alerta=ALERTA_VENCIMIENTO):
+    """
+    (FECHA_ENVIO, ESTADO) registrados para la alerta, o None. Con ESTADO
+    PENDIENTE la fecha es la del reclamo: el correo aún está en cola.
+    """
+    cursor.execute("""
+        SELECT FECHA_ENVIO, ESTADO FROM ALERTAS_ENVIADAS
+        WHERE ID_LICENCIA = :id_licencia AND TIPO_ALERTA = :tipo
+          AND DIAS_UMBRAL = :umbral AND FECHA_FIN = TRUNC(:fecha_fin)
+    """, id_licencia=id_licencia, tipo=tipo_alerta, umbral=dias_umbral, fecha_fin=fecha_fin)
+    fila = cursor.fetchone()
+    return tuple(fila) if fila else None
+
+def _clave_referencia(referencia):
+    tipo_alerta, id_licencia, dias_umbral, fecha_fin = referencia
+    return {'id_licencia': id_licencia, 'tipo': tipo_alerta, 'umbral': dias_umbral, 'fecha_fin': fecha_fin}
+
+def marcar_enviada(referencia):
+    """
+    Pasa una alerta del registro a ENVIADO (el servidor SMTP aceptó su correo).
+    Corre en el hilo de envío.
+    """
+    if not _disponible:
+        return
+    with conexion(propia=True) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE ALERTAS_ENVIADAS SET ESTADO = 'ENVIADO', FECHA_ENVIO = SYSDATE
+                WHERE ID_LICENCIA = :id_licencia AND TIPO_ALERTA = :tipo
+                  AND DIAS_UMBRAL = :umbral AND FECHA_FIN = TRUNC(:fecha_fin)
+            """, _clave_referencia(referencia))
+            conn.commit()
+        finally:
+            cursor.close()
+
+def descartar(referencia):
+    """
+    Borra una alerta del registro (su correo terminó fallido) para que la
+    próxima verificación la vuelva a intentar. Corre en el hilo de envío.
+    """
+    if not _disponible:
+        return
+    with conexion(propia=True) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                DELETE FROM ALERTAS_ENVIADAS
+                WHERE ID_LICENCIA = :id_licencia AND TIPO_ALERTA = :tipo
+                  AND DIAS_UMBRAL = :umbral AND FECHA_FIN = TRUNC(:fecha_fin)
+            """, _clave_referencia(referencia))
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+def encolar_avisos(alertas):
+    """
+    Encola el aviso de cada alerta [{id_licencia, umbral, fecha_fin, correo,
+    cliente, tipo_licencia, dias_restantes}]; al enviarse queda como ENVIADO en
+    el registro y, si falla, se descarta de él.
+    Devuelve (id_trabajo, [id_mensaje, ...]).
+    """
+    return encolar([
+        (a['correo'],) + mensaje_aviso(a['cliente'], a['tipo_licencia'], a['fecha_fin'].strftime('%d/%m/%Y'),
+                                       a['dias_restantes'])
+        + ((ALERTA_VENCIMIENTO, a['id_licencia'], a['umbral'], a['fecha_fin']),)
+        for a in alertas
+    ], al_fallar=descartar, al_enviar=marcar_enviada)
+
+def _encolar_mantenimientos(alertas):
+    return alertar_cliente([
+        (a['correo'], a['cliente'], a['fecha_fin'], a['dias_restantes'],
+         (ALERTA_MANTENIMIENTO, a['id_licencia'], a['umbral'], a['fecha_fin']))
+        for a in alertas
+    ], al_fallar=descartar, al_enviar=marcar_enviada)
+
+def _pendientes(alertas, tipo_alerta, forzar):
+    """(alertas reclamadas, omitidas, registro disponible) de los candidatos."""
+    omitidas = 0
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            con_registro = disponible(cursor)
+            if con_registro and alertas:
+                reclamadas = reclamar(cursor, alertas, forzar, tipo_alerta)
+                conn.commit()
+                omitidas = len(alertas) - len(reclamadas)
+                alertas = [a for i, a in enumerate(alertas) if i in reclamadas]
+        finally:
+            cursor.close()
+    return alertas, omitidas, con_registro
+
+def _candidata(id_alerta, descripcion, entrada, hoy):
+    fecha_fin = _dia(entrada['fecha'])
+    dias_restantes = (fecha_fin - hoy).days
+    return {
+        'id_licencia': id_alerta, 'tipo_licencia': descripcion, 'fecha_fin': fecha_fin,
+        'dias_restantes': dias_restantes, 'umbral': umbral(dias_restantes), 'correo': entrada['correo'],
+        'cliente': f"{entrada['nombre']} {entrada['apellido']}"
+    }
+
+def verificar_vencimientos(dias, forzar=False):
+    """
+    Avisa a los clientes de las licencias que vencen en los próximos `dias`
+    días y que aún no fueron avisadas en su umbral actual (todas con
+    forzar=True). Devuelve un informe con las enviadas (encoladas) y la
+    cantidad de omitidas por estar ya en el registro.
+    """
+    ahora = datetime.now()
+    hoy = _dia(ahora)
+    candidatas = [_candidata(e['id_licencia'], e['tipo'], e, hoy)
+                  for e in licencias_entre(ahora, ahora + timedelta(days=dias)) if e['correo']]
+    alertas, omitidas, con_registro = _pendientes(candidatas, ALERTA_VENCIMIENTO, forzar)
+    id_trabajo, ids = encolar_avisos(alertas)
+    return {
+        'trabajo': id_trabajo,
+        'enviadas': len(ids),
+        'omitidas': omitidas,
+        'registroDisponible': con_registro,
+        'licencias': [{
+            'idLicencia': a['id_licencia'],
+            'cliente': a['cliente'],
+            'correo': a['correo'],
+            'tipoLicencia': a['tipo_licencia'],
+            'fechaVencimiento': a['fecha_fin'].strftime('%d/%m/%Y'),
+            'diasRestantes': a['dias_restantes'],
+            'umbral': a['umbral'],
+            'idMensaje': id_mensaje
+        } for a, id_mensaje in zip(alertas, ids)]
+    }
+
+def verificar_mantenimientos(dias, forzar=False):
+    """
+    Recuerda a los clientes los mantenimientos programados (PROX_MANTENIMIENTO)
+    en los próximos `dias` días, una vez por umbral. Mismo informe que
+    verificar_vencimientos(), con 'mantenimientos' en lugar de 'licencias'.
+    """
+    ahora = datetime.now()
+    hoy = _dia(ahora)
+    candidatas = [_candidata(f"MP-{e['id_operacion']}", e['tipo_mantenimiento'], e, hoy)
+                  for e in mantenimientos_entre(hoy, ahora + timedelta(days=dias))
+                  if e['correo'] and e['tipo_operacion'] == 'MANTENIMIENTO']
+    alertas, omitidas, con_registro = _pendientes(candidatas, ALERTA_MANTENIMIENTO, forzar)
+    id_trabajo, ids = _encolar_mantenimientos(alertas)
+    return {
+        'trabajo': id_trabajo,
+        'enviadas': len(ids),
+        'omitidas': omitidas,
+        'registroDisponible': con_registro,
+        'mantenimientos': [{
+            'idOperacion': int(a['id_licencia'][len('MP-'):]),
+            'cliente': a['cliente'],
+            'correo': a['correo'],
+            'tipoMantenimiento': a['tipo_licencia'],
+            'fechaMantenimiento': a['fecha_fin'].strftime('%d/%m/%Y'),
+            'diasRestantes': a['dias_restantes'],
+            'umbral': a['umbral'],
+            'idMensaje': id_mensaje
+        } for a, id_mensaje in zip(alertas, ids)]
+    }
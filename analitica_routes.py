@@ -0,0 +1,260 @@
+# analitica_routes.py
+# Análisis de ventas e ingresos sobre cualquier rango:
+#   GET /api/ingresos/serie?desde=&hasta=&granularidad=dia|semana|mes|anio&agrupar=tipo|cliente
+#     La agregación se hace en SQL con TRUNC(fecha, formato); los periodos sin
+#     operaciones se completan con 0 en Python.
+#   GET /api/licencias/ventas?desde=&hasta=&por_cliente=1
+#     Cantidad, ingresos y porcentaje de ventas por tipo de licencia (todos los
+#     de licencias.TIPOS_LICENCIA) en una sola consulta.
+# Los resultados se guardan en caché por combinación de parámetros (cache_consultas.py).
+from datetime import datetime, timedelta
+from flask import jsonify, request, current_app
+from db import conexion
+from cache_consultas import obtener
+from periodos import Periodo, periodo_pedido, filtro_periodo, sumar_meses, etiqueta_mes, PeriodoInvalido
+from resumen_mensual import origen_operaciones
+from licencias import TIPOS_LICENCIA
+
+# Granularidad -> formato de TRUNC en Oracle (IW: semana ISO, empieza el lunes)
+GRANULARIDADES = {'dia': 'DD', 'semana': 'IW', 'mes': 'MM', 'anio': 'YYYY'}
+AGRUPACIONES = ('tipo', 'cliente')
+PUNTOS_DEFECTO = 12  # periodos devueltos si no se indica ?desde
+MAX_PUNTOS = 1000
+
+TABLAS_SERIE = ['OPERACIONES', 'CLIENTES']
+TIPOS_INGRESO = ('VENTA', 'MANTENIMIENTO', 'SERVICIO')
+TABLAS_LICENCIAS = ['VENTAS', 'OPERACIONES', 'CLIENTES'] + [tipo['tabla'] for tipo in TIPOS_LICENCIA.values()]
+
+
+def _truncar(fecha, granularidad):
+    """Inicio del periodo que contiene `fecha`, igual que TRUNC en Oracle."""
+    fecha = datetime(fecha.year, fecha.month, fecha.day)
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    if granularidad == 'anio':
+        return fecha.replace(month=1, day=1)
+    return fecha
+
+def _avanzar(fecha, granularidad, n=1):
+    if granularidad == 'dia':
+        return fecha + timedelta(days=n)
+    if granularidad == 'semana':
+        return fecha + timedelta(weeks=n)
+    return sumar_meses(fecha, n * (12 if granularidad == 'anio' else 1))
+
+def rango_serie(periodo, granularidad):
+    """
+    (inicio, fin) concretos de la serie: los extremos que falten se completan
+    con los últimos PUNTOS_DEFECTO periodos hasta el actual.
+    """
+    fin = periodo.fin or _avanzar(_truncar(datetime.now(), granularidad), granularidad)
+    inicio = periodo.inicio or _avanzar(_truncar(fin - timedelta(days=1), granularidad),
+                                        granularidad, -(PUNTOS_DEFECTO - 1))
+    if fin <= inicio:
+        raise PeriodoInvalido("El rango de fechas está vacío")
+    return inicio, fin
+
+def _periodos(inicio, fin, granularidad):
+    periodos = []
+    actual = _truncar(inicio, granularidad)
+    while actual < fin:
+        periodos.append(actual)
+        if len(periodos) > MAX_PUNTOS:
+            raise PeriodoInvalido(f"La serie supera los {MAX_PUNTOS} puntos: use un rango menor "
+                                  "o una granularidad mayor")
+        actual = _avanzar(actual, granularidad)
+    return periodos
+
+
+def _consultar_serie(inicio, fin, granularidad, agrupar, periodos):
+    periodo = Periodo(inicio, fin)
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            origen, columna_fecha = origen_operaciones(cursor, periodo,
+                                                       diario=granularidad in ('dia', 'semana'))
+            condicion, params = filtro_periodo(f'o.{columna_fecha}', periodo)
+            if agrupar == 'tipo':
+                clave, nombre, join = "UPPER(o.TIPO_OPERACION)", "NULL", ""
+            elif agrupar == 'cliente':
+                clave = "o.ID_CLIENTE"
+                nombre = "MAX(c.NOMBRE || ' ' || c.APELLIDO)"
+                join = "LEFT JOIN CLIENTES c ON c.ID_CLIENTE = o.ID_CLIENTE"
+            else:
+                clave, nombre, join = "NULL", "NULL", ""
+            truncado = f"TRUNC(o.{columna_fecha}, '{GRANULARIDADES[granularidad]}')"
+            cursor.execute(f"""
+                SELECT {truncado}, {clave}, {nombre}, SUM(o.INGRESO), SUM(o.EGRESO)
+                FROM {origen} o
+                {join}
+                WHERE {condicion}
+                GROUP BY {truncado}, {clave}
+            """, params)
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    # Relleno de huecos: cada fila va directo a su posición; lo demás queda en 0
+    posicion = {p: i for i, p in enumerate(periodos)}
+    series = {}
+    for inicio_periodo, clave, nombre, ingreso, egreso in filas:
+        i = posicion.get(inicio_periodo)
+        if i is None:
+            continue
+        serie = series.get(clave)
+        if serie is None:
+            serie = series[clave] = {'clave': clave, 'nombre': nombre,
+                                     'ingresos': [0.0] * len(periodos), 'egresos': [0.0] * len(periodos)}
+        serie['ingresos'][i] = float(ingreso) if ingreso is not None else 0.0
+        serie['egresos'][i] = float(egreso) if egreso is not None else 0.0
+    if not agrupar and not series:
+        series[None] = {'clave': None, 'nombre': None,
+                        'ingresos': [0.0] * len(periodos), 'egresos': [0.0] * len(periodos)}
+    return {
+        'granularidad': granularidad,
+        'agrupar': agrupar,
+        'desde': inicio.date().isoformat(),
+        'hasta': (fin - timedelta(days=1)).date().isoformat(),
+        'periodos': [p.date().isoformat() for p in periodos],
+        'series': sorted(series.values(), key=lambda s: str(s['clave']))
+    }
+
+def serie_ingresos(inicio, fin, granularidad='mes', agrupar=None):
+    """
+    Serie de ingresos/egresos de OPERACIONES en [inicio, fin), desde la caché si
+    sigue vigente. Devuelve (datos, generado, edad_segundos).
+    """
+    if granularidad not in GRANULARIDADES:
+        raise PeriodoInvalido(f"Granularidad no válida: use {', '.join(GRANULARIDADES)}")
+    if agrupar is not None and agrupar not in AGRUPACIONES:
+        raise PeriodoInvalido(f"Agrupación no válida: use {', '.join(AGRUPACIONES)}")
+    periodos = _periodos(inicio, fin, granularidad)
+    return obtener(('serie', inicio, fin, granularidad, agrupar), TABLAS_SERIE,
+                   current_app.config['ANALITICA_TTL'],
+                   lambda: _consultar_serie(inicio, fin, granularidad, agrupar, periodos))
+
+def ingresos_por_tipo(inicio=None, fin=None):
+    """
+    Ingresos mensuales por tipo de operación en [inicio, fin) (por defecto el
+    mes actual y los 3 anteriores), en el formato del gráfico del dashboard:
+    {meses, ingresos: {tipo: [...]}}. Sale de la serie mensual, así que los
+    meses sin operaciones aparecen con 0.
+    """
+    if inicio is None or fin is None:
+        fin = _avanzar(_truncar(datetime.now(), 'mes'), 'mes')
+        inicio = _avanzar(fin, 'mes', -4)
+    serie, _, _ = serie_ingresos(inicio, fin, 'mes', 'tipo')
+    vacia = [0.0] * len(serie['periodos'])
+    ingresos = {s['clave']: s['ingresos'] for s in serie['series']}
+    return {
+        'meses': [etiqueta_mes(datetime.fromisoformat(p)) for p in serie['periodos']],
+        'ingresos': {tipo: ingresos.get(tipo, vacia) for tipo in TIPOS_INGRESO}
+    }
+
+
+def _sql_ventas_licencias(condicion, por_cliente):
+    # Todas las tablas de licencias como una sola (prefijo, id) para unirlas a VENTAS una vez
+    licencias = "\n                UNION ALL ".join(
+        f"SELECT '{prefijo}' AS PREFIJO, ID_LICENCIA FROM {tipo['tabla']}"
+        for prefijo, tipo in TIPOS_LICENCIA.items())
+    # (): total de ventas del periodo, con o sin licencia; (tipo) y opcionalmente (tipo, cliente)
+    conjuntos = "(), (l.PREFIJO)" + (", (l.PREFIJO, o.ID_CLIENTE)" if por_cliente else "")
+    return f"""
+        SELECT l.PREFIJO, o.ID_CLIENTE, MAX(c.NOMBRE || ' ' || c.APELLIDO) AS CLIENTE,
+               GROUPING(l.PREFIJO) AS SIN_TIPO, GROUPING(o.ID_CLIENTE) AS SIN_CLIENTE,
+               COUNT(*) AS VENTAS, SUM(o.INGRESO) AS INGRESOS
+        FROM VENTAS v
+        JOIN OPERACIONES o ON o.ID_OPERACION = v.ID_OPERACION
+        LEFT JOIN (
+                {licencias}
+            ) l ON l.ID_LICENCIA = v.ID_LICENCIA
+        LEFT JOIN CLIENTES c ON c.ID_CLIENTE = o.ID_CLIENTE
+        WHERE {condicion}
+        GROUP BY GROUPING SETS ({conjuntos})
+    """
+
+def _consultar_ventas_licencias(periodo, por_cliente):
+    condicion, params = filtro_periodo('o.FECHA', periodo)
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_sql_ventas_licencias(condicion, por_cliente), params)
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    total, por_tipo, clientes = 0, {}, []
+    for prefijo, id_cliente, cliente, sin_tipo, sin_cliente, ventas, ingresos in filas:
+        ingresos = float(ingresos) if ingresos is not None else 0.0
+        if sin_tipo:
+            total = ventas
+        elif prefijo is None:
+            continue  # ventas sin licencia: solo cuentan en el total
+        elif sin_cliente:
+            por_tipo[prefijo] = (ventas, ingresos)
+        else:
+            clientes.append({'id_cliente': id_cliente, 'cliente': cliente,
+                             'tipo': TIPOS_LICENCIA[prefijo]['nombre'], 'cantidad': ventas, 'ingresos': ingresos})
+    tipos = []
+    for prefijo, tipo in TIPOS_LICENCIA.items():
+        cantidad, ingresos = por_tipo.get(prefijo, (0, 0.0))
+        tipos.append({
+            'prefijo': prefijo,
+            'clave': tipo['clave'],
+            'nombre': tipo['nombre'],
+            'cantidad': cantidad,
+            'ingresos': ingresos,
+            'porcentaje': round((cantidad / total) * 100, 2) if total > 0 else 0.0
+        })
+    datos = {'totalVentas': total, 'tipos': tipos}
+    if por_cliente:
+        datos['porCliente'] = sorted(clientes, key=lambda c: (-c['ingresos'], str(c['cliente'])))
+    return datos
+
+def ventas_licencias(periodo, por_cliente=False):
+    """
+    Ventas por tipo de licencia en el periodo: total de ventas, y por cada tipo
+    cantidad, ingresos y porcentaje sobre el total (opcionalmente también por
+    cliente). Desde la caché si sigue vigente; devuelve (datos, generado, edad).
+    """
+    return obtener(('licencias', periodo, por_cliente), TABLAS_LICENCIAS,
+                   current_app.config['ANALITICA_TTL'],
+                   lambda: _consultar_ventas_licencias(periodo, por_cliente))
+
+
+def _respuesta_cacheada(datos, generado, edad):
+    respuesta = jsonify(dict(datos, generado=generado.isoformat(timespec='seconds'),
+                             cacheEdadSegundos=round(edad, 1)))
+    respuesta.headers['Age'] = str(int(edad))
+    return respuesta
+
+def register_analitica_routes(app):
+
+    @app.route('/api/ingresos/serie', methods=['GET'])
+    def get_serie_ingresos():
+        try:
+            granularidad = request.args.get('granularidad', 'mes')
+            if granularidad not in GRANULARIDADES:
+                raise PeriodoInvalido(f"Granularidad no válida: use {', '.join(GRANULARIDADES)}")
+            inicio, fin = rango_serie(periodo_pedido(Periodo(None, None)), granularidad)
+            datos, generado, edad = serie_ingresos(inicio, fin, granularidad, request.args.get('agrupar') or None)
+            return _respuesta_cacheada(datos, generado, edad)
+        except PeriodoInvalido as e:
+            return jsonify(error=str(e)), 400
+        except Exception as e:
+            current_app.logger.error(f"Error al generar la serie de ingresos: {str(e)}")
+            return jsonify(error=str(e)), 500
+
+    @app.route('/api/licencias/ventas', methods=['GET'])
+    def get_ventas_licencias():
+        try:
+            por_cliente = bool(request.args.get('por_cliente', default=0, type=int))
+            datos, generado, edad = ventas_licencias(periodo_pedido(), por_cliente)
+            return _respuesta_cacheada(datos, generado, edad)
+        except PeriodoInvalido as e:
+            return jsonify(error=str(e)), 400
+        except Exception as e:
+            current_app.logger.error(f"Error al calcular las ventas de licencias: {str(e)}")
+            return jsonify(error=str(e)), 500
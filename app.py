@@ -10,24 +10,39 @@ from flask_cors import CORS  # Agrega esta importación
 import oracledb  # <-- Mueve esta línea aquí, antes de usar oracledb
 import traceback # Útil para imprimir errores completos durante la depuración
 from routes.clientes import clientes_bp  # Importa el blueprint de clientes
-from db import init_oracle_pool, get_db  # Importa desde db.py
+from db import init_oracle_pool, get_db, conexion, liberar_db, ConexionNoDisponible  # Importa desde db.py
+import db
 import oracledb
 import traceback # Útil para imprimir errores completos durante la depuración
 from werkzeug.security import check_password_hash
 import jwt
 import datetime
 from datetime import datetime, timedelta, timezone
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import smtplib
 
 # Importar las rutas de mantenimientos
 from servicios_routes import register_servicios_routes  # Agregar esta línea
 
 from mantenimientos_routes import register_mantenimientos_routes  # Agregar esta línea
-from db_mirror import create_record, update_record, delete_record, get_mirror_path
+from dashboard_routes import register_dashboard_routes
+from analitica_routes import register_analitica_routes, rango_serie, ingresos_por_tipo, ventas_licencias
+from licencias import siguiente_id_licencia, reservar_ids, tipo_por_id, tipo_por_clave
+from cache_http import con_etag, init_cache_http
+from programador import init_programador, estado_programador
+from indice_vencimientos import init_indice_vencimientos, vencimientos_semana, status as vencimientos_status
+from correo_salida import init_correo, estado_trabajo, estado_mensaje, status as correo_status
+from alertas import (verificar_vencimientos, encolar_avisos, reclamar, enviada_el, umbral as umbral_alerta,
+                     disponible as registro_alertas_disponible)
+from resumen_mensual import actualizar_resumen, origen_operaciones, reconstruir_resumen
+from periodos import periodo_pedido, periodo_anterior, filtro_periodo, PeriodoInvalido
+from paginacion import parametros_pagina, consulta_paginada, cuerpo_pagina, CursorInvalido
+from streaming import quiere_stream, cursor_stream, respuesta_en_stream
+from serializacion import ProveedorJSON, fechas_iso, filas_como_dict, respuesta_filas
+from mirror_fallback import con_respaldo_mirror, leer_clientes_texto, leer_dispositivos, buscar_dispositivos
+from db_mirror import (create_record, create_records, update_record, delete_record, export_table, export_tables,
+                       refresh_table_incremental, MIRROR_DIFF_MAX_KEYS, status as mirror_status)
 import csv
 import os
+import time
 import logging
 logging.basicConfig(level=logging.INFO)
 
@@ -38,6 +53,15 @@ VENTAS_FIELDS = ["ID_OPERACION", "ID_LICENCIA"]
 ANTIVIRUS_FIELDS = ["ID_LICENCIA", "DETALLES", "FEC_INICIO", "FECHA_FIN", "FECHA_AVISO", "TIME_LICENCIA", "NOM_ANTIVIRUS", "USER_ANT"]
 MICROSOFT365_FIELDS = ["ID_LICENCIA", "DETALLES", "FEC_INICIO", "FECHA_FIN", "FECHA_AVISO", "EMAIL_CTACLIE", "PASSW_CTACLIE", "NORM_M365", "USER_M365", "PASS_M365"]
 WINDOWS_FIELDS = ["ID_LICENCIA", "DETALLES", "FEC_INICIO", "FECHA_FIN", "FECHA_AVISO", "TIME_LICENCIA", "SO_ACTIVADO", "KEY", "KEY_TIPO"]
+LICENCIA_FIELDS = {'ANTIVIRUS': ANTIVIRUS_FIELDS, 'MICROSOFT365': MICROSOFT365_FIELDS, 'WINDOWS': WINDOWS_FIELDS}
+# Registro por lote: columna de fecha o propia de cada tabla -> clave del JSON (las de las rutas registrar-*)
+COLUMNAS_FECHA_LICENCIA = {'FEC_INICIO': 'fechaInicio', 'FECHA_FIN': 'fechaFin', 'FECHA_AVISO': 'fechaAviso'}
+CAMPOS_LICENCIA_JSON = {
+    'ANTIVIRUS': {'TIME_LICENCIA': 'tiempoLicencia', 'NOM_ANTIVIRUS': 'nombreAntivirus', 'USER_ANT': 'userAntivirus'},
+    'MICROSOFT365': {'EMAIL_CTACLIE': 'emailCtacliente', 'PASSW_CTACLIE': 'passwCtacliente', 'NORM_M365': 'normM365',
+                     'USER_M365': 'userM365', 'PASS_M365': 'passM365'},
+    'WINDOWS': {'TIME_LICENCIA': 'tiempoLicencia', 'SO_ACTIVADO': 'soActivado', 'KEY': 'key', 'KEY_TIPO': 'keyTipo'},
+}
 
 # --- Inicialización del Cliente Oracle ---
 try:
@@ -54,10 +78,14 @@ except Exception as e_init:
     
 # --- Creación de la Aplicación Flask ---
 app = Flask(__name__)
+app.json = ProveedorJSON(app)  # jsonify con orjson si está instalado
 CORS(app)  # Habilita CORS para toda la app
 
 # Carga las variables de la CLASE Config en el objeto app.config
 app.config.from_object(Config)
+# Compresión gzip/brotli de las respuestas grandes (cache_http.py)
+init_cache_http(app)
+init_correo(app)
 
 # Registra el blueprint de clientes
 app.register_blueprint(clientes_bp, url_prefix='/clientes')
@@ -71,11 +99,22 @@ with app.app_context():
         import sys
         sys.exit(1)  # Detiene la app si el pool no se puede crear
 
+# Avisos de vencimiento y de mantenimiento periódicos (un solo worker los ejecuta)
+init_programador(app)
+# Índice en memoria de vencimientos de licencias y mantenimientos
+init_indice_vencimientos(app)
+
 @app.teardown_appcontext
 def teardown_db(exception=None):
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    liberar_db()
+
+# Sin conexión del pool a tiempo fuera de una vista (p. ej. al leer la versión
+# del ETag en una ruta sin respaldo del mirror)
+@app.errorhandler(ConexionNoDisponible)
+def conexion_no_disponible(e):
+    app.logger.error(f"Sin conexión para {request.path}: {e}")
+    return jsonify({'error': str(e)}), 503
+
 # Ruta para ver la estructura de una tabla
 @app.route('/api/table/<table_name>/structure')
 def get_table_structure(table_name):
@@ -98,19 +137,22 @@ def get_table_structure(table_name):
 
 # Ruta para ver los datos de una tabla
 @app.route('/api/table/<table_name>/data')
+@con_etag(lambda table_name: [table_name.upper()])
 def get_table_data(table_name):
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM {table_name.upper()}")
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        results = []
-        for row in rows:
-            result = dict(zip(columns, map(str, row)))
-            results.append(result)
-        cursor.close()
-        return jsonify({"data": results})
+        if quiere_stream():
+            # La conexión de la petición se libera al terminar el stream
+            cursor = cursor_stream(get_db())
+            cursor.execute(f"SELECT * FROM {table_name.upper()}")
+            columnas = filas_como_dict(cursor, texto=True)
+            return respuesta_en_stream(cursor, prefijo='{"data":', sufijo='}', columnas=columnas)
+        with conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM {table_name.upper()}")
+            columnas = filas_como_dict(cursor, texto=True)
+            results = cursor.fetchall()
+            cursor.close()
+        return respuesta_filas(results, columnas, {"data": results})
     except Exception as e:
         app.logger.error(f"Error al obtener datos de tabla: {e}")
         return jsonify(error=str(e)), 500
@@ -204,19 +246,26 @@ def login():
         return jsonify(error="Ocurrió un error en el servidor"), 500
 # Rutas para el CRUD de clientes
 @app.route('/api/clientes', methods=['GET'])
+@con_respaldo_mirror(leer_clientes_texto, ['CLIENTES'], orden=[('ID_CLIENTE', 'ASC')])
+@con_etag(['CLIENTES'])
 def get_clientes():
     try:
+        pagina = parametros_pagina()
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM clientes")
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        results = []
-        for row in rows:
-            result = dict(zip(columns, map(str, row)))
-            results.append(result)
+        if pagina:
+            columnas, results, siguiente, total = consulta_paginada(
+                cursor, "SELECT * FROM clientes", [('ID_CLIENTE', 'ASC')], pagina, texto=True)
+        else:
+            cursor.execute("SELECT * FROM clientes")
+            columnas = filas_como_dict(cursor, texto=True)
+            results = cursor.fetchall()
         cursor.close()
-        return jsonify(results)
+        return respuesta_filas(results, columnas, cuerpo_pagina(results, siguiente, total) if pagina else None)
+    except CursorInvalido as e:
+        return jsonify(error=str(e)), 400
+    except ConexionNoDisponible:
+        raise  # Lo atiende con_respaldo_mirror
     except Exception as e:
         app.logger.error(f"Error al obtener clientes: {e}")
         return jsonify(error=str(e)), 500
@@ -285,15 +334,15 @@ def eliminar_cliente(id):
         return jsonify(error=str(e)), 500
 
 @app.route('/api/clientesDispositivos', methods=['GET'])
+@con_etag(['CLIENTES'])
 def get_clientes_dispositivos():
     """Obtener clientes para el módulo de dispositivos"""
     try:
         conn = get_db()
         cursor = conn.cursor()
         cursor.execute("SELECT ID_CLIENTE, NOMBRE, APELLIDO FROM CLIENTES ORDER BY NOMBRE, APELLIDO")
-        columns = [desc[0].lower() for desc in cursor.description]
-        rows = cursor.fetchall()
-        results = [dict(zip(columns, row)) for row in rows]
+        filas_como_dict(cursor, minusculas=True)
+        results = cursor.fetchall()
         cursor.close()
         return jsonify(results)
     except Exception as e:
@@ -301,11 +350,17 @@ def get_clientes_dispositivos():
         return jsonify({'error': str(e)}), 500
 
 
+def _tablas_licencias(tipo_licencia):
+    _, tipo = tipo_por_clave(tipo_licencia)
+    return ['VENTAS', 'OPERACIONES', 'CLIENTES'] + ([tipo['tabla']] if tipo else [])
+
 @app.route('/api/licencias/<tipo_licencia>', methods=['GET'])
+@con_etag(_tablas_licencias)
 def obtener_licencias_por_tipo(tipo_licencia):
     try:
         conn = get_db()
-        cursor = conn.cursor()
+        stream = quiere_stream()
+        cursor = cursor_stream(conn) if stream else conn.cursor()
 
         if tipo_licencia == 'antivirus':
             query = """
@@ -358,12 +413,8 @@ def obtener_licencias_por_tipo(tipo_licencia):
         else:
             return jsonify({'error': 'Tipo de licencia no válido'}), 400
 
-        cursor.execute(query)
-        resultados = cursor.fetchall()
-
-        licencias = []
-        for row in resultados:
-            licencia = {
+        def a_licencia(row):
+            return {
                 'idLicencia': row[0],
                 'fechaAdquisicion': row[1].isoformat() if row[1] else None,
                 'totalDispositivos': row[2] or 0,
@@ -373,7 +424,11 @@ def obtener_licencias_por_tipo(tipo_licencia):
                 'fechaVencimiento': row[6].isoformat() if row[6] else None,
                 'tipoLicencia': tipo_licencia
             }
-            licencias.append(licencia)
+
+        cursor.execute(query)
+        if stream:
+            return respuesta_en_stream(cursor, a_licencia)
+        licencias = [a_licencia(row) for row in cursor.fetchall()]
 
         cursor.close()
         return jsonify(licencias)
@@ -384,19 +439,6 @@ def obtener_licencias_por_tipo(tipo_licencia):
         return jsonify({'error': str(e)}), 500
 
 
-def generar_nuevo_id_licencia(prefijo, tabla):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT ID_LICENCIA FROM {tabla} WHERE ID_LICENCIA LIKE :prefijo ORDER BY ID_LICENCIA DESC", {'prefijo': f'{prefijo}%'} )
-    row = cursor.fetchone()
-    if row:
-        last_id = row[0]
-        last_num = int(last_id.split('-')[1])
-        next_num = last_num + 1
-    else:
-        next_num = 1
-    return f"{prefijo}{next_num:03d}"
-
 def parse_fecha(fecha_str):
     if not fecha_str:
         return None
@@ -412,7 +454,7 @@ def registrar_antivirus():
     try:
         data = request.json
         print("DEBUG registrar-antivirus data:", data)
-        id_licencia = generar_nuevo_id_licencia('A-', 'ANTIVIRUS')
+        id_licencia = siguiente_id_licencia('A-')
         detalles = data.get('detalles', '')
         fecha_inicio = parse_fecha(data.get('fechaInicio'))
         fecha_fin = parse_fecha(data.get('fechaFin'))
@@ -424,42 +466,43 @@ def registrar_antivirus():
         ingreso = data.get('ingreso', 0)
         egreso = data.get('egreso', 0)
 
-        conn = get_db()
-        cursor = conn.cursor()
-
-        # Validar que el cliente exista
-        cursor.execute("SELECT ID_CLIENTE FROM CLIENTES WHERE ID_CLIENTE = :id_cliente", {'id_cliente': id_cliente})
-        row = cursor.fetchone()
-        if not row:
-            print("DEBUG: Cliente no encontrado, id_cliente recibido:", id_cliente)
-            return jsonify({'error': 'Cliente no encontrado'}), 400
+        with conexion() as conn:
+            cursor = conn.cursor()
 
-        # 2. Insertar en OPERACIONES (ahora usando ingreso y egreso del frontend)
-        id_operacion_var = cursor.var(oracledb.NUMBER)
-        cursor.execute("""
-            INSERT INTO OPERACIONES (ID_CLIENTE, FECHA, TIPO_OPERACION, INGRESO, EGRESO)
-            VALUES (:id_cliente, TRUNC(SYSDATE), 'VENTA', :ingreso, :egreso)
-            RETURNING ID_OPERACION INTO :id_operacion
-        """, id_cliente=id_cliente, ingreso=ingreso, egreso=egreso, id_operacion=id_operacion_var)
-        id_operacion = int(id_operacion_var.getvalue()[0])
+            # Validar que el cliente exista
+            cursor.execute("SELECT ID_CLIENTE FROM CLIENTES WHERE ID_CLIENTE = :id_cliente", {'id_cliente': id_cliente})
+            row = cursor.fetchone()
+            if not row:
+                print("DEBUG: Cliente no encontrado, id_cliente recibido:", id_cliente)
+                return jsonify({'error': 'Cliente no encontrado'}), 400
 
-        # 3. Insertar en VENTAS
-        cursor.execute("""
-            INSERT INTO VENTAS (ID_OPERACION, ID_LICENCIA)
-            VALUES (:id_operacion, :id_licencia)
-        """, id_operacion=id_operacion, id_licencia=id_licencia)
+            # 2. Insertar en OPERACIONES (ahora usando ingreso y egreso del frontend)
+            id_operacion_var = cursor.var(oracledb.NUMBER)
+            cursor.execute("""
+                INSERT INTO OPERACIONES (ID_CLIENTE, FECHA, TIPO_OPERACION, INGRESO, EGRESO)
+                VALUES (:id_cliente, TRUNC(SYSDATE), 'VENTA', :ingreso, :egreso)
+                RETURNING ID_OPERACION INTO :id_operacion
+            """, id_cliente=id_cliente, ingreso=ingreso, egreso=egreso, id_operacion=id_operacion_var)
+            id_operacion = int(id_operacion_var.getvalue()[0])
+            actualizar_resumen(cursor, [id_operacion])
+
+            # 3. Insertar en VENTAS
+            cursor.execute("""
+                INSERT INTO VENTAS (ID_OPERACION, ID_LICENCIA)
+                VALUES (:id_operacion, :id_licencia)
+            """, id_operacion=id_operacion, id_licencia=id_licencia)
 
-        # 4. Insertar en ANTIVIRUS
-        cursor.execute("""
-            INSERT INTO ANTIVIRUS (
-                ID_LICENCIA, DETALLES, FEC_INICIO, FECHA_FIN, FECHA_AVISO, TIME_LICENCIA, NOM_ANTIVIRUS, USER_ANT
-            ) VALUES (
-                :id_licencia, :detalles, TO_DATE(:fecha_inicio, 'YYYY-MM-DD'), TO_DATE(:fecha_fin, 'YYYY-MM-DD'), TO_DATE(:fecha_aviso, 'YYYY-MM-DD'), :tiempo_licencia, :nombre_antivirus, :user_antivirus
-            )
-        """, id_licencia=id_licencia, detalles=detalles, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, fecha_aviso=fecha_aviso, tiempo_licencia=tiempo_licencia, nombre_antivirus=nombre_antivirus, user_antivirus=user_antivirus)
+            # 4. Insertar en ANTIVIRUS
+            cursor.execute("""
+                INSERT INTO ANTIVIRUS (
+                    ID_LICENCIA, DETALLES, FEC_INICIO, FECHA_FIN, FECHA_AVISO, TIME_LICENCIA, NOM_ANTIVIRUS, USER_ANT
+                ) VALUES (
+                    :id_licencia, :detalles, TO_DATE(:fecha_inicio, 'YYYY-MM-DD'), TO_DATE(:fecha_fin, 'YYYY-MM-DD'), TO_DATE(:fecha_aviso, 'YYYY-MM-DD'), :tiempo_licencia, :nombre_antivirus, :user_antivirus
+                )
+            """, id_licencia=id_licencia, detalles=detalles, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, fecha_aviso=fecha_aviso, tiempo_licencia=tiempo_licencia, nombre_antivirus=nombre_antivirus, user_antivirus=user_antivirus)
 
-        conn.commit()
-        cursor.close()
+            conn.commit()
+            cursor.close()
         # MIRROR: Crear en OPERACIONES, VENTAS y ANTIVIRUS
         create_record('OPERACIONES', {
             "ID_OPERACION": id_operacion,
@@ -494,7 +537,7 @@ def registrar_ofimatica():
     try:
         data = request.json
         print("DEBUG registrar-ofimatica data:", data)
-        id_licencia = generar_nuevo_id_licencia('M-', 'MICROSOFT365')
+        id_licencia = siguiente_id_licencia('M-')
 
         detalles = data.get('detalles', '')
         fecha_inicio = parse_fecha(data.get('fechaInicio'))
@@ -510,46 +553,47 @@ def registrar_ofimatica():
         ingreso = data.get('ingreso', 0)
         egreso = data.get('egreso', 0)
 
-        conn = get_db()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT ID_CLIENTE FROM CLIENTES WHERE ID_CLIENTE = :id_cliente", {'id_cliente': id_cliente})
-        row = cursor.fetchone()
-        if not row:
-            print("DEBUG: Cliente no encontrado, id_cliente recibido:", id_cliente)
-            return jsonify({'error': 'Cliente no encontrado'}), 400
+        with conexion() as conn:
+            cursor = conn.cursor()
 
-        id_operacion_var = cursor.var(oracledb.NUMBER)
-        cursor.execute("""
-            INSERT INTO OPERACIONES (ID_CLIENTE, FECHA, TIPO_OPERACION, INGRESO, EGRESO)
-            VALUES (:id_cliente, TRUNC(SYSDATE), 'VENTA', :ingreso, :egreso)
-            RETURNING ID_OPERACION INTO :id_operacion
-        """, id_cliente=id_cliente, ingreso=ingreso, egreso=egreso, id_operacion=id_operacion_var)
-        id_operacion = int(id_operacion_var.getvalue()[0])
-
-        cursor.execute("""
-            INSERT INTO VENTAS (ID_OPERACION, ID_LICENCIA)
-            VALUES (:id_operacion, :id_licencia)
-        """, id_operacion=id_operacion, id_licencia=id_licencia)
+            cursor.execute("SELECT ID_CLIENTE FROM CLIENTES WHERE ID_CLIENTE = :id_cliente", {'id_cliente': id_cliente})
+            row = cursor.fetchone()
+            if not row:
+                print("DEBUG: Cliente no encontrado, id_cliente recibido:", id_cliente)
+                return jsonify({'error': 'Cliente no encontrado'}), 400
 
-        try:
+            id_operacion_var = cursor.var(oracledb.NUMBER)
             cursor.execute("""
-                INSERT INTO MICROSOFT365 (
-                    ID_LICENCIA, DETALLES, FEC_INICIO, FECHA_FIN, FECHA_AVISO, EMAIL_CTACLIE, PASSW_CTACLIE, NORM_M365, USER_M365, PASS_M365
-                ) VALUES (
-                    :id_licencia, :detalles, TO_DATE(:fecha_inicio, 'YYYY-MM-DD'), TO_DATE(:fecha_fin, 'YYYY-MM-DD'), TO_DATE(:fecha_aviso, 'YYYY-MM-DD'), :email_ctacliente, :passw_ctacliente, :norma_m365, :user_m365, :pass_m365
-                )
-
-            """, id_licencia=id_licencia, detalles=detalles, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, fecha_aviso=fecha_aviso, email_ctacliente=email_ctacliente, passw_ctacliente=passw_ctacliente, norma_m365=norma_m365, user_m365=user_m365, pass_m365=pass_m365)
+                INSERT INTO OPERACIONES (ID_CLIENTE, FECHA, TIPO_OPERACION, INGRESO, EGRESO)
+                VALUES (:id_cliente, TRUNC(SYSDATE), 'VENTA', :ingreso, :egreso)
+                RETURNING ID_OPERACION INTO :id_operacion
+            """, id_cliente=id_cliente, ingreso=ingreso, egreso=egreso, id_operacion=id_operacion_var)
+            id_operacion = int(id_operacion_var.getvalue()[0])
+            actualizar_resumen(cursor, [id_operacion])
 
-        except Exception as e_inner:
-            app.logger.error(f"Error al insertar en MICROSOFT365: {e_inner}")
-            app.logger.error(traceback.format_exc())
+            cursor.execute("""
+                INSERT INTO VENTAS (ID_OPERACION, ID_LICENCIA)
+                VALUES (:id_operacion, :id_licencia)
+            """, id_operacion=id_operacion, id_licencia=id_licencia)
+
+            try:
+                cursor.execute("""
+                    INSERT INTO MICROSOFT365 (
+                        ID_LICENCIA, DETALLES, FEC_INICIO, FECHA_FIN, FECHA_AVISO, EMAIL_CTACLIE, PASSW_CTACLIE, NORM_M365, USER_M365, PASS_M365
+                    ) VALUES (
+                        :id_licencia, :detalles, TO_DATE(:fecha_inicio, 'YYYY-MM-DD'), TO_DATE(:fecha_fin, 'YYYY-MM-DD'), TO_DATE(:fecha_aviso, 'YYYY-MM-DD'), :email_ctacliente, :passw_ctacliente, :norma_m365, :user_m365, :pass_m365
+                    )
+
+                """, id_licencia=id_licencia, detalles=detalles, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, fecha_aviso=fecha_aviso, email_ctacliente=email_ctacliente, passw_ctacliente=passw_ctacliente, norma_m365=norma_m365, user_m365=user_m365, pass_m365=pass_m365)
+
+            except Exception as e_inner:
+                app.logger.error(f"Error al insertar en MICROSOFT365: {e_inner}")
+                app.logger.error(traceback.format_exc())
+                cursor.close()
+                return jsonify({'error': 'Error al insertar datos de Ofimática'}), 500
+
+            conn.commit()
             cursor.close()
-            return jsonify({'error': 'Error al insertar datos de Ofimática'}), 500
-
-        conn.commit()
-        cursor.close()
         # MIRROR: Crear en OPERACIONES, VENTAS y MICROSOFT365
         app.logger.info(f"[MICROSOFT365] Creando mirror para OPERACIONES con id_operacion: {id_operacion}")
         create_record('OPERACIONES', {
@@ -591,7 +635,7 @@ def registrar_sistema_operativo():
     try:
         data = request.json
         print("DEBUG registrar-sistema-operativo data:", data)
-        id_licencia = generar_nuevo_id_licencia('W-', 'WINDOWS')
+        id_licencia = siguiente_id_licencia('W-')
         
         # --- CAMPOS COMUNES ---
         detalles = data.get('detalles', '')
@@ -608,53 +652,54 @@ def registrar_sistema_operativo():
         key = data.get('key', '')
         key_tipo = data.get('keyTipo', '')
 
-        conn = get_db()
-        cursor = conn.cursor()
+        with conexion() as conn:
+            cursor = conn.cursor()
 
-        # 1. Validar que el cliente exista
-        cursor.execute("SELECT ID_CLIENTE FROM CLIENTES WHERE ID_CLIENTE = :id_cliente", {'id_cliente': id_cliente})
-        if not cursor.fetchone():
-            return jsonify({'error': 'Cliente no encontrado'}), 400
+            # 1. Validar que el cliente exista
+            cursor.execute("SELECT ID_CLIENTE FROM CLIENTES WHERE ID_CLIENTE = :id_cliente", {'id_cliente': id_cliente})
+            if not cursor.fetchone():
+                return jsonify({'error': 'Cliente no encontrado'}), 400
 
-        # 2. Insertar en OPERACIONES
-        id_operacion_var = cursor.var(oracledb.NUMBER)
-        cursor.execute("""
-            INSERT INTO OPERACIONES (ID_CLIENTE, TIPO_OPERACION, INGRESO, EGRESO)
-            VALUES (:id_cliente, 'VENTA', :ingreso, :egreso)
-            RETURNING ID_OPERACION INTO :id_operacion
-        """, id_cliente=id_cliente, ingreso=ingreso, egreso=egreso, id_operacion=id_operacion_var)
-        id_operacion = int(id_operacion_var.getvalue()[0])
-
-        # 3. Insertar en VENTAS
-        cursor.execute("""
-            INSERT INTO VENTAS (ID_OPERACION, ID_LICENCIA)
-            VALUES (:id_operacion, :id_licencia)
-        """, id_operacion=id_operacion, id_licencia=id_licencia)
+            # 2. Insertar en OPERACIONES
+            id_operacion_var = cursor.var(oracledb.NUMBER)
+            cursor.execute("""
+                INSERT INTO OPERACIONES (ID_CLIENTE, TIPO_OPERACION, INGRESO, EGRESO)
+                VALUES (:id_cliente, 'VENTA', :ingreso, :egreso)
+                RETURNING ID_OPERACION INTO :id_operacion
+            """, id_cliente=id_cliente, ingreso=ingreso, egreso=egreso, id_operacion=id_operacion_var)
+            id_operacion = int(id_operacion_var.getvalue()[0])
+            actualizar_resumen(cursor, [id_operacion])
+
+            # 3. Insertar en VENTAS
+            cursor.execute("""
+                INSERT INTO VENTAS (ID_OPERACION, ID_LICENCIA)
+                VALUES (:id_operacion, :id_licencia)
+            """, id_operacion=id_operacion, id_licencia=id_licencia)
 
-        # 4. Insertar en WINDOWS (CORREGIDO)
-        cursor.execute("""
-            INSERT INTO WINDOWS (
-                ID_LICENCIA, DETALLES, FEC_INICIO, FECHA_FIN, FECHA_AVISO, 
-                TIME_LICENCIA, SO_ACTIVADO, "KEY", KEY_TIPO
-            ) VALUES (
-                :id_licencia, :detalles, TO_DATE(:fec_inicio, 'YYYY-MM-DD'), 
-                TO_DATE(:fecha_fin, 'YYYY-MM-DD'), TO_DATE(:fecha_aviso, 'YYYY-MM-DD'),
-                :time_licencia, :so_activado, :key, :key_tipo
-            )
-        """, {
-            "id_licencia": id_licencia,
-            "detalles": detalles,
-            "fec_inicio": fecha_inicio,
-            "fecha_fin": fecha_fin,
-            "fecha_aviso": fecha_aviso,
-            "time_licencia": tiempo_licencia,
-            "so_activado": so_activado,
-            "key": key,
-            "key_tipo": key_tipo
-        })
+            # 4. Insertar en WINDOWS (CORREGIDO)
+            cursor.execute("""
+                INSERT INTO WINDOWS (
+                    ID_LICENCIA, DETALLES, FEC_INICIO, FECHA_FIN, FECHA_AVISO, 
+                    TIME_LICENCIA, SO_ACTIVADO, "KEY", KEY_TIPO
+                ) VALUES (
+                    :id_licencia, :detalles, TO_DATE(:fec_inicio, 'YYYY-MM-DD'), 
+                    TO_DATE(:fecha_fin, 'YYYY-MM-DD'), TO_DATE(:fecha_aviso, 'YYYY-MM-DD'),
+                    :time_licencia, :so_activado, :key, :key_tipo
+                )
+            """, {
+                "id_licencia": id_licencia,
+                "detalles": detalles,
+                "fec_inicio": fecha_inicio,
+                "fecha_fin": fecha_fin,
+                "fecha_aviso": fecha_aviso,
+                "time_licencia": tiempo_licencia,
+                "so_activado": so_activado,
+                "key": key,
+                "key_tipo": key_tipo
+            })
 
-        conn.commit()
-        cursor.close()
+            conn.commit()
+            cursor.close()
         # MIRROR: Crear en OPERACIONES, VENTAS y WINDOWS
         app.logger.info(f"[WINDOWS] Creando mirror para OPERACIONES con id_operacion: {id_operacion}")
         create_record('OPERACIONES', {
@@ -686,22 +731,31 @@ def registrar_sistema_operativo():
     except Exception as e:
         app.logger.error(f"Error al registrar sistema operativo: {e}")
         app.logger.error(traceback.format_exc())
-        conn.rollback() # Asegurarse de revertir la transacción en caso de error
         return jsonify({'error': str(e)}), 500
 
 
 # CRUD para DISPOSITIVOS
 @app.route('/api/dispositivos', methods=['GET'])
+@con_respaldo_mirror(leer_dispositivos, ['DISPOSITIVOS'], orden=[('ID_DISPOSITIVO', 'ASC')])
+@con_etag(['DISPOSITIVOS'])
 def get_dispositivos():
     try:
+        pagina = parametros_pagina()
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM DISPOSITIVOS")
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        results = [dict(zip(columns, row)) for row in rows]
+        if pagina:
+            columnas, results, siguiente, total = consulta_paginada(
+                cursor, "SELECT * FROM DISPOSITIVOS", [('ID_DISPOSITIVO', 'ASC')], pagina)
+        else:
+            cursor.execute("SELECT * FROM DISPOSITIVOS")
+            columnas = filas_como_dict(cursor)
+            results = cursor.fetchall()
         cursor.close()
-        return jsonify(results)
+        return respuesta_filas(results, columnas, cuerpo_pagina(results, siguiente, total) if pagina else None)
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except ConexionNoDisponible:
+        raise  # Lo atiende con_respaldo_mirror
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -709,17 +763,17 @@ def get_dispositivos():
 def create_dispositivo():
     try:
         data = request.json
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO DISPOSITIVOS (ID_CLIENTE, TIPO_DISPOSITIVO, MARCA, MODELO)
-            VALUES (:id_cliente, :tipo, :marca, :modelo)
-        """, id_cliente=data['ID_CLIENTE'], tipo=data['TIPO_DISPOSITIVO'], marca=data['MARCA'], modelo=data['MODELO'])
-        conn.commit()
-        # Obtener el ID recién insertado
-        cursor.execute("SELECT MAX(ID_DISPOSITIVO) FROM DISPOSITIVOS")
-        id_dispositivo = cursor.fetchone()[0]
-        cursor.close()
+        with conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO DISPOSITIVOS (ID_CLIENTE, TIPO_DISPOSITIVO, MARCA, MODELO)
+                VALUES (:id_cliente, :tipo, :marca, :modelo)
+            """, id_cliente=data['ID_CLIENTE'], tipo=data['TIPO_DISPOSITIVO'], marca=data['MARCA'], modelo=data['MODELO'])
+            conn.commit()
+            # Obtener el ID recién insertado
+            cursor.execute("SELECT MAX(ID_DISPOSITIVO) FROM DISPOSITIVOS")
+            id_dispositivo = cursor.fetchone()[0]
+            cursor.close()
         # MIRROR: Crear en DISPOSITIVOS
         create_record('DISPOSITIVOS', {
             "ID_DISPOSITIVO": id_dispositivo,
@@ -736,15 +790,15 @@ def create_dispositivo():
 def update_dispositivo(id):
     try:
         data = request.json
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE DISPOSITIVOS
-            SET ID_CLIENTE=:id_cliente, TIPO_DISPOSITIVO=:tipo, MARCA=:marca, MODELO=:modelo
-            WHERE ID_DISPOSITIVO=:id
-        """, id_cliente=data['ID_CLIENTE'], tipo=data['TIPO_DISPOSITIVO'], marca=data['MARCA'], modelo=data['MODELO'], id=id)
-        conn.commit()
-        cursor.close()
+        with conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE DISPOSITIVOS
+                SET ID_CLIENTE=:id_cliente, TIPO_DISPOSITIVO=:tipo, MARCA=:marca, MODELO=:modelo
+                WHERE ID_DISPOSITIVO=:id
+            """, id_cliente=data['ID_CLIENTE'], tipo=data['TIPO_DISPOSITIVO'], marca=data['MARCA'], modelo=data['MODELO'], id=id)
+            conn.commit()
+            cursor.close()
         # MIRROR: Actualizar en DISPOSITIVOS
         update_record('DISPOSITIVOS', id, {
             "ID_DISPOSITIVO": id,
@@ -760,11 +814,11 @@ def update_dispositivo(id):
 @app.route('/api/dispositivos/<int:id>', methods=['DELETE'])
 def delete_dispositivo(id):
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM DISPOSITIVOS WHERE ID_DISPOSITIVO=:id", id=id)
-        conn.commit()
-        cursor.close()
+        with conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM DISPOSITIVOS WHERE ID_DISPOSITIVO=:id", id=id)
+            conn.commit()
+            cursor.close()
         # MIRROR: Eliminar en DISPOSITIVOS
         delete_record('DISPOSITIVOS', id, DISPOSITIVOS_FIELDS)
         return jsonify({'message': 'Dispositivo eliminado correctamente'})
@@ -772,6 +826,8 @@ def delete_dispositivo(id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/dispositivos/search', methods=['GET'])
+@con_respaldo_mirror(buscar_dispositivos, ['DISPOSITIVOS', 'CLIENTES'])
+@con_etag(['DISPOSITIVOS', 'CLIENTES'])
 def search_dispositivos():
     """Buscar dispositivos por un término de búsqueda"""
     try:
@@ -802,157 +858,173 @@ def search_dispositivos():
         ORDER BY d.ID_DISPOSITIVO DESC
         """
         cursor.execute(query, {'search': f"%{search_term}%"})
-        columns = [desc[0] for desc in cursor.description]
-        dispositivos = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        filas_como_dict(cursor)
+        dispositivos = cursor.fetchall()
         cursor.close()
         return jsonify(dispositivos)
+    except ConexionNoDisponible:
+        raise  # Lo atiende con_respaldo_mirror
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
     
 
 
-def enviar_correo_aviso(destinatario: str, nombre_cliente: str, tipo_licencia: str, 
-                       fecha_vencimiento: str, dias_restantes: int):
-    try:
-        app.logger.info(f"Preparando envío de alerta a {destinatario}")
-        
-        # Configuración SMTP (ejemplo para Gmail)
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
-        remitente = "brayan.goicochea@unmsm.edu.pe"  # Cambiar por tu email real
-        password = "qsxzsfmciinsftjg"     # Cambiar por contraseña de aplicación
-        
-        app.logger.debug(f"Configurando mensaje para {destinatario}")
-        mensaje = MIMEMultipart()
-        mensaje['From'] = remitente
-        mensaje['To'] = destinatario
-        mensaje['Subject'] = f"Alerta: Licencia {tipo_licencia} por vencer"
-        
-        cuerpo = f"""
-        Estimado/a {nombre_cliente},
+def _sql_insertar_licencia(tabla):
+    columnas = LICENCIA_FIELDS[tabla]
+    valores = [f"TO_DATE(:{c.lower()}, 'YYYY-MM-DD')" if c in COLUMNAS_FECHA_LICENCIA else f":{c.lower()}"
+               for c in columnas]
+    # Columnas entre comillas: WINDOWS tiene una llamada KEY
+    return f"""
+        INSERT INTO {tabla} ({', '.join(f'"{c}"' for c in columnas)})
+        VALUES ({', '.join(valores)})
+    """
 
-        Su licencia de {tipo_licencia} está próxima a vencer.
+def _registro_licencia(tabla, id_licencia, item, fechas):
+    """{columna: valor} de la fila de detalle, como en las rutas registrar-*."""
+    registro = {'ID_LICENCIA': id_licencia, 'DETALLES': item.get('detalles', '')}
+    registro.update(fechas)
+    registro.update({columna: item.get(clave, '') for columna, clave in CAMPOS_LICENCIA_JSON[tabla].items()})
+    return registro
 
-        Detalles:
-        - Fecha de vencimiento: {fecha_vencimiento}
-        - Días restantes: {dias_restantes}
+@app.route('/api/licencias/registrar-lote', methods=['POST'])
+def registrar_licencias_lote():
+    """
+    Registra varias ventas de licencias, de cualquier tipo, en una sola
+    transacción. Cuerpo: una lista (o {"licencias": [...]}) de objetos con
+    "tipo" ('antivirus', 'ofimatica' o 'sistema_operativo') y los mismos campos
+    que la ruta registrar-* de ese tipo. Si algo no es válido no se registra nada.
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('licencias') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'Se esperaba una lista de licencias'}), 400
+        if len(items) > app.config['LICENCIA_LOTE_MAX']:
+            return jsonify({'error': f"Se admiten hasta {app.config['LICENCIA_LOTE_MAX']} licencias por lote"}), 400
+
+        # 1. Validar los datos de todas las licencias antes de tocar la BD
+        ventas = []
+        errores = []
+        for indice, item in enumerate(items):
+            prefijo, tipo = tipo_por_clave(item.get('tipo')) if isinstance(item, dict) else (None, None)
+            if tipo is None:
+                errores.append({'indice': indice, 'error': 'Tipo de licencia no reconocido'})
+                continue
+            if item.get('idCliente') in (None, ''):
+                errores.append({'indice': indice, 'error': 'Falta idCliente'})
+                continue
+            try:
+                fechas = {columna: parse_fecha(item.get(clave)) for columna, clave in COLUMNAS_FECHA_LICENCIA.items()}
+            except ValueError as e:
+                errores.append({'indice': indice, 'error': str(e)})
+                continue
+            ventas.append({'indice': indice, 'prefijo': prefijo, 'tipo': tipo, 'item': item, 'fechas': fechas})
+        if errores:
+            return jsonify({'error': 'Hay licencias con datos no válidos', 'detalles': errores}), 400
+
+        # IDs de licencia reservados por tipo (un viaje como mucho), antes de abrir la transacción
+        por_prefijo = {}
+        for venta in ventas:
+            por_prefijo.setdefault(venta['prefijo'], []).append(venta)
+        for prefijo, del_tipo in por_prefijo.items():
+            for venta, id_licencia in zip(del_tipo, reservar_ids(prefijo, len(del_tipo))):
+                venta['id_licencia'] = id_licencia
+
+        with conexion() as conn:
+            cursor = conn.cursor()
+            try:
+                # 2. Todos los clientes en una sola consulta
+                clientes = sorted({str(v['item']['idCliente']) for v in ventas})
+                marcadores = ", ".join(f":c{n}" for n in range(len(clientes)))
+                cursor.execute(f"SELECT ID_CLIENTE FROM CLIENTES WHERE ID_CLIENTE IN ({marcadores})",
+                               {f"c{n}": c for n, c in enumerate(clientes)})
+                existentes = {str(fila[0]) for fila in cursor.fetchall()}
+                faltantes = [c for c in clientes if c not in existentes]
+                if faltantes:
+                    return jsonify({'error': 'Cliente no encontrado', 'clientes': faltantes}), 400
+
+                # 3. OPERACIONES en un solo viaje, con el ID generado de cada fila (RETURNING por lote)
+                cursor_operaciones = conn.cursor()
+                try:
+                    ids_var = cursor_operaciones.var(oracledb.NUMBER, arraysize=len(ventas))
+                    cursor_operaciones.setinputsizes(id_operacion=ids_var)
+                    cursor_operaciones.executemany("""
+                        INSERT INTO OPERACIONES (ID_CLIENTE, FECHA, TIPO_OPERACION, INGRESO, EGRESO)
+                        VALUES (:id_cliente, TRUNC(SYSDATE), 'VENTA', :ingreso, :egreso)
+                        RETURNING ID_OPERACION INTO :id_operacion
+                    """, [{'id_cliente': v['item']['idCliente'], 'ingreso': v['item'].get('ingreso', 0),
+                           'egreso': v['item'].get('egreso', 0)} for v in ventas])
+                    for i, venta in enumerate(ventas):
+                        venta['id_operacion'] = int(ids_var.getvalue(i)[0])
+                finally:
+                    cursor_operaciones.close()
+                actualizar_resumen(cursor, [v['id_operacion'] for v in ventas])
+
+                # 4. VENTAS y la tabla de cada tipo, un executemany por tabla
+                cursor.executemany("""
+                    INSERT INTO VENTAS (ID_OPERACION, ID_LICENCIA)
+                    VALUES (:id_operacion, :id_licencia)
+                """, [{'id_operacion': v['id_operacion'], 'id_licencia': v['id_licencia']} for v in ventas])
+                detalle = {}
+                for venta in ventas:
+                    tabla = venta['tipo']['tabla']
+                    detalle.setdefault(tabla, []).append(
+                        _registro_licencia(tabla, venta['id_licencia'], venta['item'], venta['fechas']))
+                for tabla, registros in detalle.items():
+                    cursor.executemany(_sql_insertar_licencia(tabla),
+                                       [{c.lower(): v for c, v in r.items()} for r in registros])
+                conn.commit()
+            finally:
+                cursor.close()
+
+        # MIRROR: una escritura por tabla
+        create_records('OPERACIONES', [{
+            "ID_OPERACION": v['id_operacion'],
+            "ID_CLIENTE": v['item']['idCliente'],
+            "FECHA": v['fechas']['FEC_INICIO'],  # igual que las rutas registrar-*
+            "TIPO_OPERACION": 'VENTA',
+            "INGRESO": v['item'].get('ingreso', 0),
+            "EGRESO": v['item'].get('egreso', 0)
+        } for v in ventas], OPERACIONES_FIELDS)
+        create_records('VENTAS', [{"ID_OPERACION": v['id_operacion'], "ID_LICENCIA": v['id_licencia']}
+                                  for v in ventas], VENTAS_FIELDS)
+        for tabla, registros in detalle.items():
+            create_records(tabla, registros, LICENCIA_FIELDS[tabla])
 
-        Por favor, contacte al equipo de soporte.
-        """
-        
-        mensaje.attach(MIMEText(cuerpo, 'plain'))
-        app.logger.debug("Mensaje construido correctamente")
-
-        app.logger.info(f"Conectando a {smtp_server}:{smtp_port}")
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            app.logger.debug("Conexión TLS iniciada")
-            server.login(remitente, password)
-            app.logger.debug("Autenticación exitosa")
-            server.send_message(mensaje)
-            app.logger.info(f"Correo enviado exitosamente a {destinatario}")
-            
-        return True
-        
-    except smtplib.SMTPException as e:
-        app.logger.error(f"Error SMTP al enviar a {destinatario}: {str(e)}")
-        app.logger.error(f"Código SMTP: {e.smtp_code} | Mensaje: {e.smtp_error}")
-        return False
-        
+        return jsonify({
+            'message': f'{len(ventas)} licencias registradas correctamente',
+            'licencias': [{
+                'indice': v['indice'],
+                'tipo': v['tipo']['clave'],
+                'idLicencia': v['id_licencia'],
+                'idOperacion': v['id_operacion'],
+                'idCliente': v['item']['idCliente']
+            } for v in ventas]
+        })
     except Exception as e:
-        app.logger.error(f"Error inesperado al enviar a {destinatario}: {str(e)}")
+        app.logger.error(f"Error al registrar licencias por lote: {e}")
         app.logger.error(traceback.format_exc())
-        return False
+        return jsonify({'error': str(e)}), 500
 
-# Luego modifica la función verificar_vencimientos_licencias así:
 @app.route('/api/licencias/verificar-vencimientos', methods=['GET'])
 def verificar_vencimientos_licencias():
+    """
+    Encola avisos para las licencias que vencen en los próximos ?dias (7 por
+    defecto) y que aún no fueron avisadas en su umbral actual (ver alertas.py);
+    ?forzar=1 avisa a todas de nuevo.
+    """
     try:
         dias_alerta = request.args.get('dias', default=7, type=int)
-        fecha_actual = datetime.now().date()
-        fecha_limite = fecha_actual + timedelta(days=dias_alerta)
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # Consulta para licencias próximas a vencer
-        cursor.execute("""
-            SELECT 
-                c.CORREO, 
-                c.NOMBRE || ' ' || c.APELLIDO as NOMBRE_CLIENTE,
-                'Antivirus' as TIPO_LICENCIA,
-                a.FECHA_FIN,
-                TRUNC(a.FECHA_FIN) - TRUNC(SYSDATE) as DIAS_RESTANTES
-            FROM ANTIVIRUS a
-            JOIN VENTAS v ON a.ID_LICENCIA = v.ID_LICENCIA
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE a.FECHA_FIN BETWEEN SYSDATE AND SYSDATE + :dias
-            AND c.CORREO IS NOT NULL
-            
-            UNION ALL
-            
-            SELECT 
-                c.CORREO, 
-                c.NOMBRE || ' ' || c.APELLIDO as NOMBRE_CLIENTE,
-                'Microsoft 365' as TIPO_LICENCIA,
-                m.FECHA_FIN,
-                TRUNC(m.FECHA_FIN) - TRUNC(SYSDATE) as DIAS_RESTANTES
-            FROM MICROSOFT365 m
-            JOIN VENTAS v ON m.ID_LICENCIA = v.ID_LICENCIA
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE m.FECHA_FIN BETWEEN SYSDATE AND SYSDATE + :dias
-            AND c.CORREO IS NOT NULL
-            
-            UNION ALL
-            
-            SELECT 
-                c.CORREO, 
-                c.NOMBRE || ' ' || c.APELLIDO as NOMBRE_CLIENTE,
-                'Windows' as TIPO_LICENCIA,
-                w.FECHA_FIN,
-                TRUNC(w.FECHA_FIN) - TRUNC(SYSDATE) as DIAS_RESTANTES
-            FROM WINDOWS w
-            JOIN VENTAS v ON w.ID_LICENCIA = v.ID_LICENCIA
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE w.FECHA_FIN BETWEEN SYSDATE AND SYSDATE + :dias
-            AND c.CORREO IS NOT NULL
-        """, dias=dias_alerta)
-        
-        licencias_proximas = cursor.fetchall()
-        cursor.close()
-        
-        resultados = []
-        for licencia in licencias_proximas:
-            correo, nombre_cliente, tipo_licencia, fecha_vencimiento, dias_restantes = licencia
-            fecha_str = fecha_vencimiento.strftime('%d/%m/%Y')
-            
-            # Enviar correo
-            envio_exitoso = enviar_correo_aviso(
-                correo, 
-                nombre_cliente, 
-                tipo_licencia, 
-                fecha_str, 
-                dias_restantes
-            )
-            
-            resultados.append({
-                'cliente': nombre_cliente,
-                'correo': correo,
-                'tipoLicencia': tipo_licencia,
-                'fechaVencimiento': fecha_str,
-                'diasRestantes': dias_restantes,
-                'correoEnviado': envio_exitoso
-            })
-        
-        return jsonify({
-            'totalLicencias': len(licencias_proximas),
-            'licencias': resultados,
-            'mensaje': f'Se verificaron {len(licencias_proximas)} licencias próximas a vencer'
-        })
+        forzar = bool(request.args.get('forzar', default=0, type=int))
+        informe = verificar_vencimientos(dias_alerta, forzar)
+        # Los correos se envían en segundo plano; el estado se consulta en /api/correos/trabajos/<id>
+        return jsonify(dict(
+            informe,
+            totalLicencias=informe['enviadas'],
+            mensaje=f"{informe['enviadas']} aviso(s) en cola de envío; "
+                    f"{informe['omitidas']} omitido(s) por haberse enviado antes"
+        )), 202
         
     except Exception as e:
         app.logger.error(f"Error al verificar vencimientos: {str(e)}")
@@ -963,64 +1035,73 @@ def verificar_vencimientos_licencias():
 @app.route('/api/licencias/enviar-alerta/<id_licencia>', methods=['POST'])
 def enviar_alerta_manual(id_licencia):
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
         # Determinar el tipo de licencia por su prefijo
-        if id_licencia.startswith('A-'):
-            tabla = 'ANTIVIRUS'
-            tipo_licencia = 'Antivirus'
-        elif id_licencia.startswith('M-'):
-            tabla = 'MICROSOFT365'
-            tipo_licencia = 'Microsoft 365'
-        elif id_licencia.startswith('W-'):
-            tabla = 'WINDOWS'
-            tipo_licencia = 'Windows'
-        else:
+        _, tipo = tipo_por_id(id_licencia)
+        if tipo is None:
             return jsonify({'error': 'Tipo de licencia no reconocido'}), 400
+        tabla = tipo['tabla']
+        tipo_licencia = tipo['nombre']
+        forzar = bool(request.args.get('forzar', default=0, type=int))
         
-        # Obtener datos de la licencia y cliente
-        cursor.execute(f"""
-            SELECT 
-                c.CORREO, 
-                c.NOMBRE || ' ' || c.APELLIDO as NOMBRE_CLIENTE,
-                l.FECHA_FIN,
-                TRUNC(l.FECHA_FIN) - TRUNC(SYSDATE) as DIAS_RESTANTES
-            FROM {tabla} l
-            JOIN VENTAS v ON l.ID_LICENCIA = v.ID_LICENCIA
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE l.ID_LICENCIA = :id_licencia
-        """, id_licencia=id_licencia)
+        # Obtener datos de la licencia y cliente, y registrar la alerta
+        with conexion() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT 
+                    c.CORREO, 
+                    c.NOMBRE || ' ' || c.APELLIDO as NOMBRE_CLIENTE,
+                    TRUNC(l.FECHA_FIN),
+                    TRUNC(l.FECHA_FIN) - TRUNC(SYSDATE) as DIAS_RESTANTES
+                FROM {tabla} l
+                JOIN VENTAS v ON l.ID_LICENCIA = v.ID_LICENCIA
+                JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
+                JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
+                WHERE l.ID_LICENCIA = :id_licencia
+            """, id_licencia=id_licencia)
         
-        licencia = cursor.fetchone()
-        cursor.close()
+            licencia = cursor.fetchone()
+            registro = None
+            if licencia:
+                correo, nombre_cliente, fecha_vencimiento, dias_restantes = licencia
+                alerta = {
+                    'id_licencia': id_licencia, 'tipo_licencia': tipo_licencia, 'fecha_fin': fecha_vencimiento,
+                    'dias_restantes': dias_restantes, 'umbral': umbral_alerta(dias_restantes),
+                    'correo': correo, 'cliente': nombre_cliente
+                }
+                if registro_alertas_disponible(cursor) and not reclamar(cursor, [alerta], forzar):
+                    registro = enviada_el(cursor, id_licencia, alerta['umbral'], fecha_vencimiento)
+                conn.commit()
+            cursor.close()
         
         if not licencia:
             return jsonify({'error': 'Licencia no encontrada'}), 404
-            
-        correo, nombre_cliente, fecha_vencimiento, dias_restantes = licencia
-        fecha_str = fecha_vencimiento.strftime('%d/%m/%Y')
         
-        # Enviar correo
-        envio_exitoso = enviar_correo_aviso(
-            correo, 
-            nombre_cliente, 
-            tipo_licencia, 
-            fecha_str, 
-            dias_restantes
-        )
-        
-        if envio_exitoso:
+        fecha_str = fecha_vencimiento.strftime('%d/%m/%Y')
+        if registro is not None:
+            enviada, estado = registro
             return jsonify({
-                'mensaje': 'Correo de alerta enviado exitosamente',
+                'mensaje': ('La alerta ya se envió para este vencimiento; use ?forzar=1 para reenviarla'
+                            if estado == 'ENVIADO' else 'La alerta de este vencimiento ya está en cola de envío'),
+                'omitida': True,
+                'estado': estado,
+                'enviadaEl': enviada.isoformat(),
                 'cliente': nombre_cliente,
                 'correo': correo,
                 'fechaVencimiento': fecha_str,
                 'diasRestantes': dias_restantes
             })
-        else:
-            return jsonify({'error': 'Error al enviar el correo'}), 500
+        
+        # Encolar el correo; el envío sigue en segundo plano
+        id_trabajo, (id_mensaje,) = encolar_avisos([alerta])
+        return jsonify({
+            'mensaje': 'Correo de alerta en cola de envío',
+            'cliente': nombre_cliente,
+            'correo': correo,
+            'fechaVencimiento': fecha_str,
+            'diasRestantes': dias_restantes,
+            'trabajo': id_trabajo,
+            'idMensaje': id_mensaje
+        }), 202
             
     except Exception as e:
         app.logger.error(f"Error al enviar alerta manual: {e}")
@@ -1029,37 +1110,28 @@ def enviar_alerta_manual(id_licencia):
 # Registrar todas las rutas de mantenimientos (agregar esta línea)
 register_servicios_routes(app)
 register_mantenimientos_routes(app)
+register_dashboard_routes(app)
+register_analitica_routes(app)
 
 @app.route('/api/estadisticas/mes', methods=['GET'])
 def estadisticas_mes():
     try:
+        periodo = periodo_pedido()
         conn = get_db()
         cursor = conn.cursor()
+        origen, columna_fecha = origen_operaciones(cursor, periodo)
+        condicion, params = filtro_periodo(f'o.{columna_fecha}', periodo)
         
-        # Clientes registrados este mes (contar clientes que tienen operaciones este mes)
-        cursor.execute('''
-            SELECT COUNT(DISTINCT c.ID_CLIENTE) FROM CLIENTES c
-            JOIN OPERACIONES o ON c.ID_CLIENTE = o.ID_CLIENTE
-            WHERE EXTRACT(MONTH FROM o.FECHA) = EXTRACT(MONTH FROM SYSDATE)
-              AND EXTRACT(YEAR FROM o.FECHA) = EXTRACT(YEAR FROM SYSDATE)
-        ''')
-        clientes_mes = cursor.fetchone()[0]
-        
-        # Operaciones de este mes
-        cursor.execute('''
-            SELECT COUNT(*) FROM OPERACIONES
-            WHERE EXTRACT(MONTH FROM FECHA) = EXTRACT(MONTH FROM SYSDATE)
-              AND EXTRACT(YEAR FROM FECHA) = EXTRACT(YEAR FROM SYSDATE)
-        ''')
-        operaciones_mes = cursor.fetchone()[0]
-        
-        # Ganancia de este mes (suma de ingreso - egreso)
-        cursor.execute('''
-            SELECT NVL(SUM(INGRESO),0) - NVL(SUM(EGRESO),0) FROM OPERACIONES
-            WHERE EXTRACT(MONTH FROM FECHA) = EXTRACT(MONTH FROM SYSDATE)
-              AND EXTRACT(YEAR FROM FECHA) = EXTRACT(YEAR FROM SYSDATE)
-        ''')
-        ganancia_mes = cursor.fetchone()[0]
+        # Clientes con operaciones, operaciones y ganancia (ingreso - egreso) del mes
+        cursor.execute(f'''
+            SELECT COUNT(DISTINCT c.ID_CLIENTE),
+                   NVL(SUM(o.OPERACIONES), 0),
+                   NVL(SUM(o.INGRESO),0) - NVL(SUM(o.EGRESO),0)
+            FROM {origen} o
+            LEFT JOIN CLIENTES c ON c.ID_CLIENTE = o.ID_CLIENTE
+            WHERE {condicion}
+        ''', params)
+        clientes_mes, operaciones_mes, ganancia_mes = cursor.fetchone()
         
         cursor.close()
         return jsonify({
@@ -1067,6 +1139,8 @@ def estadisticas_mes():
             'operacionesMes': operaciones_mes,
             'gananciaMes': ganancia_mes
         })
+    except PeriodoInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Error en estadísticas del mes: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -1074,19 +1148,21 @@ def estadisticas_mes():
 @app.route('/api/clientes/top-gasto-mes', methods=['GET'])
 def top_clientes_gasto_mes():
     try:
+        periodo = periodo_pedido()
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT c.NOMBRE, c.APELLIDO, c.CORREO, SUM(o.INGRESO - NVL(o.EGRESO, 0)) AS TOTAL_GASTADO
+        origen, columna_fecha = origen_operaciones(cursor, periodo)
+        condicion, params = filtro_periodo(f'o.{columna_fecha}', periodo)
+        cursor.execute(f'''
+            SELECT c.NOMBRE, c.APELLIDO, c.CORREO, SUM(o.NETO) AS TOTAL_GASTADO
             FROM CLIENTES c
-            JOIN OPERACIONES o ON c.ID_CLIENTE = o.ID_CLIENTE
-            WHERE EXTRACT(MONTH FROM o.FECHA) = EXTRACT(MONTH FROM SYSDATE)
-              AND EXTRACT(YEAR FROM o.FECHA) = EXTRACT(YEAR FROM SYSDATE)
+            JOIN {origen} o ON c.ID_CLIENTE = o.ID_CLIENTE
+            WHERE {condicion}
             GROUP BY c.NOMBRE, c.APELLIDO, c.CORREO
-            HAVING SUM(o.INGRESO - NVL(o.EGRESO, 0)) > 0
+            HAVING SUM(o.NETO) > 0
             ORDER BY TOTAL_GASTADO DESC
             FETCH FIRST 10 ROWS ONLY
-        ''')
+        ''', params)
         results = [
             {
                 'nombre': row[0],
@@ -1098,179 +1174,71 @@ def top_clientes_gasto_mes():
         ]
         cursor.close()
         return jsonify(results)
+    except PeriodoInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ingresos/ultimos-4-meses', methods=['GET'])
 def ingresos_ultimos_4_meses():
+    """
+    Ingresos por tipo de operación del mes actual y los 3 anteriores (o de
+    ?desde/?hasta), en el formato del gráfico del dashboard. Usa la serie
+    mensual de /api/ingresos/serie: los meses sin operaciones aparecen con 0.
+    """
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT
-                TO_CHAR(o.FECHA, 'Mon YYYY', 'NLS_DATE_LANGUAGE=SPANISH') AS MES,
-                o.TIPO_OPERACION,
-                SUM(o.INGRESO) AS TOTAL_INGRESO
-            FROM OPERACIONES o
-            WHERE o.FECHA >= ADD_MONTHS(TRUNC(SYSDATE, 'MM'), -3)
-            GROUP BY TO_CHAR(o.FECHA, 'Mon YYYY', 'NLS_DATE_LANGUAGE=SPANISH'), o.TIPO_OPERACION
-            ORDER BY MIN(o.FECHA) ASC, o.TIPO_OPERACION
-        ''')
-        rows = cursor.fetchall()
-        cursor.close()
-        # Procesar los datos para devolverlos en formato adecuado para el gráfico
-        meses = []
-        data = {
-            'VENTA': [],
-            'MANTENIMIENTO': [],
-            'SERVICIO': []
-        }
-        meses_set = set()
-        for row in rows:
-            mes = row[0].capitalize()
-            tipo = row[1].upper()
-            total = float(row[2]) if row[2] is not None else 0.0
-            meses_set.add(mes)
-        meses = sorted(list(meses_set), key=lambda m: [int(m.split()[1]), ['Ene','Feb','Mar','Abr','May','Jun','Jul','Ago','Sep','Oct','Nov','Dic'].index(m.split()[0][:3])])
-        # Inicializar los datos
-        for tipo in data:
-            data[tipo] = [0.0 for _ in meses]
-        for row in rows:
-            mes = row[0].capitalize()
-            tipo = row[1].upper()
-            total = float(row[2]) if row[2] is not None else 0.0
-            if tipo in data:
-                idx = meses.index(mes)
-                data[tipo][idx] = total
-        return jsonify({
-            'meses': meses,
-            'ingresos': data
-        })
+        if request.args.get('desde') or request.args.get('hasta'):
+            return jsonify(ingresos_por_tipo(*rango_serie(periodo_pedido(), 'mes')))
+        return jsonify(ingresos_por_tipo())
+    except PeriodoInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/licencias/porcentaje-ventas-mes', methods=['GET'])
 def porcentaje_ventas_licencias_mes():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        # Total de ventas del mes
-        cursor.execute('''
-            SELECT COUNT(*) FROM VENTAS v
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            WHERE EXTRACT(MONTH FROM o.FECHA) = EXTRACT(MONTH FROM SYSDATE)
-              AND EXTRACT(YEAR FROM o.FECHA) = EXTRACT(YEAR FROM SYSDATE)
-        ''')
-        total_ventas = cursor.fetchone()[0]
-        # Ventas por tipo
-        tipos = [
-            ('Antivirus', 'ANTIVIRUS'),
-            ('Microsoft 365', 'MICROSOFT365'),
-            ('Windows', 'WINDOWS')
-        ]
-        resultados = []
-        for nombre, tabla in tipos:
-            cursor.execute(f'''
-                SELECT COUNT(*) FROM {tabla} l
-                JOIN VENTAS v ON l.ID_LICENCIA = v.ID_LICENCIA
-                JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-                WHERE EXTRACT(MONTH FROM o.FECHA) = EXTRACT(MONTH FROM SYSDATE)
-                  AND EXTRACT(YEAR FROM o.FECHA) = EXTRACT(YEAR FROM SYSDATE)
-            ''')
-            cantidad = cursor.fetchone()[0]
-            porcentaje = round((cantidad / total_ventas) * 100, 2) if total_ventas > 0 else 0.0
-            resultados.append({
-                'nombre': nombre,
-                'cantidad': cantidad,
-                'porcentaje': porcentaje
-            })
-        cursor.close()
-        return jsonify(resultados)
+        # Una sola consulta para todos los tipos de licencia (ver /api/licencias/ventas)
+        datos, _, _ = ventas_licencias(periodo_pedido())
+        return jsonify([
+            {'nombre': tipo['nombre'], 'cantidad': tipo['cantidad'], 'porcentaje': tipo['porcentaje']}
+            for tipo in datos['tipos']
+        ])
+    except PeriodoInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/notificaciones/vencimientos-semana', methods=['GET'])
 def notificaciones_vencimientos_semana():
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        # Licencias próximas a vencer
-        cursor.execute('''
-            SELECT c.NOMBRE, c.APELLIDO, c.CORREO, l.ID_LICENCIA, l.FECHA_FIN, 'Antivirus' as TIPO
-            FROM ANTIVIRUS l
-            JOIN VENTAS v ON l.ID_LICENCIA = v.ID_LICENCIA
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE l.FECHA_FIN BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + 7
-            UNION ALL
-            SELECT c.NOMBRE, c.APELLIDO, c.CORREO, l.ID_LICENCIA, l.FECHA_FIN, 'Microsoft 365' as TIPO
-            FROM MICROSOFT365 l
-            JOIN VENTAS v ON l.ID_LICENCIA = v.ID_LICENCIA
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE l.FECHA_FIN BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + 7
-            UNION ALL
-            SELECT c.NOMBRE, c.APELLIDO, c.CORREO, l.ID_LICENCIA, l.FECHA_FIN, 'Windows' as TIPO
-            FROM WINDOWS l
-            JOIN VENTAS v ON l.ID_LICENCIA = v.ID_LICENCIA
-            JOIN OPERACIONES o ON v.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE l.FECHA_FIN BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + 7
-        ''')
-        licencias = [
-            {
-                'cliente': f"{row[0]} {row[1]}",
-                'correo': row[2],
-                'id_licencia': row[3],
-                'fecha': row[4].strftime('%d/%m/%Y'),
-                'tipo': row[5]
-            }
-            for row in cursor.fetchall()
-        ]
-        # Mantenimientos próximos
-        cursor.execute('''
-            SELECT c.NOMBRE, c.APELLIDO, c.CORREO, m.ID_OPERACION, m.PROX_MANTENIMIENTO
-            FROM MANTENIMIENTOS m
-            JOIN OPERACIONES o ON m.ID_OPERACION = o.ID_OPERACION
-            JOIN CLIENTES c ON o.ID_CLIENTE = c.ID_CLIENTE
-            WHERE m.PROX_MANTENIMIENTO BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + 7
-        ''')
-        mantenimientos = [
-            {
-                'cliente': f"{row[0]} {row[1]}",
-                'correo': row[2],
-                'id_operacion': row[3],
-                'fecha': row[4].strftime('%d/%m/%Y')
-            }
-            for row in cursor.fetchall()
-        ]
-        cursor.close()
-        return jsonify({
-            'licencias': licencias,
-            'mantenimientos': mantenimientos
-        })
+        # Desde el índice de vencimientos en memoria (indice_vencimientos.py)
+        return jsonify(vencimientos_semana())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ganancia/mes-vs-anterior', methods=['GET'])
 def ganancia_mes_vs_anterior():
     try:
+        # Por defecto el mes actual contra el anterior; con ?desde/?hasta, el
+        # rango pedido contra el periodo de igual duración que lo precede
+        periodo = periodo_pedido()
         conn = get_db()
         cursor = conn.cursor()
-        # Ganancia este mes
-        cursor.execute('''
-            SELECT NVL(SUM(INGRESO),0) - NVL(SUM(EGRESO),0) FROM OPERACIONES
-            WHERE EXTRACT(MONTH FROM FECHA) = EXTRACT(MONTH FROM SYSDATE)
-              AND EXTRACT(YEAR FROM FECHA) = EXTRACT(YEAR FROM SYSDATE)
-        ''')
-        ganancia_mes = cursor.fetchone()[0]
-        # Ganancia mes anterior
-        cursor.execute('''
-            SELECT NVL(SUM(INGRESO),0) - NVL(SUM(EGRESO),0) FROM OPERACIONES
-            WHERE EXTRACT(MONTH FROM FECHA) = EXTRACT(MONTH FROM ADD_MONTHS(SYSDATE, -1))
-              AND EXTRACT(YEAR FROM FECHA) = EXTRACT(YEAR FROM ADD_MONTHS(SYSDATE, -1))
-        ''')
-        ganancia_anterior = cursor.fetchone()[0]
+        origen, columna_fecha = origen_operaciones(cursor, periodo)
+        condicion, params = filtro_periodo(columna_fecha, periodo, 'actual')
+        condicion_anterior, params_anterior = filtro_periodo(columna_fecha, periodo_anterior(periodo), 'anterior')
+        params.update(params_anterior)
+        # Ganancia de ambos periodos en un solo recorrido del rango
+        cursor.execute(f'''
+            SELECT NVL(SUM(CASE WHEN {condicion} THEN INGRESO END),0)
+                   - NVL(SUM(CASE WHEN {condicion} THEN EGRESO END),0),
+                   NVL(SUM(CASE WHEN {condicion_anterior} THEN INGRESO END),0)
+                   - NVL(SUM(CASE WHEN {condicion_anterior} THEN EGRESO END),0)
+            FROM {origen}
+            WHERE ({condicion}) OR ({condicion_anterior})
+        ''', params)
+        ganancia_mes, ganancia_anterior = cursor.fetchone()
         cursor.close()
         # Calcular diferencia porcentual
         if ganancia_anterior == 0:
@@ -1282,23 +1250,27 @@ def ganancia_mes_vs_anterior():
             'gananciaAnterior': ganancia_anterior,
             'porcentaje': porcentaje
         })
+    except PeriodoInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/mantenimientos/mes', methods=['GET'])
 def mantenimientos_mes():
     try:
+        condicion, params = filtro_periodo('o.FECHA', periodo_pedido())
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT COUNT(*) FROM MANTENIMIENTOS m
             JOIN OPERACIONES o ON m.ID_OPERACION = o.ID_OPERACION
-            WHERE EXTRACT(MONTH FROM o.FECHA) = EXTRACT(MONTH FROM SYSDATE)
-              AND EXTRACT(YEAR FROM o.FECHA) = EXTRACT(YEAR FROM SYSDATE)
-        ''')
+            WHERE {condicion}
+        ''', params)
         total = cursor.fetchone()[0]
         cursor.close()
         return jsonify({'mantenimientosMes': total})
+    except PeriodoInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1306,34 +1278,160 @@ def mantenimientos_mes():
 def refresh_all_mirrors():
     """
     Copia todas las tablas de la base de datos y sobreescribe sus archivos mirror.
+    Con ?parallel=1 las tablas se exportan en paralelo, cada una con su propia
+    conexión del pool (?workers=N, por defecto MIRROR_REFRESH_WORKERS).
     """
     try:
+        inicio = time.perf_counter()
         conn = get_db()
         cursor = conn.cursor()
         # Obtener todas las tablas del usuario
         cursor.execute("SELECT table_name FROM user_tables ORDER BY table_name")
         tables = [row[0] for row in cursor.fetchall()]
+        if request.args.get('parallel', default=0, type=int):
+            cursor.close()
+            # Cada worker usa su propia conexión: la de esta petición vuelve al pool
+            liberar_db()
+            workers = request.args.get('workers', default=app.config['MIRROR_REFRESH_WORKERS'], type=int)
+            workers = max(1, min(workers, db.oracle_pool.max))
+            tiempos = export_tables(db.oracle_pool, tables, workers)
+        else:
+            tiempos = {}
+            for table in tables:
+                # Exportar la tabla completa por bloques a su archivo mirror
+                inicio_tabla = time.perf_counter()
+                registros = export_table(cursor, table)
+                tiempos[table] = {'registros': registros, 'segundos': round(time.perf_counter() - inicio_tabla, 3)}
+            cursor.close()
+        resumen = {table: t.get('registros') for table, t in tiempos.items()}
+        errores = {table: t['error'] for table, t in tiempos.items() if 'error' in t}
+        return jsonify({
+            "message": "Mirror actualizado para todas las tablas",
+            "resumen": resumen,
+            "tiempos": tiempos,
+            "errores": errores,
+            "segundosTotal": round(time.perf_counter() - inicio, 3)
+        }), (207 if errores else 200)
+    except Exception as e:
+        app.logger.error(f"Error al refrescar mirrors: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/mirror/refresh_incremental', methods=['POST'])
+def refresh_incremental_mirrors():
+    """
+    Sincroniza los mirrors enviando solo las filas que cambiaron desde el último
+    refresco. ?tables=A,B limita las tablas; ?dry_run=1 solo informa la diferencia.
+    """
+    try:
+        dry_run = bool(request.args.get('dry_run', default=0, type=int))
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT table_name FROM user_tables ORDER BY table_name")
+        tables = [row[0] for row in cursor.fetchall()]
+        if request.args.get('tables'):
+            # Solo tablas del esquema: los nombres van dentro del SQL
+            pedidas = {t.strip().upper() for t in request.args['tables'].split(',') if t.strip()}
+            desconocidas = sorted(pedidas.difference(tables))
+            if desconocidas:
+                cursor.close()
+                return jsonify({"error": "Tablas no encontradas", "tablas": desconocidas}), 400
+            tables = [t for t in tables if t in pedidas]
         resumen = {}
         for table in tables:
-            # Obtener columnas de la tabla
-            cursor.execute(f"SELECT * FROM {table} WHERE 1=0")
-            fields = [desc[0] for desc in cursor.description]
-            # Obtener todos los datos
-            cursor.execute(f"SELECT * FROM {table}")
-            rows = cursor.fetchall()
-            # Limpiar archivo mirror
-            mirror_path = get_mirror_path(table)
-            if os.path.exists(mirror_path):
-                os.remove(mirror_path)
-            # Escribir todos los registros en el mirror
-            for row in rows:
-                record = {k: str(v) if v is not None else '' for k, v in zip(fields, row)}
-                create_record(table, record, fields)
-            resumen[table] = len(rows)
+            diff = refresh_table_incremental(cursor, table, dry_run=dry_run)
+            limite = MIRROR_DIFF_MAX_KEYS
+            resumen[table] = {
+                'sinCambios': diff.get('sinCambios', False),
+                'revisados': diff['revisados'],
+                'nuevos': len(diff['nuevos']),
+                'modificados': len(diff['modificados']),
+                'eliminados': len(diff['eliminados']),
+            }
+            if 'exportados' in diff:
+                resumen[table]['exportados'] = diff['exportados']
+            if diff.get('requiereExportacion'):
+                resumen[table]['requiereExportacion'] = True
+            if dry_run:
+                resumen[table]['claves'] = {
+                    'nuevos': diff['nuevos'][:limite],
+                    'modificados': diff['modificados'][:limite],
+                    'eliminados': diff['eliminados'][:limite],
+                }
         cursor.close()
-        return jsonify({"message": "Mirror actualizado para todas las tablas", "resumen": resumen})
+        return jsonify({"dryRun": dry_run, "resumen": resumen})
     except Exception as e:
-        app.logger.error(f"Error al refrescar mirrors: {e}")
+        app.logger.error(f"Error en el refresco incremental de mirrors: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/mirror/status', methods=['GET'])
+def estado_mirror():
+    """
+    Estado del escritor del mirror: profundidad de la cola, retraso y diarios pendientes.
+    """
+    try:
+        return jsonify(mirror_status())
+    except Exception as e:
+        app.logger.error(f"Error al obtener estado del mirror: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/admin/pool', methods=['GET'])
+def estado_pool():
+    """
+    Estado del pool de Oracle: conexiones abiertas/ocupadas, peticiones esperando
+    una conexión y percentiles del tiempo de adquisición (ms). Permite distinguir
+    si una petición lenta espera por el pool o por el SQL.
+    """
+    try:
+        return jsonify(db.pool_stats())
+    except Exception as e:
+        app.logger.error(f"Error al obtener estado del pool: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/correos/status', methods=['GET'])
+def estado_correos():
+    """Métricas de la bandeja de salida de correos (en cola, enviados, reintentos...)."""
+    return jsonify(correo_status())
+
+@app.route('/api/correos/trabajos/<id_trabajo>', methods=['GET'])
+def estado_trabajo_correos(id_trabajo):
+    trabajo = estado_trabajo(id_trabajo)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(trabajo)
+
+@app.route('/api/correos/mensajes/<id_mensaje>', methods=['GET'])
+def estado_mensaje_correo(id_mensaje):
+    mensaje = estado_mensaje(id_mensaje)
+    if mensaje is None:
+        return jsonify({'error': 'Mensaje no encontrado'}), 404
+    return jsonify(mensaje)
+
+@app.route('/api/admin/vencimientos', methods=['GET'])
+def estado_indice_vencimientos():
+    """Tamaño y antigüedad del índice de vencimientos en memoria."""
+    return jsonify(vencimientos_status())
+
+@app.route('/api/admin/programador', methods=['GET'])
+def estado_tareas_programadas():
+    """Tareas programadas, su próxima ejecución y el historial de ejecuciones."""
+    try:
+        return jsonify(estado_programador())
+    except Exception as e:
+        app.logger.error(f"Error al obtener el estado del programador: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/resumen-mensual/reconstruir', methods=['POST'])
+def reconstruir_resumen_mensual():
+    """
+    Regenera OPERACIONES_MES desde OPERACIONES (tras crear la tabla o si hubo
+    cambios en OPERACIONES hechos fuera de la API).
+    """
+    try:
+        with conexion() as conn:
+            grupos = reconstruir_resumen(conn)
+        return jsonify({'message': 'Resumen mensual reconstruido', 'grupos': grupos})
+    except Exception as e:
+        app.logger.error(f"Error al reconstruir el resumen mensual: {e}")
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
@@ -0,0 +1,72 @@
+# cache_consultas.py
+# Caché en memoria de resultados de consultas agregadas (dashboard, series).
+# Cada entrada vale `ttl` segundos y se descarta antes si cambia la versión en la
+# BD (versiones_tablas.py) de alguna de las tablas de las que depende, la cambie
+# este worker, otro o una escritura ajena a la API. Si la versión no se puede
+# leer (sin TABLA_VERSIONES o sin conexión) las entradas valen solo por `ttl`.
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from db import conexion, ConexionNoDisponible
+from versiones_tablas import versiones as versiones_bd
+
+MAX_ENTRADAS = 256
+
+_entradas = OrderedDict()  # clave -> (versiones, momento monotonic, generado, datos)
+_lock = threading.Lock()
+_calculando = {}           # clave -> Lock: una sola consulta por clave al vencer
+
+
+def _versiones(tablas):
+    # Una búsqueda por clave primaria en TABLA_VERSIONES; None si no se puede leer
+    try:
+        with conexion() as conn:
+            cursor = conn.cursor()
+            try:
+                return versiones_bd(cursor, tablas)
+            finally:
+                cursor.close()
+    except ConexionNoDisponible:
+        return None
+
+def _vigente(clave, versiones, ttl):
+    entrada = _entradas.get(clave)
+    if entrada is None or entrada[0] != versiones or time.monotonic() - entrada[1] >= ttl:
+        return None
+    _entradas.move_to_end(clave)
+    return entrada[3], entrada[2], time.monotonic() - entrada[1]
+
+def obtener(clave, tablas, ttl, calcular):
+    """
+    (datos, generado, edad_segundos) para `clave`: desde la caché si sigue
+    vigente, o llamando a calcular(). Las versiones se leen antes de calcular:
+    una escritura que llegue durante la consulta deja la entrada ya vencida
+    para la próxima petición.
+    """
+    versiones = _versiones(tablas)
+    with _lock:
+        vigente = _vigente(clave, versiones, ttl)
+        if vigente is not None:
+            return vigente
+        calculo = _calculando.setdefault(clave, threading.Lock())
+    with calculo:
+        # Otra petición pudo haberlo calculado mientras se esperaba
+        with _lock:
+            vigente = _vigente(clave, versiones, ttl)
+            if vigente is not None:
+                return vigente
+        try:
+            datos = calcular()
+        except Exception:
+            with _lock:
+                _calculando.pop(clave, None)
+            raise
+        generado = datetime.now()
+        with _lock:
+            _entradas[clave] = (versiones, time.monotonic(), generado, datos)
+            _entradas.move_to_end(clave)
+            while len(_entradas) > MAX_ENTRADAS:
+                antigua, _ = _entradas.popitem(last=False)
+                _calculando.pop(antigua, None)
+    return datos, generado, 0.0
@@ -0,0 +1,93 @@
+# cache_http.py
+# GET condicional y compresión de respuestas:
+#  - con_etag(tablas): ETag fuerte calculado a partir de la versión de las tablas
+#    en la BD (TABLA_VERSIONES, ver versiones_tablas.py) y de la petición; si
+#    coincide con If-None-Match responde 304 sin ejecutar la vista.
+#  - init_cache_http(app): comprime con brotli (si está instalado) o gzip las
+#    respuestas que superan COMPRESION_MIN_BYTES.
+import gzip
+import hashlib
+from functools import wraps
+from flask import current_app, request
+from db import get_db, liberar_db
+from versiones_tablas import versiones
+
+try:
+    import brotli
+except ImportError:  # Sin brotli solo se ofrece gzip
+    brotli = None
+
+
+def _etag(versiones):
+    partes = [request.path, request.query_string.decode('latin-1'),
+              request.headers.get('Accept', ''), request.headers.get('Accept-Encoding', '')]
+    partes += [f"{tabla}={version}" for tabla, version in versiones]
+    return hashlib.sha1('\n'.join(partes).encode('utf-8')).hexdigest()
+
+def con_etag(tablas):
+    """
+    Decorador para rutas GET cuyo resultado depende solo de `tablas` (lista, o
+    función que recibe los argumentos de la ruta y devuelve la lista). La
+    versión se toma antes de ejecutar la vista: si una escritura llega mientras
+    tanto, la siguiente petición verá otro ETag y recibirá los datos nuevos.
+    Las versiones se leen con la conexión de la petición (get_db), la misma que
+    usa después la vista, y se devuelve al pool en cuanto hay respuesta (salvo
+    en streaming). Las tablas sin versión se sirven sin ETag.
+    ConexionNoDisponible se deja pasar: con con_respaldo_mirror, este decorador
+    va debajo para que el mirror atienda la petición.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != 'GET':
+                return vista(*args, **kwargs)
+            cursor = get_db().cursor()
+            try:
+                versiones_vista = versiones(cursor, tablas(**kwargs) if callable(tablas) else tablas)
+            finally:
+                cursor.close()
+            etag = _etag(versiones_vista) if versiones_vista is not None else None
+            if etag is not None and request.if_none_match.contains(etag):
+                liberar_db()
+                respuesta = current_app.response_class(status=304)
+                respuesta.set_etag(etag)
+                return respuesta
+            respuesta = current_app.make_response(vista(*args, **kwargs))
+            if not respuesta.is_streamed:
+                liberar_db()
+            if etag is not None and respuesta.status_code == 200:
+                respuesta.set_etag(etag)
+                # El navegador puede guardar la respuesta, pero debe revalidarla siempre
+                respuesta.headers['Cache-Control'] = 'no-cache'
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def _comprimir(respuesta):
+    config = current_app.config
+    if (respuesta.status_code != 200 or respuesta.direct_passthrough or respuesta.is_streamed
+            or 'Content-Encoding' in respuesta.headers):
+        return respuesta
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br']:
+        codificacion = 'br'
+    elif aceptadas['gzip']:
+        codificacion = 'gzip'
+    else:
+        return respuesta
+    datos = respuesta.get_data()
+    if len(datos) < config['COMPRESION_MIN_BYTES']:
+        return respuesta
+    if codificacion == 'br':
+        datos = brotli.compress(datos, quality=config['COMPRESION_NIVEL_BROTLI'])
+    else:
+        datos = gzip.compress(datos, compresslevel=config['COMPRESION_NIVEL_GZIP'])
+    respuesta.set_data(datos)
+    respuesta.headers['Content-Encoding'] = codificacion
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
+def init_cache_http(app):
+    """Registra la compresión de respuestas en la app."""
+    app.after_request(_comprimir)
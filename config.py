@@ -1,5 +1,6 @@
 # config.py (Versión Mejorada y Centralizada)
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Cargar el archivo .env una sola vez al inicio del proyecto
@@ -21,3 +22,71 @@ class Config:
     ORACLE_USER = os.environ.get('ORACLE_USER')
     ORACLE_PASSWORD = os.environ.get('ORACLE_PASSWORD')
     ORACLE_DSN = os.environ.get('ORACLE_DSN')
+
+    # Pool de conexiones de Oracle (ver db.init_oracle_pool)
+    DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 2))
+    DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 5))
+    DB_POOL_INCREMENT = int(os.environ.get('DB_POOL_INCREMENT', 1))
+    # Qué hacer si no hay conexiones libres: wait, timedwait, nowait o forceget
+    DB_POOL_GETMODE = os.environ.get('DB_POOL_GETMODE', 'timedwait')
+    # Tiempo máximo (ms) esperando una conexión libre del pool (modo timedwait). Al
+    # vencer, las rutas de lectura con respaldo responden desde el mirror (mirror_fallback.py)
+    DB_ACQUIRE_TIMEOUT_MS = int(os.environ.get('DB_ACQUIRE_TIMEOUT_MS', 3000))
+    # Segundos sin uso tras los que se verifica la conexión antes de entregarla (negativo: nunca)
+    DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL', 60))
+    # Vida máxima (s) de una conexión del pool; 0 = sin límite
+    DB_POOL_MAX_LIFETIME = int(os.environ.get('DB_POOL_MAX_LIFETIME', 0))
+    DB_STMT_CACHE_SIZE = int(os.environ.get('DB_STMT_CACHE_SIZE', 20))
+    # Números de licencia reservados por cada viaje a LICENCIA_CONTADORES (licencias.py)
+    LICENCIA_ID_BLOQUE = int(os.environ.get('LICENCIA_ID_BLOQUE', 20))
+    # Máximo de licencias por petición a /api/licencias/registrar-lote (Oracle admite
+    # hasta 1000 valores en el IN con que se validan los clientes)
+    LICENCIA_LOTE_MAX = int(os.environ.get('LICENCIA_LOTE_MAX', 500))
+    # Respuestas de más de estos bytes se comprimen (gzip o brotli) si el cliente lo acepta
+    COMPRESION_MIN_BYTES = int(os.environ.get('COMPRESION_MIN_BYTES', 1024))
+    COMPRESION_NIVEL_GZIP = int(os.environ.get('COMPRESION_NIVEL_GZIP', 6))
+    COMPRESION_NIVEL_BROTLI = int(os.environ.get('COMPRESION_NIVEL_BROTLI', 5))
+    # Segundos que /api/dashboard reutiliza su resumen si no hubo escrituras (dashboard_routes.py)
+    DASHBOARD_TTL = int(os.environ.get('DASHBOARD_TTL', 60))
+    # Segundos que se reutiliza cada serie/análisis de analitica_routes.py si no hubo escrituras
+    ANALITICA_TTL = int(os.environ.get('ANALITICA_TTL', 300))
+    # Segundos tras los que el índice de vencimientos en memoria se recarga completo
+    # (indice_vencimientos.py); las escrituras de este proceso se reflejan al momento
+    VENCIMIENTOS_TTL = int(os.environ.get('VENCIMIENTOS_TTL', 300))
+
+    # Servidor SMTP para los avisos por correo (correo_salida.py). Las credenciales
+    # van en el .env; SMTP_REMITENTE por defecto es SMTP_USUARIO
+    SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
+    SMTP_PORT = int(os.environ.get('SMTP_PORT', 587))
+    SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1') == '1'
+    SMTP_USUARIO = os.environ.get('SMTP_USUARIO')
+    SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+    SMTP_REMITENTE = os.environ.get('SMTP_REMITENTE')
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT', 30))
+    # Segundos sin envíos tras los que se cierra la sesión SMTP reutilizada
+    SMTP_INACTIVIDAD = int(os.environ.get('SMTP_INACTIVIDAD', 60))
+    # Bandeja de salida: mensajes por lote, intentos por mensaje, espera base entre
+    # reintentos (se duplica en cada uno) y mensajes terminados que se recuerdan
+    CORREO_LOTE = int(os.environ.get('CORREO_LOTE', 20))
+    CORREO_MAX_INTENTOS = int(os.environ.get('CORREO_MAX_INTENTOS', 4))
+    CORREO_REINTENTO_SEGUNDOS = int(os.environ.get('CORREO_REINTENTO_SEGUNDOS', 5))
+    CORREO_HISTORIAL = int(os.environ.get('CORREO_HISTORIAL', 5000))
+    # Días antes del vencimiento en que se avisa a cada cliente, una vez por umbral
+    # y por FECHA_FIN (registro en ALERTAS_ENVIADAS, alertas.py)
+    ALERTA_UMBRALES_DIAS = [int(d) for d in os.environ.get('ALERTA_UMBRALES_DIAS', '30,7,1').split(',') if d.strip()]
+    # Minutos tras los que un aviso reclamado cuyo envío no se confirmó se vuelve a reclamar
+    ALERTA_PENDIENTE_MINUTOS = int(os.environ.get('ALERTA_PENDIENTE_MINUTOS', 60))
+    # Tareas programadas (programador.py): cron 'minuto hora día mes día_semana' de
+    # cada verificación, retraso al azar máximo (s) y archivo de bloqueo del líder
+    PROGRAMADOR_ACTIVO = os.environ.get('PROGRAMADOR_ACTIVO', '1') == '1'
+    PROGRAMADOR_CRON_LICENCIAS = os.environ.get('PROGRAMADOR_CRON_LICENCIAS', '0 8 * * *')
+    PROGRAMADOR_CRON_MANTENIMIENTOS = os.environ.get('PROGRAMADOR_CRON_MANTENIMIENTOS', '30 8 * * *')
+    PROGRAMADOR_JITTER = int(os.environ.get('PROGRAMADOR_JITTER', 120))
+    PROGRAMADOR_LOCK = os.environ.get('PROGRAMADOR_LOCK',
+                                      os.path.join(tempfile.gettempdir(), 'pcservice-programador.lock'))
+    # Ejecuciones que se conservan en el historial
+    PROGRAMADOR_HISTORIAL = int(os.environ.get('PROGRAMADOR_HISTORIAL', 100))
+
+    # Refresco del mirror: número máximo de tablas exportadas en paralelo,
+    # cada una con su propia conexión del pool
+    MIRROR_REFRESH_WORKERS = int(os.environ.get('MIRROR_REFRESH_WORKERS', 3))
@@ -0,0 +1,292 @@
+# correo_salida.py
+# Bandeja de salida de correos: las rutas encolan los avisos y vuelven enseguida;
+# un hilo los envía por lotes reutilizando una misma sesión SMTP (STARTTLS y
+# login una sola vez) y reintenta los fallos temporales con espera exponencial.
+# El estado de cada mensaje y de cada trabajo (grupo de mensajes encolados
+# juntos) se consulta en memoria; se conservan los últimos CORREO_HISTORIAL.
+# La cola también vive en memoria: si el proceso se reinicia, lo pendiente se
+# pierde. Quien lleve registro de lo avisado debe darlo por enviado solo cuando
+# se lo confirme al_enviar (ver encolar), no al encolar.
+# Para pruebas locales basta un servidor SMTP de prueba, p. ej.
+#   python -m aiosmtpd -n -l localhost:8025
+# con SMTP_HOST=localhost, SMTP_PORT=8025, SMTP_STARTTLS=0 y sin SMTP_USUARIO.
+import heapq
+import itertools
+import logging
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# El envío corre en un hilo sin contexto de Flask
+logger = logging.getLogger(__name__)
+
+PENDIENTE, ENVIANDO, ENVIADO, REINTENTANDO, FALLIDO = 'pendiente', 'enviando', 'enviado', 'reintentando', 'fallido'
+_TERMINADOS = (ENVIADO, FALLIDO)
+
+_config = {}
+_cola = queue.Queue()
+_reintentos = []            # heap de (momento monotonic, orden, id_mensaje)
+_orden = itertools.count()
+_mensajes = OrderedDict()   # id -> estado del mensaje (sin el cuerpo)
+_contenidos = {}            # id -> (destinatario, asunto, cuerpo) hasta que termina
+_trabajos = {}              # id_trabajo -> [ids de mensajes]
+_avisos = {}               # id -> (al_fallar, al_enviar, referencia) a llamar al terminar el mensaje
+_lock = threading.Lock()
+_hilo = None
+_hilo_lock = threading.Lock()
+_smtp = None
+_smtp_ultimo_uso = 0.0
+_metricas = {'encolados': 0, 'enviados': 0, 'fallidos': 0, 'reintentos': 0, 'sesiones': 0, 'lotes': 0}
+
+
+def init_correo(app):
+    """Toma la configuración SMTP de la app (Config.SMTP_* y CORREO_*)."""
+    _config.update({k: v for k, v in app.config.items() if k.startswith(('SMTP_', 'CORREO_'))})
+    if not _config.get('SMTP_HOST'):
+        logger.warning("SMTP_HOST no está configurado: los correos quedarán en cola sin enviarse")
+
+
+def mensaje_aviso(nombre_cliente, tipo_licencia, fecha_vencimiento, dias_restantes):
+    """(asunto, cuerpo) del aviso de vencimiento de licencia."""
+    asunto = f"Alerta: Licencia {tipo_licencia} por vencer"
+    cuerpo = f"""
+        Estimado/a {nombre_cliente},
+
+        Su licencia de {tipo_licencia} está próxima a vencer.
+
+        Detalles:
+        - Fecha de vencimiento: {fecha_vencimiento}
+        - Días restantes: {dias_restantes}
+
+        Por favor, contacte al equipo de soporte.
+        """
+    return asunto, cuerpo
+
+def encolar(mensajes, al_fallar=None, al_enviar=None):
+    """
+    Encola [(destinatario, asunto, cuerpo), ...] como un trabajo. Devuelve
+    (id_trabajo, [id_mensaje, ...]) en el mismo orden. Cada mensaje puede traer
+    un cuarto elemento, una referencia: desde el hilo de envío se llama
+    al_enviar(referencia) cuando el servidor SMTP acepta el mensaje y
+    al_fallar(referencia) si termina fallido.
+    """
+    id_trabajo = uuid.uuid4().hex
+    ids = []
+    ahora = time.time()
+    with _lock:
+        for destinatario, asunto, cuerpo, *referencia in mensajes:
+            id_mensaje = uuid.uuid4().hex
+            _mensajes[id_mensaje] = {
+                'id': id_mensaje, 'trabajo': id_trabajo, 'destinatario': destinatario, 'asunto': asunto,
+                'estado': PENDIENTE, 'intentos': 0, 'error': None, 'creado': ahora, 'enviado': None
+            }
+            _contenidos[id_mensaje] = (destinatario, asunto, cuerpo)
+            if (al_fallar is not None or al_enviar is not None) and referencia:
+                _avisos[id_mensaje] = (al_fallar, al_enviar, referencia[0])
+            ids.append(id_mensaje)
+        _trabajos[id_trabajo] = ids
+        _metricas['encolados'] += len(ids)
+        _podar_historial()
+    for id_mensaje in ids:
+        _cola.put(id_mensaje)
+    _iniciar_hilo()
+    return id_trabajo, ids
+
+def _podar_historial():
+    # Descarta los mensajes terminados más antiguos por encima del límite (con _lock)
+    exceso = len(_mensajes) - _config.get('CORREO_HISTORIAL', 5000)
+    for id_mensaje in list(_mensajes):
+        if exceso <= 0:
+            break
+        mensaje = _mensajes[id_mensaje]
+        if mensaje['estado'] in _TERMINADOS:
+            del _mensajes[id_mensaje]
+            ids = _trabajos.get(mensaje['trabajo'])
+            if ids is not None and all(i not in _mensajes for i in ids):
+                del _trabajos[mensaje['trabajo']]
+            exceso -= 1
+
+
+def estado_mensaje(id_mensaje):
+    with _lock:
+        mensaje = _mensajes.get(id_mensaje)
+        return dict(mensaje) if mensaje else None
+
+def estado_trabajo(id_trabajo):
+    """Resumen del trabajo (cantidad por estado) y sus mensajes, o None."""
+    with _lock:
+        ids = _trabajos.get(id_trabajo)
+        if ids is None:
+            return None
+        mensajes = [dict(_mensajes[i]) for i in ids if i in _mensajes]
+    por_estado = {}
+    for mensaje in mensajes:
+        por_estado[mensaje['estado']] = por_estado.get(mensaje['estado'], 0) + 1
+    return {
+        'trabajo': id_trabajo,
+        'total': len(mensajes),
+        'terminado': all(m['estado'] in _TERMINADOS for m in mensajes),
+        'estados': por_estado,
+        'mensajes': mensajes
+    }
+
+def status():
+    """Métricas de la bandeja de salida."""
+    with _lock:
+        return dict(_metricas, enCola=_cola.qsize(), esperandoReintento=len(_reintentos),
+                    sesionAbierta=_smtp is not None,
+                    hiloActivo=_hilo is not None and _hilo.is_alive())
+
+
+def _iniciar_hilo():
+    global _hilo
+    if _hilo is None or not _hilo.is_alive():
+        with _hilo_lock:
+            if _hilo is None or not _hilo.is_alive():
+                _hilo = threading.Thread(target=_bucle_envio, name='correo-envio', daemon=True)
+                _hilo.start()
+
+def _sesion():
+    """Sesión SMTP abierta, reutilizando la anterior si sigue respondiendo."""
+    global _smtp
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                return _smtp
+        except (smtplib.SMTPException, OSError):
+            pass
+        _cerrar_sesion()
+    smtp = smtplib.SMTP(_config['SMTP_HOST'], _config.get('SMTP_PORT', 587),
+                        timeout=_config.get('SMTP_TIMEOUT', 30))
+    try:
+        if _config.get('SMTP_STARTTLS', True):
+            smtp.starttls()
+        if _config.get('SMTP_USUARIO'):
+            smtp.login(_config['SMTP_USUARIO'], _config.get('SMTP_PASSWORD') or '')
+    except Exception:
+        smtp.close()
+        raise
+    _smtp = smtp
+    _metricas['sesiones'] += 1
+    logger.info(f"CORREO: sesión SMTP abierta con {_config['SMTP_HOST']}")
+    return smtp
+
+def _cerrar_sesion():
+    global _smtp
+    if _smtp is not None:
+        try:
+            _smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            _smtp.close()
+        _smtp = None
+
+def _permanente(error):
+    # Rechazo definitivo del destinatario o del mensaje: reintentar no sirve
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPDataError) and 500 <= error.smtp_code < 600
+
+def _construir(destinatario, asunto, cuerpo):
+    mensaje = MIMEMultipart()
+    mensaje['From'] = _config.get('SMTP_REMITENTE') or _config.get('SMTP_USUARIO') or 'no-reply@localhost'
+    mensaje['To'] = destinatario
+    mensaje['Subject'] = asunto
+    mensaje.attach(MIMEText(cuerpo, 'plain'))
+    return mensaje
+
+def _actualizar(id_mensaje, **cambios):
+    with _lock:
+        mensaje = _mensajes.get(id_mensaje)
+        if mensaje is not None:
+            mensaje.update(cambios)
+        if cambios.get('estado') in _TERMINADOS:
+            _contenidos.pop(id_mensaje, None)
+            return _avisos.pop(id_mensaje, None)
+
+def _avisar(id_mensaje, funcion, referencia):
+    # Llama al aviso del que encoló el mensaje sin que un error corte el envío
+    if funcion is None:
+        return
+    try:
+        funcion(referencia)
+    except Exception as e:
+        logger.error(f"CORREO: error al notificar el estado de {id_mensaje}: {e}")
+
+def _fallo(id_mensaje, intentos, error):
+    maximo = _config.get('CORREO_MAX_INTENTOS', 4)
+    if _permanente(error) or intentos >= maximo:
+        aviso = _actualizar(id_mensaje, estado=FALLIDO, error=str(error))
+        _metricas['fallidos'] += 1
+        logger.error(f"CORREO: no se pudo enviar {id_mensaje} tras {intentos} intento(s): {error}")
+        if aviso is not None:
+            al_fallar, _, referencia = aviso
+            _avisar(id_mensaje, al_fallar, referencia)
+        return
+    espera = _config.get('CORREO_REINTENTO_SEGUNDOS', 5) * 2 ** (intentos - 1)
+    _actualizar(id_mensaje, estado=REINTENTANDO, error=str(error))
+    with _lock:
+        heapq.heappush(_reintentos, (time.monotonic() + espera, next(_orden), id_mensaje))
+    _metricas['reintentos'] += 1
+    logger.warning(f"CORREO: error al enviar {id_mensaje} (intento {intentos}), se reintenta en {espera}s: {error}")
+
+def _enviar_lote(lote):
+    global _smtp_ultimo_uso
+    for id_mensaje in lote:
+        with _lock:
+            contenido = _contenidos.get(id_mensaje)
+            intentos = _mensajes[id_mensaje]['intentos'] + 1 if id_mensaje in _mensajes else 1
+        if contenido is None:
+            continue
+        _actualizar(id_mensaje, estado=ENVIANDO, intentos=intentos)
+        try:
+            _sesion().send_message(_construir(*contenido))
+        except Exception as e:
+            if not isinstance(e, (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)):
+                # Falló la conexión o la sesión: se abre otra para el resto del lote
+                _cerrar_sesion()
+            _fallo(id_mensaje, intentos, e)
+            continue
+        _smtp_ultimo_uso = time.monotonic()
+        aviso = _actualizar(id_mensaje, estado=ENVIADO, error=None, enviado=time.time())
+        _metricas['enviados'] += 1
+        if aviso is not None:
+            _, al_enviar, referencia = aviso
+            _avisar(id_mensaje, al_enviar, referencia)
+    _metricas['lotes'] += 1
+
+def _reintentos_vencidos():
+    ahora = time.monotonic()
+    vencidos = []
+    with _lock:
+        while _reintentos and _reintentos[0][0] <= ahora:
+            vencidos.append(heapq.heappop(_reintentos)[2])
+        proximo = _reintentos[0][0] - ahora if _reintentos else None
+    return vencidos, proximo
+
+def _bucle_envio():
+    """Hilo de envío: junta lotes de la cola y de los reintentos vencidos."""
+    while True:
+        lote, proximo = _reintentos_vencidos()
+        inactividad = _config.get('SMTP_INACTIVIDAD', 60)
+        espera = inactividad if proximo is None else min(inactividad, proximo)
+        try:
+            if not lote:
+                lote.append(_cola.get(timeout=max(espera, 0.1)))
+            while len(lote) < _config.get('CORREO_LOTE', 20):
+                lote.append(_cola.get_nowait())
+        except queue.Empty:
+            pass
+        if lote:
+            if not _config.get('SMTP_HOST'):
+                for id_mensaje in lote:
+                    _fallo(id_mensaje, _config.get('CORREO_MAX_INTENTOS', 4), RuntimeError("SMTP_HOST no configurado"))
+                continue
+            _enviar_lote(lote)
+        elif _smtp is not None and time.monotonic() - _smtp_ultimo_uso >= inactividad:
+            # Sin correos por un tiempo: se libera la sesión para no dejarla colgada en el servidor
+            _cerrar_sesion()
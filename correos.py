@@ -1,40 +1,28 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
+# correos.py
+# Recordatorio de próximo mantenimiento para el cliente. Se envía por la bandeja
+# de salida (correo_salida.py) con la configuración SMTP de la app; lo usan las
+# tareas programadas (programador.py) a través de alertas.verificar_mantenimientos.
+from correo_salida import encolar
 
 
-def alertar_cliente():
-    try:
-        remitente = "brayan.goicochea@unmsm.edu.pe"
-        clave_app = "qsxzsfmciinsftjg"  # Contraseña de aplicación (sin espacios)
-        destinatario = "brayangoicocheac@gmail.com"
-        asunto = "Tu servicio está por terminar"
-        mensaje_texto = (
-            "Hola, tu servicio está por vencer.\n\n"
-            "Por favor, renueva tu licencia para no perder el acceso.\n\n"
-            "-- Sistema de Servicio Técnico"
-        )
+def mensaje_mantenimiento(nombre_cliente, fecha_mantenimiento, dias_restantes):
+    """(asunto, cuerpo) del recordatorio de mantenimiento."""
+    asunto = "Tu servicio está por terminar"
+    cuerpo = (
+        f"Hola {nombre_cliente}, tu próximo mantenimiento está programado para el "
+        f"{fecha_mantenimiento.strftime('%d/%m/%Y')} (en {dias_restantes} día(s)).\n\n"
+        "Por favor, coordina con nosotros la visita para no perder la continuidad del servicio.\n\n"
+        "-- Sistema de Servicio Técnico"
+    )
+    return asunto, cuerpo
 
-        mensaje = MIMEMultipart()
-        mensaje['From'] = remitente
-        mensaje['To'] = destinatario
-        mensaje['Subject'] = asunto
-        mensaje.attach(MIMEText(mensaje_texto, 'plain'))
-
-        servidor = smtplib.SMTP('smtp.gmail.com', 587)
-        servidor.starttls()
-        servidor.login(remitente, clave_app)
-        servidor.send_message(mensaje)
-        servidor.quit()
-
-        print("✅ Correo enviado exitosamente.")
-    except Exception as e:
-        print("❌ Error al enviar el correo:", e)
-
-# Si deseas probar directamente desde este archivo:
-if __name__ == '__main__':
-    alertar_cliente()
+def alertar_cliente(avisos, al_fallar=None, al_enviar=None):
+    """
+    Encola un recordatorio por cada (destinatario, nombre_cliente,
+    fecha_mantenimiento, dias_restantes[, referencia]). Devuelve
+    (id_trabajo, [id_mensaje, ...]); ver correo_salida.encolar.
+    """
+    return encolar([
+        (destinatario,) + mensaje_mantenimiento(nombre_cliente, fecha, dias_restantes) + tuple(referencia)
+        for destinatario, nombre_cliente, fecha, dias_restantes, *referencia in avisos
+    ], al_fallar=al_fallar, al_enviar=al_enviar)
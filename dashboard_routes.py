@@ -0,0 +1,161 @@
+# dashboard_routes.py
+# Resumen del dashboard en una sola petición: /api/dashboard devuelve lo mismo
+# que estadisticas/mes, clientes/top-gasto-mes, ingresos/ultimos-4-meses,
+# licencias/porcentaje-ventas-mes, ganancia/mes-vs-anterior, mantenimientos/mes y
+# notificaciones/vencimientos-semana. Las cifras del mes salen de una consulta
+# agrupada, los ingresos de 4 meses de la serie mensual que usa
+# ingresos/ultimos-4-meses (analitica_routes.ingresos_por_tipo) y los
+# vencimientos del índice en memoria (indice_vencimientos.py).
+# El resultado se guarda en memoria DASHBOARD_TTL segundos y se descarta antes
+# si sube la versión en la BD (TABLA_VERSIONES, ver cache_consultas.py) de alguna
+# de las tablas de las que depende: OPERACIONES, VENTAS, MANTENIMIENTOS,
+# CLIENTES y las de licencias, escriba quien escriba.
+from datetime import datetime
+from flask import jsonify, current_app
+from db import conexion
+from cache_consultas import obtener
+from licencias import TIPOS_LICENCIA
+from indice_vencimientos import vencimientos_semana
+from analitica_routes import ingresos_por_tipo
+
+TABLAS_DASHBOARD = (['OPERACIONES', 'VENTAS', 'MANTENIMIENTOS', 'CLIENTES']
+                    + [tipo['tabla'] for tipo in TIPOS_LICENCIA.values()])
+
+
+def _sql_operaciones():
+    # Una fila por mes y por (mes, cliente) del mes actual y el anterior (los
+    # ingresos de 4 meses por tipo salen de analitica_routes.ingresos_por_tipo).
+    # VENTAS y MANTENIMIENTOS se agregan antes por operación para no duplicar importes.
+    conteo_tipos = ",\n                       ".join(
+        f"COUNT(l{i}.ID_LICENCIA) AS LIC{i}" for i in range(len(TIPOS_LICENCIA)))
+    joins_tipos = "\n                ".join(
+        f"LEFT JOIN {tipo['tabla']} l{i} ON l{i}.ID_LICENCIA = v.ID_LICENCIA"
+        for i, tipo in enumerate(TIPOS_LICENCIA.values()))
+    suma_tipos = ", ".join(f"SUM(vt.LIC{i}) AS LIC{i}" for i in range(len(TIPOS_LICENCIA)))
+    return f"""
+        SELECT TRUNC(o.FECHA, 'MM') AS MES,
+               TRUNC(SYSDATE, 'MM') AS MES_ACTUAL,
+               c.NOMBRE, c.APELLIDO, c.CORREO,
+               GROUPING_ID(c.NOMBRE, c.APELLIDO, c.CORREO) AS NIVEL,
+               COUNT(*) AS OPERACIONES,
+               COUNT(DISTINCT c.ID_CLIENTE) AS CLIENTES,
+               NVL(SUM(o.INGRESO), 0) - NVL(SUM(o.EGRESO), 0) AS GANANCIA,
+               SUM(CASE WHEN c.ID_CLIENTE IS NOT NULL THEN o.INGRESO - NVL(o.EGRESO, 0) END) AS GASTO,
+               COUNT(c.ID_CLIENTE) AS CON_CLIENTE,
+               NVL(SUM(vt.VENTAS), 0) AS VENTAS,
+               {suma_tipos},
+               NVL(SUM(mt.MANTENIMIENTOS), 0) AS MANTENIMIENTOS
+        FROM OPERACIONES o
+        LEFT JOIN CLIENTES c ON c.ID_CLIENTE = o.ID_CLIENTE
+        LEFT JOIN (
+                SELECT v.ID_OPERACION, COUNT(*) AS VENTAS,
+                       {conteo_tipos}
+                FROM VENTAS v
+                {joins_tipos}
+                GROUP BY v.ID_OPERACION
+            ) vt ON vt.ID_OPERACION = o.ID_OPERACION
+        LEFT JOIN (
+                SELECT ID_OPERACION, COUNT(*) AS MANTENIMIENTOS
+                FROM MANTENIMIENTOS GROUP BY ID_OPERACION
+            ) mt ON mt.ID_OPERACION = o.ID_OPERACION
+        WHERE o.FECHA >= ADD_MONTHS(TRUNC(SYSDATE, 'MM'), -1)
+        GROUP BY GROUPING SETS (
+            (TRUNC(o.FECHA, 'MM')),
+            (TRUNC(o.FECHA, 'MM'), c.NOMBRE, c.APELLIDO, c.CORREO)
+        )
+    """
+
+def _porcentaje_ganancia(ganancia_mes, ganancia_anterior):
+    # Mismo cálculo que /api/ganancia/mes-vs-anterior
+    if ganancia_anterior == 0:
+        return 100.0 if ganancia_mes > 0 else 0.0
+    return round(((ganancia_mes - ganancia_anterior) / abs(ganancia_anterior)) * 100, 2)
+
+def _armar_resumen(filas_operaciones, ingresos):
+    por_mes, por_cliente = {}, []
+    mes_actual = None
+    for fila in filas_operaciones:
+        mes_actual = fila['MES_ACTUAL']
+        if fila['NIVEL'] == 0b111:        # (mes)
+            por_mes[fila['MES']] = fila
+        elif fila['CON_CLIENTE']:         # (mes, cliente), solo operaciones con cliente
+            por_cliente.append(fila)
+    if mes_actual is None:
+        # Sin operaciones en el periodo la consulta no devuelve filas: se usa la fecha local
+        mes_actual = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    mes_anterior = mes_actual.replace(year=mes_actual.year - 1, month=12) if mes_actual.month == 1 \
+        else mes_actual.replace(month=mes_actual.month - 1)
+    actual = por_mes.get(mes_actual, {})
+    anterior = por_mes.get(mes_anterior, {})
+
+    ganancia_mes = actual.get('GANANCIA', 0)
+    ganancia_anterior = anterior.get('GANANCIA', 0)
+    total_ventas = actual.get('VENTAS', 0)
+
+    top_clientes = sorted((f for f in por_cliente if f['MES'] == mes_actual and f['GASTO'] and f['GASTO'] > 0),
+                          key=lambda f: f['GASTO'], reverse=True)[:10]
+
+    licencias = []
+    for i, tipo in enumerate(TIPOS_LICENCIA.values()):
+        cantidad = actual.get(f'LIC{i}') or 0
+        licencias.append({
+            'nombre': tipo['nombre'],
+            'cantidad': cantidad,
+            'porcentaje': round((cantidad / total_ventas) * 100, 2) if total_ventas > 0 else 0.0
+        })
+
+    return {
+        'estadisticasMes': {
+            'clientesMes': actual.get('CLIENTES', 0),
+            'operacionesMes': actual.get('OPERACIONES', 0),
+            'gananciaMes': ganancia_mes
+        },
+        'topClientesGastoMes': [
+            {
+                'nombre': f['NOMBRE'],
+                'apellido': f['APELLIDO'],
+                'correo': f['CORREO'],
+                'total_gastado': float(f['GASTO'])
+            }
+            for f in top_clientes
+        ],
+        'ingresosUltimos4Meses': ingresos,
+        'porcentajeVentasLicenciasMes': licencias,
+        'gananciaMesVsAnterior': {
+            'gananciaMes': ganancia_mes,
+            'gananciaAnterior': ganancia_anterior,
+            'porcentaje': _porcentaje_ganancia(ganancia_mes, ganancia_anterior)
+        },
+        'mantenimientosMes': actual.get('MANTENIMIENTOS', 0)
+    }
+
+def _consultar_resumen():
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_sql_operaciones())
+            columnas = [d[0] for d in cursor.description]
+            filas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+        finally:
+            cursor.close()
+    # Mismo bloque que /api/ingresos/ultimos-4-meses (4 meses fijos, los vacíos con 0)
+    return _armar_resumen(filas, ingresos_por_tipo())
+
+
+def register_dashboard_routes(app):
+
+    @app.route('/api/dashboard', methods=['GET'])
+    def get_dashboard():
+        try:
+            datos, generado, edad = obtener('dashboard', TABLAS_DASHBOARD,
+                                            current_app.config['DASHBOARD_TTL'], _consultar_resumen)
+            # Los vencimientos no pasan por la caché: el índice ya está en memoria
+            respuesta = jsonify(dict(datos, vencimientosSemana=vencimientos_semana(),
+                                     generado=generado.isoformat(timespec='seconds'),
+                                     cacheEdadSegundos=round(edad, 1)))
+            respuesta.headers['Age'] = str(int(edad))
+            respuesta.headers['Cache-Control'] = 'no-cache'
+            return respuesta
+        except Exception as e:
+            current_app.logger.error(f"Error al generar el resumen del dashboard: {str(e)}")
+            return jsonify({'error': str(e)}), 500
@@ -1,7 +1,35 @@
-from flask import g, current_app
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, current_app, has_app_context
 
 oracle_pool = None
 
+# Tiempos de espera (ms) de las últimas adquisiciones, para los percentiles de /api/admin/pool
+ACQUIRE_SAMPLES = 1000
+_metricas_lock = threading.Lock()
+_tiempos_adquisicion = deque(maxlen=ACQUIRE_SAMPLES)
+_metricas = {'adquisiciones': 0, 'fallos': 0, 'esperando': 0, 'max_esperando': 0}
+
+
+class ConexionNoDisponible(Exception):
+    """No hay pool o no se obtuvo una conexión libre dentro del tiempo límite."""
+
+
+def _getmode(oracledb, nombre):
+    modos = {
+        'wait': oracledb.POOL_GETMODE_WAIT,
+        'timedwait': oracledb.POOL_GETMODE_TIMEDWAIT,
+        'nowait': oracledb.POOL_GETMODE_NOWAIT,
+        'forceget': oracledb.POOL_GETMODE_FORCEGET,
+    }
+    try:
+        return modos[nombre.lower()]
+    except KeyError:
+        raise RuntimeError(f"DB_POOL_GETMODE no válido: {nombre}. Usa wait, timedwait, nowait o forceget.")
+
 def init_oracle_pool(oracledb, app):
     global oracle_pool
     try:
@@ -9,11 +37,18 @@ def init_oracle_pool(oracledb, app):
             user=app.config['ORACLE_USER'],
             password=app.config['ORACLE_PASSWORD'],
             dsn=app.config['ORACLE_DSN'],
-            min=2,
-            max=5,
-            increment=1
+            min=app.config['DB_POOL_MIN'],
+            max=app.config['DB_POOL_MAX'],
+            increment=app.config['DB_POOL_INCREMENT'],
+            getmode=_getmode(oracledb, app.config['DB_POOL_GETMODE']),
+            wait_timeout=app.config['DB_ACQUIRE_TIMEOUT_MS'],
+            ping_interval=app.config['DB_POOL_PING_INTERVAL'],
+            max_lifetime_session=app.config['DB_POOL_MAX_LIFETIME'],
+            stmtcachesize=app.config['DB_STMT_CACHE_SIZE']
         )
-        app.logger.info("Oracle Connection Pool creado exitosamente.")
+        app.logger.info(f"Oracle Connection Pool creado exitosamente "
+                        f"(min={app.config['DB_POOL_MIN']}, max={app.config['DB_POOL_MAX']}, "
+                        f"getmode={app.config['DB_POOL_GETMODE']}).")
     except Exception as e:
         app.logger.error(f"Error al crear Oracle Connection Pool: {e}")
         app.logger.error("Verifica ORACLE_USER, ORACLE_PASSWORD y ORACLE_DSN en tu configuración.")
@@ -21,13 +56,128 @@ def init_oracle_pool(oracledb, app):
         # Lanza excepción para detener la app si el pool no se crea
         raise RuntimeError("No se pudo crear el pool de conexiones de Oracle. Revisa la configuración y la conexión a la base de datos.")
 
+def _adquirir():
+    """Toma una conexión del pool registrando cuánto se esperó por ella."""
+    if not oracle_pool:
+        raise ConexionNoDisponible("Error crítico: El pool de conexiones de Oracle no está disponible.")
+    with _metricas_lock:
+        _metricas['esperando'] += 1
+        _metricas['max_esperando'] = max(_metricas['max_esperando'], _metricas['esperando'])
+    inicio = time.perf_counter()
+    try:
+        conn = oracle_pool.acquire()
+    except Exception as e:
+        with _metricas_lock:
+            _metricas['fallos'] += 1
+        raise ConexionNoDisponible(f"No se pudo obtener una conexión de la base de datos: {e}") from e
+    finally:
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        with _metricas_lock:
+            _metricas['esperando'] -= 1
+            _tiempos_adquisicion.append(espera_ms)
+    with _metricas_lock:
+        _metricas['adquisiciones'] += 1
+    return conn
+
 def get_db():
+    """
+    Compatibilidad: conexión ligada al contexto de la app, que se devuelve al
+    pool en teardown_db o antes con liberar_db(). Para retenerla solo durante el
+    SQL usa conexion().
+    """
     if 'db' not in g:
-        if not oracle_pool:
-            raise Exception("Error crítico: El pool de conexiones de Oracle no está disponible.")
         try:
-            g.db = oracle_pool.acquire()
-        except Exception as e:
+            g.db = _adquirir()
+        except ConexionNoDisponible as e:
             current_app.logger.error(f"Error al adquirir conexión del pool: {e}")
             raise
     return g.db
+
+def liberar_db():
+    """Devuelve al pool la conexión de g.db (si la hay) sin esperar al teardown."""
+    conn = g.pop('db', None) if has_app_context() else None
+    if conn is not None:
+        conn.close()
+
+@contextmanager
+def conexion(propia=False):
+    """
+    Conexión retenida solo dentro del bloque:
+
+        with conexion() as conn:
+            ...SQL...
+        ...post-proceso (JSON, correos, mirror) sin ocupar el pool...
+
+    Si la petición ya tiene una conexión en g.db se reutiliza y no se libera
+    (la gestiona quien la pidió). Mientras dura el bloque, get_db() devuelve la
+    misma conexión, así que el código existente anidado sigue funcionando.
+    Fuera de un contexto de app (hilos) solo adquiere y libera.
+
+    Con propia=True siempre se usa una conexión aparte, ajena a g.db: su
+    commit no confirma la transacción en curso de la petición.
+    Si el bloque termina con una excepción, lo no confirmado se revierte
+    antes de devolver la conexión (los except de las rutas ya no la tienen).
+    """
+    if not propia and has_app_context() and 'db' in g:
+        yield g.db
+        return
+    conn = _adquirir()
+    en_contexto = not propia and has_app_context()
+    if en_contexto:
+        g.db = conn
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if en_contexto and g.get('db') is conn:
+            g.pop('db')
+        conn.close()
+
+def con_conexion(funcion):
+    """Decorador: ejecuta funcion(conn, ...) dentro de conexion()."""
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with conexion() as conn:
+            return funcion(conn, *args, **kwargs)
+    return envoltura
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return round(ordenados[indice], 2)
+
+def pool_stats():
+    """Estado del pool y tiempos de adquisición (para /api/admin/pool)."""
+    with _metricas_lock:
+        tiempos = sorted(_tiempos_adquisicion)
+        metricas = dict(_metricas)
+    estado = {
+        'adquisiciones': metricas['adquisiciones'],
+        'fallos': metricas['fallos'],
+        'esperando': metricas['esperando'],
+        'maxEsperando': metricas['max_esperando'],
+        'esperaMs': {
+            'muestras': len(tiempos),
+            'p50': _percentil(tiempos, 50),
+            'p90': _percentil(tiempos, 90),
+            'p99': _percentil(tiempos, 99),
+            'max': round(tiempos[-1], 2) if tiempos else None,
+        },
+    }
+    if oracle_pool:
+        estado.update({
+            'abiertas': oracle_pool.opened,
+            'ocupadas': oracle_pool.busy,
+            'min': oracle_pool.min,
+            'max': oracle_pool.max,
+            'incremento': oracle_pool.increment,
+            'getmode': oracle_pool.getmode,
+            'waitTimeoutMs': oracle_pool.wait_timeout,
+            'pingInterval': oracle_pool.ping_interval,
+            'maxLifetimeSession': oracle_pool.max_lifetime_session,
+            'stmtCacheSize': oracle_pool.stmtcachesize,
+        })
+    return estado
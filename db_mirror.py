@@ -2,12 +2,89 @@
 import os
 import csv
 import re
-from flask import current_app
-import datetime
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Ruta base para los archivos de texto que actúan como espejo de la BD
 BASE_DIR = os.path.join(os.path.dirname(__file__), 'db_mirror_txt')
 
+# Cada cambio se añade al diario (<TABLA>.journal) de su tabla. El compactador
+# lo integra en el CSV cuando supera alguno de estos umbrales.
+MIRROR_JOURNAL_MAX_BYTES = 256 * 1024
+MIRROR_JOURNAL_MAX_AGE = 300  # segundos desde el primer cambio sin compactar
+MIRROR_COMPACT_INTERVAL = 30  # cada cuántos segundos revisa el compactador
+
+# Los cambios se escriben en disco desde un hilo propio, alimentado por una cola
+# acotada. Si la cola se llena, quien registra el cambio espera (contrapresión).
+MIRROR_QUEUE_MAX = 10000
+MIRROR_BATCH_MAX = 500  # cambios que el escritor toma de la cola por vuelta
+MIRROR_SHUTDOWN_TIMEOUT = 10  # segundos para vaciar la cola al cerrar el proceso
+
+# Filas por viaje a la BD al exportar una tabla completa (export_table)
+MIRROR_EXPORT_ARRAYSIZE = 1000
+
+# Marca de agua (MAX(ORA_ROWSCN)) de cada tabla en el último refresco incremental
+REFRESH_STATE_PATH = os.path.join(BASE_DIR, '_refresh_state.json')
+# Claves listadas por tabla en la respuesta de un dry-run
+MIRROR_DIFF_MAX_KEYS = 50
+
+# Clave de cada tabla en memoria: por defecto su primera columna (la clave
+# primaria). Las tablas de relación guardan varias filas por operación o
+# usuario, así que usan la combinación de sus columnas; su ID propio
+# (ID_MANTENIMIENTO_DISP, ...) no lo conocen las rutas que escriben en ellas.
+CLAVES_TABLAS = {
+    'MANTENIMIENTO_DISPOSITIVO': ('ID_OPERACION', 'ID_DISPOSITIVO'),
+    'VENTA_DISPOSITIVO': ('ID_OPERACION', 'ID_DISPOSITIVO'),
+    'USUARIO_ROLES': ('ID_USUARIO', 'ID_ROL'),
+}
+SEPARADOR_CLAVE = '|'
+
+# Índice secundario por tabla (campo por el que se suelen buscar registros)
+INDICES_SECUNDARIOS = {
+    'OPERACIONES': 'ID_CLIENTE',
+    'DISPOSITIVOS': 'ID_CLIENTE',
+    'VENTAS': 'ID_LICENCIA',
+    'MANTENIMIENTO_DISPOSITIVO': 'ID_OPERACION',
+    'VENTA_DISPOSITIVO': 'ID_OPERACION',
+    'USUARIO_ROLES': 'ID_USUARIO',
+}
+
+# El espejo se usa también desde hilos sin contexto de Flask (escritor)
+logger = logging.getLogger(__name__)
+
+_tablas = {}
+_tablas_lock = threading.Lock()
+# Generación por tabla: sube con cada cambio o exportación (ver version()).
+# _ARRANQUE distingue las generaciones de distintos arranques del proceso.
+_ARRANQUE = f"{os.getpid():x}{int(time.time()):x}"
+_generaciones = {}
+_generaciones_lock = threading.Lock()
+# Funciones avisadas de cada cambio (ver al_cambiar)
+_oyentes = []
+_compactacion_lock = threading.Lock()
+_estado_refresco_lock = threading.Lock()
+
+_cola = queue.Queue(maxsize=MIRROR_QUEUE_MAX)
+_FIN = object()
+_escritor = None
+_escritor_lock = threading.Lock()
+_metricas = {
+    'encolados': 0,
+    'escritos': 0,
+    'lotes': 0,
+    'esperas_cola_llena': 0,
+    'max_en_cola': 0,
+    'ultimo_retraso': 0.0,
+    'ultima_escritura': None,
+    'errores': 0,
+}
+
+
 def normalize_id(id_value):
     """
     Normaliza un ID removiendo corchetes y espacios extra.
@@ -27,112 +104,757 @@ def get_mirror_path(table_name):
     filename = f"{table_name.upper()}.txt"
     return os.path.join(BASE_DIR, filename)
 
+def get_journal_path(table_name):
+    """Ruta al diario de cambios pendientes de compactar de una tabla."""
+    return os.path.join(BASE_DIR, f"{table_name.upper()}.journal")
+
+def nombre_tabla(table_name):
+    """
+    Nombre de tabla en mayúsculas, apto para interpolar en el SQL. Lanza
+    ValueError si no es un identificador simple de Oracle.
+    """
+    nombre = str(table_name).upper()
+    if not re.fullmatch(r'[A-Z][A-Z0-9_$#]{0,127}', nombre):
+        raise ValueError(f"Nombre de tabla no válido: {table_name}")
+    return nombre
+
+def _a_texto(valor):
+    """Convierte un valor al texto que se guarda en el CSV (None -> '')."""
+    return '' if valor is None else str(valor)
+
+
+def _campos_clave(nombre, fields):
+    return CLAVES_TABLAS.get(nombre) or tuple(fields[:1])
+
+
+class _TablaEspejo:
+    """
+    Copia en memoria de un archivo espejo: filas indexadas por su clave
+    normalizada (ver CLAVES_TABLAS) y un índice secundario opcional
+    (valor -> conjunto de claves).
+    """
+
+    def __init__(self, nombre, fields):
+        self.nombre = nombre
+        self.fields = list(fields)
+        self.campos_clave = _campos_clave(nombre, self.fields)
+        self.filas = {}
+        self.campo_secundario = INDICES_SECUNDARIOS.get(nombre)
+        self.indice_secundario = {}
+        self.lock = threading.RLock()
+        # Estado del diario: archivo abierto en modo 'a', tamaño y antigüedad
+        self.journal_lock = threading.Lock()
+        self.journal_file = None
+        self.journal_bytes = 0
+        self.journal_desde = None
+        # Último momento (time.time()) en que el espejo recibió datos de la BD
+        self.actualizado = None
+
+    def _indexar(self, clave, fila):
+        if self.campo_secundario:
+            valor = normalize_id(fila.get(self.campo_secundario))
+            self.indice_secundario.setdefault(valor, set()).add(clave)
+
+    def _desindexar(self, clave, fila):
+        if self.campo_secundario:
+            valor = normalize_id(fila.get(self.campo_secundario))
+            claves = self.indice_secundario.get(valor)
+            if claves:
+                claves.discard(clave)
+                if not claves:
+                    del self.indice_secundario[valor]
+
+    def poner(self, clave, fila):
+        anterior = self.filas.get(clave)
+        if anterior is not None:
+            self._desindexar(clave, anterior)
+        self.filas[clave] = fila
+        self._indexar(clave, fila)
+        return anterior
+
+    def quitar(self, clave):
+        anterior = self.filas.pop(clave, None)
+        if anterior is not None:
+            self._desindexar(clave, anterior)
+        return anterior
+
+    def vaciar(self):
+        self.filas.clear()
+        self.indice_secundario.clear()
+
+    @property
+    def id_field(self):
+        """Nombre de la clave ('A' o, si es compuesta, 'A|B'), como se anota en el diario."""
+        return SEPARADOR_CLAVE.join(self.campos_clave) or None
+
+    def clave(self, fila):
+        """Clave normalizada de una fila."""
+        if len(self.campos_clave) == 1:
+            return normalize_id(fila.get(self.campos_clave[0]))
+        return SEPARADOR_CLAVE.join(normalize_id(fila.get(c)) or '' for c in self.campos_clave)
+
+    def claves_por(self, campo, valor):
+        """Claves de las filas con campo == valor (por la clave o el índice secundario si se puede)."""
+        buscado = normalize_id(valor)
+        if (campo,) == tuple(self.campos_clave):
+            return [buscado] if buscado in self.filas else []
+        if campo == self.campo_secundario:
+            return list(self.indice_secundario.get(buscado, ()))
+        return [c for c, f in self.filas.items() if normalize_id(f.get(campo)) == buscado]
+
+    def usar_campos(self, fields):
+        """
+        Añade a la cabecera los campos del llamador que aún no tiene. Nunca quita
+        columnas: las rutas suelen escribir solo una parte de las de la BD.
+        """
+        nuevos = [f for f in (fields or []) if f not in self.fields]
+        if nuevos:
+            self.fields.extend(nuevos)
+        if not self.campos_clave:
+            self.campos_clave = _campos_clave(self.nombre, self.fields)
+
+    def aplicar(self, cambio):
+        """Aplica un registro del diario (al registrar el cambio o al reproducirlo)."""
+        op = cambio['op']
+        if op == 'U':
+            self.poner(self.clave(cambio['r']), cambio['r'])
+        elif op == 'D':
+            campo = cambio.get('i')
+            if campo in (None, self.id_field):
+                self.quitar(cambio['k'])
+            else:
+                # Diarios anteriores: borrado por otra columna que la clave
+                for clave in self.claves_por(campo, cambio['k']):
+                    self.quitar(clave)
+        elif op == 'R':
+            self.vaciar()
+            self.fields = list(cambio.get('f') or self.fields)
+            self.campos_clave = _campos_clave(self.nombre, self.fields)
+
+
+def _cargar_tabla(nombre, fields=None):
+    """
+    Lee el archivo espejo una sola vez y construye la tabla en memoria: primero el
+    CSV (snapshot) y después los cambios de su diario que aún no se compactaron.
+    """
+    filepath = get_mirror_path(nombre)
+    tabla = None
+    if os.path.exists(filepath):
+        with open(filepath, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            tabla = _TablaEspejo(nombre, reader.fieldnames or [])
+            tabla.usar_campos(fields)
+            for row in reader:
+                tabla.poner(tabla.clave(row), row)
+    if tabla is None:
+        tabla = _TablaEspejo(nombre, fields or [])
+    _reproducir_diario(tabla)
+    journal_path = get_journal_path(nombre)
+    fechas = [os.path.getmtime(p) for p in (filepath, journal_path) if os.path.exists(p)]
+    tabla.actualizado = max(fechas) if fechas else None
+    logger.debug(f"MIRROR: {len(tabla.filas)} registros cargados para {nombre}")
+    return tabla
+
+def _reproducir_diario(tabla):
+    """
+    Aplica sobre la tabla los cambios pendientes de su diario, incluido el de una
+    compactación que no llegó a terminar.
+    """
+    journal_path = get_journal_path(tabla.nombre)
+    aplicados = 0
+    for path in (f"{journal_path}.compacting", journal_path):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    tabla.aplicar(json.loads(linea))
+                    aplicados += 1
+                except (ValueError, KeyError):
+                    # Una línea incompleta solo puede ser la última (escritura interrumpida)
+                    logger.warning(f"MIRROR WARNING: Línea inválida ignorada en {path}")
+        tabla.journal_bytes += os.path.getsize(path)
+    if tabla.journal_bytes:
+        tabla.journal_desde = time.monotonic()
+        logger.info(f"MIRROR: {aplicados} cambios del diario aplicados a {tabla.nombre}")
+
+def _obtener_tabla(table_name, fields=None):
+    """Devuelve la tabla en memoria, cargándola desde disco la primera vez."""
+    nombre = table_name.upper()
+    tabla = _tablas.get(nombre)
+    if tabla is None:
+        with _tablas_lock:
+            tabla = _tablas.get(nombre)
+            if tabla is None:
+                tabla = _cargar_tabla(nombre, fields)
+                _tablas[nombre] = tabla
+    return tabla
+
+def _escribir_snapshot(nombre, fields, filas):
+    """Vuelca la tabla completa a un archivo temporal y lo renombra de forma atómica."""
+    filepath = get_mirror_path(nombre)
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(filas)
+    os.replace(tmp_path, filepath)
+
+def _nueva_generacion(nombre, cambios=(None,)):
+    with _generaciones_lock:
+        _generaciones[nombre] = _generaciones.get(nombre, 0) + 1
+    for cambio in cambios:
+        for oyente in _oyentes:
+            try:
+                oyente(nombre, cambio)
+            except Exception as e:
+                logger.error(f"MIRROR ERROR: oyente de cambios falló para {nombre}: {e}")
+
+def al_cambiar(funcion):
+    """
+    Registra funcion(tabla, cambio), llamada tras cada cambio del espejo: cambio
+    es el registro del diario ({'op': 'U'|'D'|'R', 'k': clave, 'r': fila}) o None
+    si se reemplazó la tabla completa (exportación o refresco desde la BD).
+    Se llama con el lock de la tabla tomado, así que debe ser rápida.
+    """
+    _oyentes.append(funcion)
+
+def _registrar_cambio(tabla, cambio):
+    """
+    Encola el cambio para el hilo escritor. Se llama con tabla.lock tomado, así
+    el orden en la cola es el mismo en que se aplicaron los cambios en memoria.
+    Con una lista de cambios se encolan juntos, como un solo elemento.
+    """
+    cambios = cambio if isinstance(cambio, list) else [cambio]
+    _iniciar_escritor()
+    tabla.actualizado = time.time()
+    _nueva_generacion(tabla.nombre, cambios)
+    item = (tabla, cambio, time.monotonic())
+    try:
+        _cola.put_nowait(item)
+    except queue.Full:
+        _metricas['esperas_cola_llena'] += 1
+        logger.warning("MIRROR WARNING: Cola del espejo llena, esperando al escritor")
+        _cola.put(item)
+    _metricas['encolados'] += len(cambios)
+    _metricas['max_en_cola'] = max(_metricas['max_en_cola'], _cola.qsize())
+
+def _escribir_diario(tabla, cambios):
+    """Añade al diario de la tabla un grupo de cambios con una sola escritura secuencial."""
+    texto = ''.join(json.dumps(c, ensure_ascii=False, separators=(',', ':')) + '\n' for c in cambios)
+    with tabla.journal_lock:
+        if tabla.journal_file is None:
+            tabla.journal_file = open(get_journal_path(tabla.nombre), 'a', encoding='utf-8')
+        tabla.journal_file.write(texto)
+        tabla.journal_file.flush()
+        tabla.journal_bytes += len(texto)
+        if tabla.journal_desde is None:
+            tabla.journal_desde = time.monotonic()
+
+def _escribir_lote(lote):
+    """Escribe un lote de la cola agrupando los cambios consecutivos de una misma tabla."""
+    i = 0
+    escritos = 0
+    while i < len(lote):
+        tabla = lote[i][0]
+        j = i
+        while j < len(lote) and lote[j][0] is tabla:
+            j += 1
+        cambios = [c for item in lote[i:j] for c in (item[1] if isinstance(item[1], list) else [item[1]])]
+        try:
+            _escribir_diario(tabla, cambios)
+        except Exception as e:
+            _metricas['errores'] += 1
+            logger.error(f"MIRROR ERROR al escribir el diario de {tabla.nombre}: {e}")
+        escritos += len(cambios)
+        i = j
+    _metricas['escritos'] += escritos
+    _metricas['lotes'] += 1
+    _metricas['ultimo_retraso'] = time.monotonic() - lote[-1][2]
+    _metricas['ultima_escritura'] = time.time()
+
+def _bucle_escritor():
+    """Hilo escritor: vacía la cola en lotes y compacta los diarios cuando toca."""
+    ultima_revision = time.monotonic()
+    while True:
+        try:
+            item = _cola.get(timeout=MIRROR_COMPACT_INTERVAL)
+        except queue.Empty:
+            item = None
+        lote = []
+        terminar = False
+        while item is not None:
+            if item is _FIN:
+                terminar = True
+                _cola.task_done()
+                break
+            lote.append(item)
+            if len(lote) >= MIRROR_BATCH_MAX:
+                break
+            try:
+                item = _cola.get_nowait()
+            except queue.Empty:
+                item = None
+        if lote:
+            _escribir_lote(lote)
+            for _ in lote:
+                _cola.task_done()
+        ahora = time.monotonic()
+        if terminar or ahora - ultima_revision >= MIRROR_COMPACT_INTERVAL or any(
+                t.journal_bytes >= MIRROR_JOURNAL_MAX_BYTES for t in {item[0] for item in lote}):
+            _compactar_pendientes()
+            ultima_revision = ahora
+        if terminar:
+            return
+
+def _iniciar_escritor():
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                _escritor = threading.Thread(target=_bucle_escritor, name='mirror-escritor', daemon=True)
+                _escritor.start()
+
+def _requiere_compactacion(tabla, ahora):
+    if not tabla.journal_bytes:
+        return False
+    return (tabla.journal_bytes >= MIRROR_JOURNAL_MAX_BYTES
+            or ahora - tabla.journal_desde >= MIRROR_JOURNAL_MAX_AGE)
+
+def compact_table(table_name):
+    """
+    Integra el diario de la tabla en su CSV. El diario se aparta (renombrado a
+    .compacting) en el mismo instante en que se copia la tabla, de modo que los
+    cambios nuevos van a un diario limpio mientras se escribe el CSV. Si la
+    compactación se interrumpe, ambos diarios se vuelven a aplicar al cargar.
+    """
+    tabla = _obtener_tabla(table_name)
+    journal_path = get_journal_path(tabla.nombre)
+    apartado = f"{journal_path}.compacting"
+    with _compactacion_lock:
+        with tabla.lock, tabla.journal_lock:
+            fields = list(tabla.fields)
+            filas = list(tabla.filas.values())
+            if tabla.journal_file is not None:
+                tabla.journal_file.close()
+                tabla.journal_file = None
+            if os.path.exists(journal_path):
+                os.replace(journal_path, apartado)
+            tabla.journal_bytes = 0
+            tabla.journal_desde = None
+        _escribir_snapshot(tabla.nombre, fields, filas)
+        if os.path.exists(apartado):
+            os.remove(apartado)
+    logger.debug(f"MIRROR: Diario de {tabla.nombre} compactado en {get_mirror_path(tabla.nombre)}")
+
+def _compactar_pendientes(forzar=False):
+    ahora = time.monotonic()
+    for tabla in list(_tablas.values()):
+        if (forzar and tabla.journal_bytes) or _requiere_compactacion(tabla, ahora):
+            try:
+                compact_table(tabla.nombre)
+            except Exception as e:
+                logger.error(f"MIRROR ERROR al compactar la tabla {tabla.nombre}: {e}")
+
+def flush():
+    """Espera a que el escritor vacíe la cola y compacta todos los diarios pendientes."""
+    if _escritor is not None and _escritor.is_alive():
+        _cola.join()
+    _compactar_pendientes(forzar=True)
+
+def _cerrar():
+    """Al cerrar el proceso: detiene el escritor tras vaciar la cola y compacta."""
+    if _escritor is not None and _escritor.is_alive():
+        _cola.put(_FIN)
+        _escritor.join(MIRROR_SHUTDOWN_TIMEOUT)
+        if _escritor.is_alive():
+            logger.error(f"MIRROR ERROR: El escritor no terminó; quedan {_cola.qsize()} cambios sin escribir")
+            return
+    _compactar_pendientes(forzar=True)
+
+atexit.register(_cerrar)
+
+def status():
+    """Estado de la cola de escritura y de los diarios (para /api/mirror/status)."""
+    with _cola.mutex:
+        pendientes = len(_cola.queue)
+        primero = next((item for item in _cola.queue if item is not _FIN), None)
+    ahora = time.monotonic()
+    return {
+        'escritorActivo': _escritor is not None and _escritor.is_alive(),
+        'enCola': pendientes,
+        'capacidadCola': MIRROR_QUEUE_MAX,
+        'retrasoPendienteSeg': round(ahora - primero[2], 3) if primero else 0.0,
+        'ultimoRetrasoSeg': round(_metricas['ultimo_retraso'], 3),
+        'ultimaEscritura': _metricas['ultima_escritura'],
+        'encolados': _metricas['encolados'],
+        'escritos': _metricas['escritos'],
+        'lotes': _metricas['lotes'],
+        'maxEnCola': _metricas['max_en_cola'],
+        'esperasColaLlena': _metricas['esperas_cola_llena'],
+        'errores': _metricas['errores'],
+        'diarios': {
+            nombre: {'bytes': t.journal_bytes,
+                     'antiguedadSeg': round(ahora - t.journal_desde, 1) if t.journal_desde else 0.0}
+            for nombre, t in _tablas.items() if t.journal_bytes
+        },
+    }
+
+def export_table(cursor, table_name, arraysize=MIRROR_EXPORT_ARRAYSIZE):
+    """
+    Reemplaza el espejo de una tabla con su contenido actual en la BD.
+    Las filas se leen por bloques con fetchmany y se escriben con un único
+    archivo temporal que después se renombra, así la memoria usada no depende
+    del tamaño de la tabla. Devuelve el número de filas exportadas.
+    """
+    nombre = nombre_tabla(table_name)
+    cursor.arraysize = arraysize
+    cursor.prefetchrows = arraysize + 1
+    cursor.execute(f"SELECT * FROM {nombre}")
+    fields = [desc[0] for desc in cursor.description]
+    filepath = get_mirror_path(nombre)
+    tmp_path = f"{filepath}.tmp"
+    total = 0
+    with open(tmp_path, 'w', encoding='utf-8', newline='', buffering=1024 * 1024) as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            writer.writerows([_a_texto(v) for v in row] for row in rows)
+            total += len(rows)
+    _reemplazar_snapshot(nombre, fields, tmp_path)
+    logger.info(f"MIRROR: {total} registros exportados a {filepath}")
+    return total
+
+def export_tables(pool, tables, workers):
+    """
+    Exporta varias tablas en paralelo: cada hilo toma su propia conexión del pool
+    y ejecuta export_table. Devuelve {tabla: {'registros', 'segundos'}} y, si una
+    tabla falla, {'error'} en su lugar sin detener al resto.
+    """
+    def exportar(table):
+        inicio = time.perf_counter()
+        try:
+            with pool.acquire() as conn:
+                cursor = conn.cursor()
+                try:
+                    registros = export_table(cursor, table)
+                finally:
+                    cursor.close()
+            return table, {'registros': registros, 'segundos': round(time.perf_counter() - inicio, 3)}
+        except Exception as e:
+            logger.error(f"MIRROR ERROR al exportar la tabla {table}: {e}")
+            return table, {'error': str(e), 'segundos': round(time.perf_counter() - inicio, 3)}
+
+    workers = max(1, min(workers, len(tables)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mirror-export') as executor:
+        return dict(executor.map(exportar, tables))
+
+def _leer_estado_refresco():
+    if not os.path.exists(REFRESH_STATE_PATH):
+        return {}
+    with open(REFRESH_STATE_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _guardar_estado_refresco(table_name, scn):
+    with _estado_refresco_lock:
+        estado = _leer_estado_refresco()
+        estado[table_name] = {'scn': scn, 'fecha': time.strftime('%Y-%m-%d %H:%M:%S')}
+        tmp_path = f"{REFRESH_STATE_PATH}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=1)
+        os.replace(tmp_path, REFRESH_STATE_PATH)
+
+def refresh_table_incremental(cursor, table_name, dry_run=False, arraysize=MIRROR_EXPORT_ARRAYSIZE):
+    """
+    Sincroniza el espejo de una tabla enviando solo lo que cambió desde el último
+    refresco. Se usa MAX(ORA_ROWSCN) como marca de agua: si no cambió (y tampoco el
+    número de filas) la tabla se omite; si cambió, se leen solo las filas con
+    ORA_ROWSCN mayor a la marca y se comparan con el espejo, porque ORA_ROWSCN es
+    por bloque y puede incluir filas que no cambiaron. Las filas borradas se
+    detectan comparando las claves cuando el conteo no cuadra.
+    Con dry_run=True se devuelve la diferencia sin aplicar nada.
+    """
+    nombre = nombre_tabla(table_name)
+    tabla = _obtener_tabla(nombre)
+    marca = _leer_estado_refresco().get(nombre, {}).get('scn')
+
+    try:
+        cursor.execute(f"SELECT MAX(ORA_ROWSCN), COUNT(*) FROM {nombre}")
+        scn_actual, total_bd = cursor.fetchone()
+    except Exception as e:
+        # Algunas tablas (p. ej. externas) no exponen ORA_ROWSCN: se compara todo
+        logger.warning(f"MIRROR WARNING: ORA_ROWSCN no disponible en {nombre}, se compara la tabla completa: {e}")
+        cursor.execute(f"SELECT COUNT(*) FROM {nombre}")
+        scn_actual, total_bd = None, cursor.fetchone()[0]
+        marca = None
+
+    with tabla.lock:
+        total_espejo = len(tabla.filas)
+    resultado = {'tabla': nombre, 'marcaAnterior': marca, 'marcaActual': scn_actual,
+                 'nuevos': [], 'modificados': [], 'eliminados': [], 'revisados': 0}
+    if marca is not None and scn_actual is not None and scn_actual <= marca and total_bd == total_espejo:
+        resultado['sinCambios'] = True
+        return resultado
+
+    cursor.arraysize = arraysize
+    cursor.prefetchrows = arraysize + 1
+    if marca is not None and scn_actual is not None:
+        cursor.execute(f"SELECT * FROM {nombre} WHERE ORA_ROWSCN > :marca", marca=marca)
+    else:
+        cursor.execute(f"SELECT * FROM {nombre}")
+    fields = [desc[0] for desc in cursor.description]
+    if tabla.fields and set(fields) != set(tabla.fields):
+        # Cambió la estructura de la tabla (o el espejo solo tenía las columnas
+        # que escriben las rutas): una exportación completa es más simple
+        if dry_run:
+            resultado['requiereExportacion'] = True
+            return resultado
+        resultado['exportados'] = export_table(cursor, nombre, arraysize)
+        _guardar_estado_refresco(nombre, scn_actual)
+        return resultado
+
+    cambios = []
+    with tabla.lock:
+        if not tabla.campos_clave:
+            tabla.campos_clave = _campos_clave(nombre, fields)
+        campos_clave = tabla.campos_clave
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        resultado['revisados'] += len(rows)
+        with tabla.lock:
+            for row in rows:
+                fila = {k: _a_texto(v) for k, v in zip(fields, row)}
+                clave = tabla.clave(fila)
+                anterior = tabla.filas.get(clave)
+                if anterior is None:
+                    resultado['nuevos'].append(clave)
+                elif any(anterior.get(k, '') != v for k, v in fila.items()):
+                    resultado['modificados'].append(clave)
+                else:
+                    continue
+                cambios.append({'op': 'U', 't': nombre, 'i': tabla.id_field, 'k': clave, 'r': fila})
+
+    if total_bd != total_espejo + len(resultado['nuevos']):
+        cursor.execute(f"SELECT {', '.join(campos_clave)} FROM {nombre}")
+        claves_bd = set()
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            claves_bd.update(tabla.clave(dict(zip(campos_clave, row))) for row in rows)
+        with tabla.lock:
+            resultado['eliminados'] = [clave for clave in tabla.filas if clave not in claves_bd]
+        cambios.extend({'op': 'D', 't': nombre, 'i': tabla.id_field, 'k': clave} for clave in resultado['eliminados'])
+
+    if not dry_run:
+        with tabla.lock:
+            tabla.usar_campos(fields)
+            for cambio in cambios:
+                tabla.aplicar(cambio)
+                _registrar_cambio(tabla, cambio)
+        if scn_actual is not None:
+            _guardar_estado_refresco(nombre, scn_actual)
+        logger.info(f"MIRROR: Refresco incremental de {nombre}: {len(resultado['nuevos'])} nuevos, "
+                    f"{len(resultado['modificados'])} modificados, {len(resultado['eliminados'])} eliminados")
+    return resultado
+
+def _reemplazar_snapshot(nombre, fields, tmp_path):
+    """
+    Instala un CSV recién exportado como snapshot de la tabla y descarta su diario,
+    que ya está contenido en la exportación. Si la tabla estaba cargada en memoria,
+    se vuelve a leer del archivo nuevo.
+    """
+    journal_path = get_journal_path(nombre)
+    tabla = _tablas.get(nombre)
+    with _compactacion_lock:
+        if tabla is None:
+            os.replace(tmp_path, get_mirror_path(nombre))
+            for path in (journal_path, f"{journal_path}.compacting"):
+                if os.path.exists(path):
+                    os.remove(path)
+            _nueva_generacion(nombre)
+            return
+        with tabla.lock, tabla.journal_lock:
+            os.replace(tmp_path, get_mirror_path(nombre))
+            if tabla.journal_file is not None:
+                tabla.journal_file.close()
+                tabla.journal_file = None
+            for path in (journal_path, f"{journal_path}.compacting"):
+                if os.path.exists(path):
+                    os.remove(path)
+            tabla.journal_bytes = 0
+            tabla.journal_desde = None
+            tabla.actualizado = time.time()
+            tabla.vaciar()
+            tabla.fields = list(fields)
+            tabla.campos_clave = _campos_clave(nombre, tabla.fields)
+            with open(get_mirror_path(nombre), 'r', encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    tabla.poner(tabla.clave(row), row)
+            _nueva_generacion(nombre)
+
+def _preparar_fila(tabla, record_data, anterior=None):
+    """
+    Construye la fila en el orden de campos de la tabla. Los valores None conservan
+    el valor anterior del registro (igual que el COALESCE de los UPDATE en la BD).
+    """
+    fila = {}
+    for k in tabla.fields:
+        valor = record_data.get(k)
+        if valor is None and anterior is not None:
+            fila[k] = anterior.get(k, '')
+        else:
+            fila[k] = _a_texto(valor)
+    return fila
+
+def get_record(table_name, record_id):
+    """
+    Devuelve una copia del registro con ese ID (en tablas de clave compuesta,
+    los valores unidos por SEPARADOR_CLAVE), o None si no existe en el espejo.
+    """
+    tabla = _obtener_tabla(table_name)
+    with tabla.lock:
+        fila = tabla.filas.get(normalize_id(record_id))
+        return dict(fila) if fila is not None else None
+
+def get_records(table_name):
+    """Devuelve una copia de todos los registros de la tabla."""
+    tabla = _obtener_tabla(table_name)
+    with tabla.lock:
+        return [dict(fila) for fila in tabla.filas.values()]
+
+def last_update(table_name):
+    """Momento (time.time()) del último dato recibido por el espejo de la tabla, o None."""
+    return _obtener_tabla(table_name).actualizado
+
+def version(table_name):
+    """
+    Versión barata de la tabla en este proceso: cambia con cada escritura
+    registrada en el espejo o exportación desde la BD, sin cargarla. No ve lo
+    escrito por otros workers; para eso está versiones_tablas.py.
+    """
+    nombre = table_name.upper()
+    with _generaciones_lock:
+        return f"{_ARRANQUE}.{_generaciones.get(nombre, 0)}"
+
+def find_records(table_name, field, value):
+    """
+    Busca registros por un campo. Usa el índice secundario de la tabla cuando el
+    campo coincide; en otro caso recorre la tabla.
+    """
+    tabla = _obtener_tabla(table_name)
+    with tabla.lock:
+        return [dict(tabla.filas[c]) for c in tabla.claves_por(field, value)]
+
+def reset_table(table_name, fields):
+    """Vacía la tabla espejo (en memoria y en disco) antes de volver a poblarla."""
+    tabla = _obtener_tabla(table_name, fields)
+    cambio = {'op': 'R', 't': tabla.nombre, 'f': list(fields)}
+    with tabla.lock:
+        tabla.aplicar(cambio)
+        _registrar_cambio(tabla, cambio)
+
 def create_record(table_name, record_data, fields):
     """
-    Añade un nuevo registro al archivo CSV correspondiente, escribiendo la cabecera si el archivo no existe.
+    Añade un nuevo registro a la tabla espejo. El cambio se aplica en memoria y se
+    añade al diario de la tabla; el CSV se actualiza al compactar.
     fields: lista de nombres de campos en orden.
     """
     try:
-        filepath = get_mirror_path(table_name)
-        file_exists = os.path.exists(filepath)
-        current_app.logger.info(f"MIRROR: Intentando crear registro en {table_name}")
-        current_app.logger.info(f"MIRROR: Datos a escribir: {record_data}")
-        current_app.logger.info(f"MIRROR: Campos esperados: {fields}")
-        current_app.logger.info(f"MIRROR: Ruta del archivo: {filepath}")
-        current_app.logger.info(f"MIRROR: ¿Archivo existe? {file_exists}")
-        
-        with open(filepath, 'a', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fields)
-            if not file_exists:
-                current_app.logger.info(f"MIRROR: Escribiendo cabecera en {filepath}")
-                writer.writeheader()
-            
-            # Preparar los datos para escribir
-            row_data = {k: record_data.get(k, "") for k in fields}
-            current_app.logger.info(f"MIRROR: Datos preparados para escribir: {row_data}")
-            
-            writer.writerow(row_data)
-            current_app.logger.info(f"MIRROR: Registro creado exitosamente en {filepath}")
-            
+        tabla = _obtener_tabla(table_name, fields)
+        with tabla.lock:
+            tabla.usar_campos(fields)
+            fila = _preparar_fila(tabla, record_data)
+            cambio = {'op': 'U', 't': tabla.nombre, 'i': tabla.id_field, 'k': tabla.clave(fila), 'r': fila}
+            tabla.aplicar(cambio)
+            _registrar_cambio(tabla, cambio)
+        logger.debug(f"MIRROR: Registro creado en {tabla.nombre}: {fila}")
     except Exception as e:
-        current_app.logger.error(f"MIRROR ERROR en create_record para tabla {table_name}: {e}")
-        current_app.logger.error(f"MIRROR ERROR: Datos que causaron el error: {record_data}")
-        current_app.logger.error(f"MIRROR ERROR: Campos esperados: {fields}")
+        logger.error(f"MIRROR ERROR en create_record para tabla {table_name}: {e}")
+        logger.error(f"MIRROR ERROR: Datos que causaron el error: {record_data}")
         import traceback
-        current_app.logger.error(f"MIRROR ERROR: Traceback completo: {traceback.format_exc()}")
+        logger.error(f"MIRROR ERROR: Traceback completo: {traceback.format_exc()}")
+
+def create_records(table_name, records, fields):
+    """
+    Añade varios registros a la tabla espejo de una vez: se aplican en memoria
+    bajo un solo bloqueo y van al diario como un único elemento de la cola (una
+    sola escritura), en lugar de un create_record() por registro.
+    """
+    if not records:
+        return
+    try:
+        tabla = _obtener_tabla(table_name, fields)
+        with tabla.lock:
+            tabla.usar_campos(fields)
+            cambios = []
+            for record_data in records:
+                fila = _preparar_fila(tabla, record_data)
+                cambio = {'op': 'U', 't': tabla.nombre, 'i': tabla.id_field, 'k': tabla.clave(fila), 'r': fila}
+                tabla.aplicar(cambio)
+                cambios.append(cambio)
+            _registrar_cambio(tabla, cambios)
+        logger.debug(f"MIRROR: {len(cambios)} registros creados en {tabla.nombre}")
+    except Exception as e:
+        logger.error(f"MIRROR ERROR en create_records para tabla {table_name}: {e}")
+        import traceback
+        logger.error(f"MIRROR ERROR: Traceback completo: {traceback.format_exc()}")
 
 def update_record(table_name, record_id, new_data, fields, id_field=None):
     """
-    Actualiza un registro en el archivo CSV buscándolo por su campo id_field (por defecto el primero de fields).
+    Actualiza los registros cuyo campo id_field (por defecto el primero de fields)
+    vale record_id. Si id_field no es la clave de la tabla (p. ej. ID_OPERACION en
+    MANTENIMIENTO_DISPOSITIVO) se actualizan todas las filas que coinciden, como
+    el UPDATE de la BD. Si no hay ninguna se añade como nuevo.
     """
     try:
-        filepath = get_mirror_path(table_name)
-        if not os.path.exists(filepath):
-            current_app.logger.warning(f"MIRROR WARNING: Archivo {filepath} no encontrado para actualizar. Creando nuevo registro en su lugar.")
-            create_record(table_name, new_data, fields)
-            return
-        id_field = id_field or fields[0]
-        updated_lines = []
-        record_found = False
-        normalized_search_id = normalize_id(record_id)
-        
-        with open(filepath, 'r', encoding='utf-8', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                row_id = normalize_id(row.get(id_field))
-                if row_id == normalized_search_id:
-                    updated_lines.append({k: new_data.get(k, "") for k in fields})
-                    record_found = True
-                    current_app.logger.info(f"MIRROR: Encontrado registro con {id_field}={row.get(id_field)} (normalizado: {row_id})")
-                else:
-                    updated_lines.append(row)
-        
-        if not record_found:
-            updated_lines.append({k: new_data.get(k, "") for k in fields})
-            current_app.logger.info(f"MIRROR: Registro con {id_field}={record_id} (normalizado: {normalized_search_id}) no encontrado en {filepath}. Se añadió como nuevo.")
-        
-        with open(filepath, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fields)
-            writer.writeheader()
-            writer.writerows(updated_lines)
-        
-        if record_found:
-            current_app.logger.info(f"MIRROR: Registro con {id_field}={record_id} actualizado en {filepath}")
+        tabla = _obtener_tabla(table_name, fields)
+        campo = id_field or fields[0]
+        with tabla.lock:
+            tabla.usar_campos(fields)
+            claves = tabla.claves_por(campo, record_id)
+            for clave in claves or [None]:
+                anterior = tabla.filas.get(clave) if clave is not None else None
+                fila = _preparar_fila(tabla, new_data, anterior)
+                if not fila.get(campo):
+                    fila[campo] = normalize_id(record_id)
+                nueva = tabla.clave(fila)
+                if clave is not None and nueva != clave:
+                    cambio = {'op': 'D', 't': tabla.nombre, 'i': tabla.id_field, 'k': clave}
+                    tabla.aplicar(cambio)
+                    _registrar_cambio(tabla, cambio)
+                cambio = {'op': 'U', 't': tabla.nombre, 'i': tabla.id_field, 'k': nueva, 'r': fila}
+                tabla.aplicar(cambio)
+                _registrar_cambio(tabla, cambio)
+        if not claves:
+            logger.info(f"MIRROR: Registro con {campo}={record_id} no encontrado en {tabla.nombre}. Se añadió como nuevo.")
+        else:
+            logger.debug(f"MIRROR: {len(claves)} registro(s) con {campo}={record_id} actualizado(s) en {tabla.nombre}")
     except Exception as e:
-        current_app.logger.error(f"MIRROR ERROR en update_record para tabla {table_name}: {e}")
+        logger.error(f"MIRROR ERROR en update_record para tabla {table_name}: {e}")
 
 def delete_record(table_name, record_id, fields, id_field=None):
     """
-    Elimina un registro del archivo CSV buscándolo por su campo id_field (por defecto el primero de fields).
+    Elimina los registros cuyo campo id_field (por defecto el primero de fields)
+    vale record_id: uno si es la clave de la tabla, todos los que coinciden si no.
     """
     try:
-        filepath = get_mirror_path(table_name)
-        if not os.path.exists(filepath):
-            current_app.logger.warning(f"MIRROR WARNING: Archivo {filepath} no encontrado para eliminar.")
+        tabla = _obtener_tabla(table_name, fields)
+        campo = id_field or fields[0]
+        with tabla.lock:
+            claves = tabla.claves_por(campo, record_id)
+            for clave in claves:
+                cambio = {'op': 'D', 't': tabla.nombre, 'i': tabla.id_field, 'k': clave}
+                tabla.aplicar(cambio)
+                _registrar_cambio(tabla, cambio)
+        if not claves:
+            logger.warning(f"MIRROR WARNING: Registro con {campo}={record_id} no encontrado para eliminar en {tabla.nombre}")
             return
-        id_field = id_field or fields[0]
-        kept_lines = []
-        record_deleted = False
-        normalized_search_id = normalize_id(record_id)
-        
-        with open(filepath, 'r', encoding='utf-8', newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                row_id = normalize_id(row.get(id_field))
-                if row_id == normalized_search_id:
-                    record_deleted = True
-                    current_app.logger.info(f"MIRROR: Eliminando registro con {id_field}={row.get(id_field)} (normalizado: {row_id})")
-                    continue
-                kept_lines.append(row)
-        
-        with open(filepath, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fields)
-            writer.writeheader()
-            writer.writerows(kept_lines)
-        
-        if record_deleted:
-            current_app.logger.info(f"MIRROR: Registro con {id_field}={record_id} eliminado de {filepath}")
-        else:
-            current_app.logger.warning(f"MIRROR WARNING: Registro con {id_field}={record_id} (normalizado: {normalized_search_id}) no encontrado para eliminar en {filepath}")
+        logger.debug(f"MIRROR: {len(claves)} registro(s) con {campo}={record_id} eliminado(s) de {tabla.nombre}")
     except Exception as e:
-        current_app.logger.error(f"MIRROR ERROR en delete_record para tabla {table_name}: {e}")
+        logger.error(f"MIRROR ERROR en delete_record para tabla {table_name}: {e}")
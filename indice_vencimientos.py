@@ -0,0 +1,296 @@
+# indice_vencimientos.py
+# Índice en memoria de los vencimientos: licencias por FECHA_FIN y mantenimientos
+# por PROX_MANTENIMIENTO, cada uno con su cliente (nombre y correo). Cada índice
+# es una lista ordenada de (fecha, clave), así "qué vence entre A y B" es un par
+# de bisect en lugar de la unión de ANTIVIRUS, MICROSOFT365 y WINDOWS con VENTAS,
+# OPERACIONES y CLIENTES.
+#
+# Se carga al arrancar (en segundo plano) y se mantiene así:
+#   - Las escrituras de este proceso llegan por db_mirror.al_cambiar: se marcan
+#     las licencias, operaciones o clientes tocados y, en la siguiente lectura,
+#     se vuelven a leer de la BD solo esas filas.
+#   - Cada VENCIMIENTOS_TTL segundos se recarga completo en segundo plano, para
+#     recoger lo escrito por otros workers o fuera de la API. Mientras tanto las
+#     lecturas siguen respondiendo con el índice anterior.
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from db import conexion
+from db_mirror import al_cambiar
+from licencias import TIPOS_LICENCIA
+
+logger = logging.getLogger(__name__)
+
+# Por encima de estas claves marcadas sale más barato recargar todo
+MAX_SUCIAS = 500
+
+_TABLAS_LICENCIA = {tipo['tabla'] for tipo in TIPOS_LICENCIA.values()}
+
+_config = {'VENCIMIENTOS_TTL': 300}
+_lock = threading.Lock()          # protege los índices y las marcas
+_actualizando = threading.Lock()  # una sola recarga o relectura a la vez
+_licencias = None                 # _Indice, None hasta la primera carga
+_mantenimientos = None
+_cargado_en = 0.0
+_recargar = False
+_sucias = {'licencias': set(), 'operaciones': set(), 'clientes': set()}
+
+
+class _Indice:
+    """Entradas {clave: dict con 'fecha'} ordenadas por (fecha, clave)."""
+
+    def __init__(self, pares=()):
+        self.entradas = dict(pares)
+        self.orden = sorted((entrada['fecha'], clave) for clave, entrada in self.entradas.items())
+
+    def poner(self, clave, entrada):
+        self.quitar(clave)
+        self.entradas[clave] = entrada
+        insort(self.orden, (entrada['fecha'], clave))
+
+    def quitar(self, clave):
+        anterior = self.entradas.pop(clave, None)
+        if anterior is not None:
+            del self.orden[bisect_left(self.orden, (anterior['fecha'], clave))]
+
+    def quitar_si(self, condicion):
+        for clave in [c for c, e in self.entradas.items() if condicion(e)]:
+            self.quitar(clave)
+
+    def entre(self, inicio=None, fin=None):
+        """Entradas con inicio <= fecha <= fin (extremos None: sin límite), por fecha."""
+        i = 0 if inicio is None else bisect_left(self.orden, (inicio,))
+        j = len(self.orden) if fin is None else bisect_left(self.orden, (fin + timedelta(microseconds=1),))
+        return [self.entradas[clave] for _, clave in self.orden[i:j]]
+
+
+def _sql_licencias(condicion):
+    return "\n        UNION ALL\n".join(f"""
+        SELECT l.ID_LICENCIA, '{tipo['nombre']}', l.FECHA_FIN, o.ID_OPERACION,
+               c.ID_CLIENTE, c.NOMBRE, c.APELLIDO, c.CORREO
+        FROM {tipo['tabla']} l
+        JOIN VENTAS v ON v.ID_LICENCIA = l.ID_LICENCIA
+        JOIN OPERACIONES o ON o.ID_OPERACION = v.ID_OPERACION
+        JOIN CLIENTES c ON c.ID_CLIENTE = o.ID_CLIENTE
+        WHERE l.FECHA_FIN IS NOT NULL AND ({condicion})""" for tipo in TIPOS_LICENCIA.values())
+
+def _sql_mantenimientos(condicion):
+    return f"""
+        SELECT m.ID_OPERACION, m.PROX_MANTENIMIENTO, m.DESCRIPCION, m.FRECUENCIA, m.TIPO_MANTENIMIENTO,
+               o.FECHA, o.INGRESO, o.EGRESO, o.TIPO_OPERACION,
+               c.ID_CLIENTE, c.NOMBRE, c.APELLIDO, c.CORREO
+        FROM MANTENIMIENTOS m
+        JOIN OPERACIONES o ON o.ID_OPERACION = m.ID_OPERACION
+        JOIN CLIENTES c ON c.ID_CLIENTE = o.ID_CLIENTE
+        WHERE m.PROX_MANTENIMIENTO IS NOT NULL AND ({condicion})
+    """
+
+def _licencia(fila):
+    id_licencia, tipo, fecha_fin, id_operacion, id_cliente, nombre, apellido, correo = fila
+    return (id_licencia, id_operacion), {
+        'fecha': fecha_fin, 'id_licencia': id_licencia, 'tipo': tipo, 'id_operacion': id_operacion,
+        'id_cliente': id_cliente, 'nombre': nombre, 'apellido': apellido, 'correo': correo
+    }
+
+def _mantenimiento(fila):
+    (id_operacion, prox, descripcion, frecuencia, tipo_mantenimiento,
+     fecha, ingreso, egreso, tipo_operacion, id_cliente, nombre, apellido, correo) = fila
+    return id_operacion, {
+        'fecha': prox, 'id_operacion': id_operacion, 'descripcion': descripcion, 'frecuencia': frecuencia,
+        'tipo_mantenimiento': tipo_mantenimiento, 'fecha_operacion': fecha, 'ingreso': ingreso,
+        'egreso': egreso, 'tipo_operacion': tipo_operacion, 'id_cliente': id_cliente,
+        'nombre': nombre, 'apellido': apellido, 'correo': correo
+    }
+
+def _consultar(condicion_licencias, condicion_mantenimientos, params_licencias=None, params_mantenimientos=None):
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.arraysize = 1000
+            cursor.execute(_sql_licencias(condicion_licencias), params_licencias or {})
+            licencias = [_licencia(fila) for fila in cursor.fetchall()]
+            cursor.execute(_sql_mantenimientos(condicion_mantenimientos), params_mantenimientos or {})
+            mantenimientos = [_mantenimiento(fila) for fila in cursor.fetchall()]
+        finally:
+            cursor.close()
+    return licencias, mantenimientos
+
+
+def _recargar_todo():
+    """Vuelve a leer ambos índices completos. Se llama con _actualizando tomado."""
+    global _licencias, _mantenimientos, _cargado_en, _recargar
+    with _lock:
+        # Lo que cambie desde aquí queda marcado para releer tras la carga
+        _recargar = False
+        for claves in _sucias.values():
+            claves.clear()
+    inicio = time.monotonic()
+    licencias, mantenimientos = _consultar("1 = 1", "1 = 1")
+    nuevas, nuevos = _Indice(licencias), _Indice(mantenimientos)
+    with _lock:
+        _licencias, _mantenimientos = nuevas, nuevos
+        _cargado_en = time.monotonic()
+    logger.info(f"VENCIMIENTOS: índice cargado ({len(licencias)} licencias, "
+                f"{len(mantenimientos)} mantenimientos) en {time.monotonic() - inicio:.2f}s")
+
+def _marcadores(prefijo, valores, params):
+    nombres = []
+    for n, valor in enumerate(sorted(valores, key=str)):
+        params[f"{prefijo}{n}"] = valor
+        nombres.append(f":{prefijo}{n}")
+    return ", ".join(nombres) or "NULL"
+
+def _releer_sucias():
+    """Relee de la BD solo lo marcado por escrituras. Se llama con _actualizando tomado."""
+    global _recargar
+    with _lock:
+        licencias, operaciones, clientes = (set(_sucias[k]) for k in ('licencias', 'operaciones', 'clientes'))
+        for claves in _sucias.values():
+            claves.clear()
+    if not (licencias or operaciones or clientes):
+        return
+    try:
+        _releer(licencias, operaciones, clientes)
+    except Exception:
+        # Sin poder releer, lo marcado se recupera con una carga completa
+        with _lock:
+            _recargar = True
+        raise
+
+def _releer(licencias, operaciones, clientes):
+    params = {}
+    en_operaciones = _marcadores('op', operaciones, params)
+    en_clientes = _marcadores('cli', clientes, params)
+    params_mantenimientos = dict(params)
+    en_licencias = _marcadores('lic', licencias, params)
+    filas_licencias, filas_mantenimientos = _consultar(
+        f"l.ID_LICENCIA IN ({en_licencias}) OR o.ID_OPERACION IN ({en_operaciones}) "
+        f"OR c.ID_CLIENTE IN ({en_clientes})",
+        f"m.ID_OPERACION IN ({en_operaciones}) OR c.ID_CLIENTE IN ({en_clientes})",
+        params, params_mantenimientos)
+    # Las claves del espejo son texto: se compara como texto
+    licencias, operaciones, clientes = ({str(v) for v in valores} for valores in (licencias, operaciones, clientes))
+    with _lock:
+        _licencias.quitar_si(lambda e: e['id_licencia'] in licencias or str(e['id_operacion']) in operaciones
+                             or str(e['id_cliente']) in clientes)
+        _mantenimientos.quitar_si(lambda e: str(e['id_operacion']) in operaciones or str(e['id_cliente']) in clientes)
+        for clave, entrada in filas_licencias:
+            _licencias.poner(clave, entrada)
+        for clave, entrada in filas_mantenimientos:
+            _mantenimientos.poner(clave, entrada)
+
+def _recargar_en_segundo_plano():
+    def tarea():
+        try:
+            _recargar_todo()
+        except Exception as e:
+            logger.error(f"VENCIMIENTOS: error al recargar el índice: {e}")
+        finally:
+            _actualizando.release()
+    if _actualizando.acquire(blocking=False):
+        threading.Thread(target=tarea, name='indice-vencimientos', daemon=True).start()
+
+
+def _al_cambiar(tabla, cambio):
+    global _recargar
+    if tabla not in _TABLAS_LICENCIA and tabla not in ('VENTAS', 'OPERACIONES', 'MANTENIMIENTOS', 'CLIENTES'):
+        return
+    with _lock:
+        if cambio is None or cambio.get('op') not in ('U', 'D'):
+            _recargar = True
+            return
+        clave = cambio.get('k')
+        if tabla in _TABLAS_LICENCIA:
+            _sucias['licencias'].add(clave)
+        elif tabla == 'CLIENTES':
+            _sucias['clientes'].add(clave)
+        else:
+            # VENTAS y MANTENIMIENTOS se identifican en el espejo por ID_OPERACION
+            _sucias['operaciones'].add(clave)
+        if sum(len(claves) for claves in _sucias.values()) > MAX_SUCIAS:
+            _recargar = True
+
+def init_indice_vencimientos(app):
+    """Se suscribe a los cambios del espejo y carga el índice en segundo plano."""
+    _config['VENCIMIENTOS_TTL'] = app.config.get('VENCIMIENTOS_TTL', _config['VENCIMIENTOS_TTL'])
+    al_cambiar(_al_cambiar)
+    _recargar_en_segundo_plano()
+
+def _al_dia():
+    """Deja el índice listo para leer: carga inicial, relecturas y recarga por TTL."""
+    if _licencias is None or _recargar:
+        # Sin índice (o tras un cambio masivo) se espera a la carga completa
+        with _actualizando:
+            if _licencias is None or _recargar:
+                _recargar_todo()
+    elif any(_sucias.values()):
+        with _actualizando:
+            _releer_sucias()
+    if time.monotonic() - _cargado_en >= _config['VENCIMIENTOS_TTL']:
+        _recargar_en_segundo_plano()
+
+
+def licencias_entre(inicio=None, fin=None):
+    """
+    Licencias vendidas con inicio <= FECHA_FIN <= fin, por fecha: dicts con
+    fecha, id_licencia, tipo (nombre), id_operacion, id_cliente, nombre,
+    apellido y correo. No modificar los dicts devueltos.
+    """
+    _al_dia()
+    with _lock:
+        return _licencias.entre(inicio, fin)
+
+def mantenimientos_entre(inicio=None, fin=None):
+    """
+    Mantenimientos con inicio <= PROX_MANTENIMIENTO <= fin, por fecha: dicts con
+    fecha (PROX_MANTENIMIENTO), id_operacion, descripcion, frecuencia,
+    tipo_mantenimiento, fecha_operacion, ingreso, egreso, tipo_operacion,
+    id_cliente, nombre, apellido y correo. No modificar los dicts devueltos.
+    """
+    _al_dia()
+    with _lock:
+        return _mantenimientos.entre(inicio, fin)
+
+def vencimientos_semana():
+    """
+    Licencias y mantenimientos que vencen de hoy a 7 días, en el formato de
+    /api/notificaciones/vencimientos-semana (y del bloque del dashboard).
+    """
+    hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    fin = hoy + timedelta(days=7)
+    return {
+        'licencias': [
+            {
+                'cliente': f"{e['nombre']} {e['apellido']}",
+                'correo': e['correo'],
+                'id_licencia': e['id_licencia'],
+                'fecha': e['fecha'].strftime('%d/%m/%Y'),
+                'tipo': e['tipo']
+            }
+            for e in licencias_entre(hoy, fin)
+        ],
+        'mantenimientos': [
+            {
+                'cliente': f"{e['nombre']} {e['apellido']}",
+                'correo': e['correo'],
+                'id_operacion': e['id_operacion'],
+                'fecha': e['fecha'].strftime('%d/%m/%Y')
+            }
+            for e in mantenimientos_entre(hoy, fin)
+        ]
+    }
+
+def status():
+    """Tamaño y antigüedad del índice (para /api/admin/vencimientos)."""
+    with _lock:
+        return {
+            'cargado': _licencias is not None,
+            'licencias': len(_licencias.entradas) if _licencias is not None else 0,
+            'mantenimientos': len(_mantenimientos.entradas) if _mantenimientos is not None else 0,
+            'edadSegundos': round(time.monotonic() - _cargado_en, 1) if _licencias is not None else None,
+            'ttlSegundos': _config['VENCIMIENTOS_TTL'],
+            'pendientesDeReleer': sum(len(claves) for claves in _sucias.values()),
+            'recargaPendiente': _recargar,
+        }
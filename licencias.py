@@ -0,0 +1,153 @@
+# licencias.py
+# Tipos de licencia y asignación de sus IDs (A-001, M-001, W-001...).
+import logging
+import threading
+import oracledb
+from config import Config
+from db import conexion
+
+logger = logging.getLogger(__name__)
+
+# Prefijo del ID -> tabla de detalle, nombre mostrado y clave usada en las rutas
+TIPOS_LICENCIA = {
+    'A-': {'tabla': 'ANTIVIRUS', 'nombre': 'Antivirus', 'clave': 'antivirus'},
+    'M-': {'tabla': 'MICROSOFT365', 'nombre': 'Microsoft 365', 'clave': 'ofimatica'},
+    'W-': {'tabla': 'WINDOWS', 'nombre': 'Windows', 'clave': 'sistema_operativo'},
+}
+
+ORA_TABLA_NO_EXISTE = 942
+
+_lock = threading.Lock()  # protege _bloques (nunca se retiene durante un viaje a la BD)
+_bloques = {}  # prefijo -> [siguiente número libre, último número reservado]
+_contadores_disponibles = True
+
+
+def tipo_por_id(id_licencia):
+    """(prefijo, tipo) al que pertenece un ID de licencia, o (None, None)."""
+    for prefijo, tipo in TIPOS_LICENCIA.items():
+        if id_licencia.startswith(prefijo):
+            return prefijo, tipo
+    return None, None
+
+def tipo_por_clave(clave):
+    """(prefijo, tipo) para la clave de ruta ('antivirus', 'ofimatica', ...)."""
+    for prefijo, tipo in TIPOS_LICENCIA.items():
+        if tipo['clave'] == clave:
+            return prefijo, tipo
+    return None, None
+
+def formatear_id(prefijo, numero):
+    return f"{prefijo}{numero:03d}"
+
+
+def _codigo_error(e):
+    error = e.args[0] if e.args else None
+    return getattr(error, 'code', None)
+
+def _max_numero_sql(tabla):
+    # MAX numérico (no alfabético: 'A-1000' > 'A-999') de los IDs con ese prefijo
+    return f"""
+        SELECT :prefijo, NVL(MAX(TO_NUMBER(SUBSTR(ID_LICENCIA, LENGTH(:prefijo) + 1))), 0)
+        FROM {tabla}
+        WHERE REGEXP_LIKE(ID_LICENCIA, '^' || :prefijo || '[0-9]+$')
+    """
+
+def _reservar_bloque(prefijo, cantidad):
+    """
+    Reserva `cantidad` números para el prefijo en LICENCIA_CONTADORES y devuelve
+    el último reservado. Usa una conexión propia y confirma enseguida, así el
+    bloqueo de la fila dura solo el UPDATE y no la transacción de la petición.
+    La primera vez siembra el contador con el mayor ID existente en la tabla.
+    """
+    tabla = TIPOS_LICENCIA[prefijo]['tabla']
+    with conexion(propia=True) as conn:
+        cursor = conn.cursor()
+        try:
+            ultimo = cursor.var(oracledb.NUMBER)
+            for _ in range(2):
+                cursor.execute("""
+                    UPDATE LICENCIA_CONTADORES SET ULTIMO = ULTIMO + :cantidad
+                    WHERE PREFIJO = :prefijo
+                    RETURNING ULTIMO INTO :ultimo
+                """, cantidad=cantidad, prefijo=prefijo, ultimo=ultimo)
+                if cursor.rowcount:
+                    conn.commit()
+                    return int(ultimo.getvalue()[0])
+                try:
+                    cursor.execute("INSERT INTO LICENCIA_CONTADORES (PREFIJO, ULTIMO)" + _max_numero_sql(tabla),
+                                   prefijo=prefijo)
+                    conn.commit()
+                except oracledb.IntegrityError:
+                    # Otro proceso sembró el contador a la vez; basta con reintentar el UPDATE
+                    conn.rollback()
+            raise RuntimeError(f"No se pudo reservar IDs de licencia para {prefijo}")
+        finally:
+            cursor.close()
+
+def _max_numero_legado(prefijo):
+    # Sin LICENCIA_CONTADORES: mayor número existente (sin protección ante concurrencia)
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_max_numero_sql(TIPOS_LICENCIA[prefijo]['tabla']), prefijo=prefijo)
+            return int(cursor.fetchone()[1])
+        finally:
+            cursor.close()
+
+def reservar_ids(prefijo, cantidad):
+    """
+    `cantidad` IDs nuevos y distintos para el prefijo ('A-', 'M-', 'W-'), con
+    a lo sumo un viaje a la BD: primero se usa lo que queda del bloque en
+    memoria y el resto se reserva de una vez en LICENCIA_CONTADORES (junto con
+    un bloque nuevo de LICENCIA_ID_BLOQUE). Sin esa tabla se numeran a partir
+    del mayor ID existente, leído una sola vez. Usa una conexión propia: en una
+    transacción, llamarla antes de abrirla.
+    """
+    global _contadores_disponibles
+    if prefijo not in TIPOS_LICENCIA:
+        raise ValueError(f"Prefijo de licencia no reconocido: {prefijo}")
+    if cantidad < 1:
+        return []
+    # El lock solo cubre el bloque en memoria; el viaje a la BD va fuera (el
+    # bloqueo de la fila en LICENCIA_CONTADORES ya hace atómica la reserva)
+    with _lock:
+        numeros = []
+        bloque = _bloques.get(prefijo)
+        if bloque is not None and bloque[0] <= bloque[1]:
+            tomados = min(cantidad, bloque[1] - bloque[0] + 1)
+            numeros = list(range(bloque[0], bloque[0] + tomados))
+            bloque[0] += tomados
+    faltan = cantidad - len(numeros)
+    if faltan and _contadores_disponibles:
+        pedidos = faltan + max(0, Config.LICENCIA_ID_BLOQUE - 1)
+        try:
+            ultimo = _reservar_bloque(prefijo, pedidos)
+        except oracledb.DatabaseError as e:
+            if _codigo_error(e) != ORA_TABLA_NO_EXISTE:
+                raise
+            logger.warning("LICENCIA_CONTADORES no existe (ver sql/licencia_contadores.sql); "
+                           "se usará el mayor ID existente + 1.")
+            _contadores_disponibles = False
+        else:
+            primero = ultimo - pedidos + 1
+            numeros += range(primero, primero + faltan)
+            with _lock:
+                # Si otra petición dejó un bloque con números libres, se conserva
+                # ese y los sobrantes de este quedan como huecos
+                bloque = _bloques.get(prefijo)
+                if bloque is None or bloque[0] > bloque[1]:
+                    _bloques[prefijo] = [primero + faltan, ultimo]
+            faltan = 0
+    if faltan:
+        # Sin contadores: todos consecutivos al mayor existente, que se lee una sola vez
+        maximo = _max_numero_legado(prefijo)
+        numeros = list(range(maximo + 1, maximo + 1 + cantidad))
+    return [formatear_id(prefijo, numero) for numero in numeros]
+
+def siguiente_id_licencia(prefijo):
+    """
+    Nuevo ID de licencia para el prefijo ('A-', 'M-', 'W-'); ver reservar_ids.
+    Los números no usados de un bloque (p. ej. al reiniciar) quedan como huecos
+    y nunca se repiten, porque el contador de la BD solo avanza.
+    """
+    return reservar_ids(prefijo, 1)[0]
@@ -1,8 +1,16 @@
 # mantenimientos_routes.py - VERSIÓN CORREGIDA
 from flask import g, jsonify, request, current_app
 import oracledb
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from db import conexion, ConexionNoDisponible
 from db_mirror import create_record, update_record, delete_record
+from mirror_fallback import con_respaldo_mirror, leer_mantenimientos
+from paginacion import parametros_pagina, consulta_paginada, cuerpo_pagina, CursorInvalido
+from streaming import quiere_stream, cursor_stream, respuesta_en_stream
+from serializacion import fechas_iso, filas_como_dict, respuesta_filas
+from cache_http import con_etag
+from resumen_mensual import actualizar_resumen, claves_operaciones
+from indice_vencimientos import mantenimientos_entre
 
 # Mover la función parse_date_for_oracle antes de su primer uso y asegurar que solo haya una versión.
 def parse_date_for_oracle(date_string):
@@ -41,16 +49,24 @@ def get_db_connection():
         return get_db()
     return g.db
 
-def serialize_dates(obj):
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    return obj
+# Más recientes primero; ID y dispositivo desempatan (un mantenimiento puede
+# tener varios equipos) para poder paginar por cursor
+ORDEN_MANTENIMIENTOS = [("NVL(FECHA, DATE '1900-01-01')", 'DESC'), ('ID_OPERACION', 'DESC'),
+                        ('PAG_DISPOSITIVO', 'DESC')]
+# Las mismas claves sobre las filas del mirror (campos pag_ de leer_mantenimientos)
+ORDEN_MANTENIMIENTOS_MIRROR = [('pag_fecha', 'DESC'), ('id_operacion', 'DESC'), ('pag_dispositivo', 'DESC')]
 
+@con_respaldo_mirror(leer_mantenimientos, ['MANTENIMIENTOS', 'OPERACIONES', 'CLIENTES', 'MANTENIMIENTO_DISPOSITIVO', 'DISPOSITIVOS'],
+                     orden=ORDEN_MANTENIMIENTOS_MIRROR)
+@con_etag(['MANTENIMIENTOS', 'OPERACIONES', 'CLIENTES', 'MANTENIMIENTO_DISPOSITIVO', 'DISPOSITIVOS'])
 def get_mantenimientos():
-    """Obtener todos los mantenimientos con información de cliente y equipo asociado"""
+    """Obtener todos los mantenimientos con información de cliente y equipo asociado (?limit/?after para paginar, ?stream=1 o NDJSON)"""
     try:
+        pagina = parametros_pagina()
+        stream = quiere_stream() and not pagina
         conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = cursor_stream(conn) if stream else conn.cursor()
+        cursor.outputtypehandler = fechas_iso
         
         query = """
         SELECT 
@@ -66,32 +82,39 @@ def get_mantenimientos():
             m.prox_mantenimiento,
             m.tipo_mantenimiento,
             o.id_cliente,
-            d.tipo_dispositivo || ' ' || d.marca || ' ' || d.modelo as equipo_asociado
+            d.tipo_dispositivo || ' ' || d.marca || ' ' || d.modelo as equipo_asociado{clave_pagina}
         FROM operaciones o
         INNER JOIN mantenimientos m ON o.id_operacion = m.id_operacion
         INNER JOIN clientes c ON o.id_cliente = c.id_cliente
         LEFT JOIN mantenimiento_dispositivo md ON m.id_operacion = md.id_operacion
         LEFT JOIN dispositivos d ON md.id_dispositivo = d.id_dispositivo
         WHERE o.tipo_operacion = 'MANTENIMIENTO'
-        ORDER BY o.fecha DESC
         """
         
-        cursor.execute(query)
-        columns = [col[0].lower() for col in cursor.description]
-        rows = cursor.fetchall()
-        
-        mantenimientos = []
-        for row in rows:
-            mantenimiento = {col: serialize_dates(val) for col, val in zip(columns, row)}
-            mantenimientos.append(mantenimiento)
+        if pagina:
+            columnas, mantenimientos, siguiente, total = consulta_paginada(
+                cursor, query.format(clave_pagina=", NVL(md.id_dispositivo, 0) AS pag_dispositivo"),
+                ORDEN_MANTENIMIENTOS, pagina, minusculas=True)
+        else:
+            cursor.execute(query.format(clave_pagina="") + " ORDER BY o.fecha DESC")
+            columnas = filas_como_dict(cursor, minusculas=True)
+            if stream:
+                return respuesta_en_stream(cursor, columnas=columnas)
+            mantenimientos = cursor.fetchall()
         
         cursor.close()
-        return jsonify(mantenimientos)
+        return respuesta_filas(mantenimientos, columnas,
+                               cuerpo_pagina(mantenimientos, siguiente, total) if pagina else None)
         
+    except CursorInvalido as e:
+        return jsonify(error=str(e)), 400
+    except ConexionNoDisponible:
+        raise  # Lo atiende con_respaldo_mirror
     except Exception as e:
         current_app.logger.error(f"Error al obtener mantenimientos: {e}")
         return jsonify(error=str(e)), 500
 
+@con_etag(['MANTENIMIENTOS', 'OPERACIONES', 'CLIENTES'])
 def get_mantenimiento_by_id(id):
     """Obtener un mantenimiento específico por ID"""
     try:
@@ -118,12 +141,12 @@ def get_mantenimiento_by_id(id):
         WHERE o.id_operacion = :id AND o.tipo_operacion = 'MANTENIMIENTO'
         """
         
+        cursor.outputtypehandler = fechas_iso
         cursor.execute(query, {'id': id})
-        columns = [col[0].lower() for col in cursor.description]
-        row = cursor.fetchone()
+        filas_como_dict(cursor, minusculas=True)
+        mantenimiento = cursor.fetchone()
         
-        if row:
-            mantenimiento = {col: serialize_dates(val) for col, val in zip(columns, row)}
+        if mantenimiento:
             cursor.close()
             return jsonify(mantenimiento)
         else:
@@ -145,62 +168,63 @@ def create_mantenimiento():
             if field not in data:
                 current_app.logger.warning(f"[MANTENIMIENTO] Falta campo requerido: {field}")
                 return jsonify(error=f"Campo requerido: {field}"), 400
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        # Procesar fechas
-        fecha_mantenimiento = parse_date_for_oracle(data.get('fecha')) or date.today()
-        prox_mantenimiento = parse_date_for_oracle(data.get('prox_mantenimiento'))
-        current_app.logger.info(f"[MANTENIMIENTO] Fecha mantenimiento: {fecha_mantenimiento}, Próx: {prox_mantenimiento}")
-        # Insertar en tabla OPERACIONES y obtener el ID generado de forma segura
-        insert_operacion_sql = """
-            INSERT INTO operaciones (id_cliente, fecha, tipo_operacion, ingreso, egreso)
-            VALUES (:id_cliente, :fecha, 'MANTENIMIENTO', :ingreso, :egreso)
-            RETURNING id_operacion INTO :id_operacion
-        """
-        id_operacion_var = cursor.var(int)
-        current_app.logger.info(f"[MANTENIMIENTO] Insertando en OPERACIONES (RETURNING): id_cliente={data['id_cliente']}, fecha={fecha_mantenimiento}, ingreso={data.get('ingreso')}, egreso={data.get('egreso')}")
-        cursor.execute(insert_operacion_sql, {
-            'id_cliente': data['id_cliente'],
-            'fecha': fecha_mantenimiento,
-            'ingreso': data.get('ingreso'),
-            'egreso': data.get('egreso'),
-            'id_operacion': id_operacion_var
-        })
-        id_operacion = id_operacion_var.getvalue()[0]
-        current_app.logger.info(f"[MANTENIMIENTO] id_operacion generado: {id_operacion}")
-        # Insertar en tabla MANTENIMIENTOS
-        insert_mantenimiento_sql = """
-            INSERT INTO mantenimientos (id_operacion, descripcion, frecuencia, prox_mantenimiento, tipo_mantenimiento)
-            VALUES (:id_operacion, :descripcion, :frecuencia, :prox_mantenimiento, :tipo_mantenimiento)
-        """
-        current_app.logger.info(f"[MANTENIMIENTO] Insertando en MANTENIMIENTOS: id_operacion={id_operacion}, descripcion={data['descripcion']}, frecuencia={data['frecuencia']}, prox_mantenimiento={prox_mantenimiento}, tipo_mantenimiento={data.get('tipo_mantenimiento', 'PREVENTIVO')}")
-        cursor.execute(insert_mantenimiento_sql, {
-            'id_operacion': id_operacion,
-            'descripcion': data['descripcion'],
-            'frecuencia': data['frecuencia'],
-            'prox_mantenimiento': prox_mantenimiento,
-            'tipo_mantenimiento': data.get('tipo_mantenimiento', 'PREVENTIVO')
-        })
-        # Si hay id_dispositivo, insertar en mantenimiento_dispositivo y reflejar en mirror
-        id_dispositivo = data.get('id_dispositivo')
-        if id_dispositivo is not None:
-            current_app.logger.info(f"[MANTENIMIENTO] Insertando en MANTENIMIENTO_DISPOSITIVO: id_operacion={id_operacion}, id_dispositivo={id_dispositivo}")
-            insert_mant_disp_sql = """
-                INSERT INTO mantenimiento_dispositivo (id_operacion, id_dispositivo)
-                VALUES (:id_operacion, :id_dispositivo)
+        with conexion() as conn:
+            cursor = conn.cursor()
+            # Procesar fechas
+            fecha_mantenimiento = parse_date_for_oracle(data.get('fecha')) or date.today()
+            prox_mantenimiento = parse_date_for_oracle(data.get('prox_mantenimiento'))
+            current_app.logger.info(f"[MANTENIMIENTO] Fecha mantenimiento: {fecha_mantenimiento}, Próx: {prox_mantenimiento}")
+            # Insertar en tabla OPERACIONES y obtener el ID generado de forma segura
+            insert_operacion_sql = """
+                INSERT INTO operaciones (id_cliente, fecha, tipo_operacion, ingreso, egreso)
+                VALUES (:id_cliente, :fecha, 'MANTENIMIENTO', :ingreso, :egreso)
+                RETURNING id_operacion INTO :id_operacion
             """
-            cursor.execute(insert_mant_disp_sql, {
+            id_operacion_var = cursor.var(int)
+            current_app.logger.info(f"[MANTENIMIENTO] Insertando en OPERACIONES (RETURNING): id_cliente={data['id_cliente']}, fecha={fecha_mantenimiento}, ingreso={data.get('ingreso')}, egreso={data.get('egreso')}")
+            cursor.execute(insert_operacion_sql, {
+                'id_cliente': data['id_cliente'],
+                'fecha': fecha_mantenimiento,
+                'ingreso': data.get('ingreso'),
+                'egreso': data.get('egreso'),
+                'id_operacion': id_operacion_var
+            })
+            id_operacion = id_operacion_var.getvalue()[0]
+            current_app.logger.info(f"[MANTENIMIENTO] id_operacion generado: {id_operacion}")
+            actualizar_resumen(cursor, [id_operacion])
+            # Insertar en tabla MANTENIMIENTOS
+            insert_mantenimiento_sql = """
+                INSERT INTO mantenimientos (id_operacion, descripcion, frecuencia, prox_mantenimiento, tipo_mantenimiento)
+                VALUES (:id_operacion, :descripcion, :frecuencia, :prox_mantenimiento, :tipo_mantenimiento)
+            """
+            current_app.logger.info(f"[MANTENIMIENTO] Insertando en MANTENIMIENTOS: id_operacion={id_operacion}, descripcion={data['descripcion']}, frecuencia={data['frecuencia']}, prox_mantenimiento={prox_mantenimiento}, tipo_mantenimiento={data.get('tipo_mantenimiento', 'PREVENTIVO')}")
+            cursor.execute(insert_mantenimiento_sql, {
                 'id_operacion': id_operacion,
-                'id_dispositivo': id_dispositivo
+                'descripcion': data['descripcion'],
+                'frecuencia': data['frecuencia'],
+                'prox_mantenimiento': prox_mantenimiento,
+                'tipo_mantenimiento': data.get('tipo_mantenimiento', 'PREVENTIVO')
             })
-            # MIRROR: Crear en mantenimiento_dispositivo
+            # Si hay id_dispositivo, insertar en mantenimiento_dispositivo y reflejar en mirror
+            id_dispositivo = data.get('id_dispositivo')
+            if id_dispositivo is not None:
+                current_app.logger.info(f"[MANTENIMIENTO] Insertando en MANTENIMIENTO_DISPOSITIVO: id_operacion={id_operacion}, id_dispositivo={id_dispositivo}")
+                insert_mant_disp_sql = """
+                    INSERT INTO mantenimiento_dispositivo (id_operacion, id_dispositivo)
+                    VALUES (:id_operacion, :id_dispositivo)
+                """
+                cursor.execute(insert_mant_disp_sql, {
+                    'id_operacion': id_operacion,
+                    'id_dispositivo': id_dispositivo
+                })
+            conn.commit()
+            cursor.close()
+        # MIRROR: Crear en OPERACIONES, MANTENIMIENTOS y mantenimiento_dispositivo
+        if id_dispositivo is not None:
             create_record('MANTENIMIENTO_DISPOSITIVO', {
                 "ID_OPERACION": id_operacion,
                 "ID_DISPOSITIVO": id_dispositivo
             }, MANTENIMIENTO_DISPOSITIVO_FIELDS)
-        conn.commit()
-        cursor.close()
-        # MIRROR: Crear en OPERACIONES y MANTENIMIENTOS
         create_record('OPERACIONES', {
             "ID_OPERACION": id_operacion,
             "ID_CLIENTE": data['id_cliente'],
@@ -222,8 +246,6 @@ def create_mantenimiento():
             'id_operacion': id_operacion
         }), 201
     except Exception as e:
-        if 'conn' in locals() and conn:
-            conn.rollback()
         current_app.logger.error(f"Error al crear mantenimiento: {e}")
         return jsonify(error=str(e)), 500
 
@@ -232,90 +254,92 @@ def update_mantenimiento(id):
     try:
         data = request.get_json()
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Procesar fechas si están presentes
-        fecha_mantenimiento = parse_date_for_oracle(data.get('fecha')) if data.get('fecha') else None
-        prox_mantenimiento = parse_date_for_oracle(data.get('prox_mantenimiento')) if data.get('prox_mantenimiento') else None
-        
-        # Actualizar tabla OPERACIONES solo si hay campos para actualizar
-        if any(key in data for key in ['fecha', 'ingreso', 'egreso']):
-            update_operacion_sql = """
-                UPDATE operaciones 
-                SET fecha = COALESCE(:fecha, fecha), 
-                    ingreso = COALESCE(:ingreso, ingreso), 
-                    egreso = COALESCE(:egreso, egreso)
-                WHERE id_operacion = :id AND tipo_operacion = 'MANTENIMIENTO'
-            """
+        with conexion() as conn:
+            cursor = conn.cursor()
+        
+            # Procesar fechas si están presentes
+            fecha_mantenimiento = parse_date_for_oracle(data.get('fecha')) if data.get('fecha') else None
+            prox_mantenimiento = parse_date_for_oracle(data.get('prox_mantenimiento')) if data.get('prox_mantenimiento') else None
+        
+            # Actualizar tabla OPERACIONES solo si hay campos para actualizar
+            if any(key in data for key in ['fecha', 'ingreso', 'egreso']):
+                previas = claves_operaciones(cursor, [id])
+                update_operacion_sql = """
+                    UPDATE operaciones 
+                    SET fecha = COALESCE(:fecha, fecha), 
+                        ingreso = COALESCE(:ingreso, ingreso), 
+                        egreso = COALESCE(:egreso, egreso)
+                    WHERE id_operacion = :id AND tipo_operacion = 'MANTENIMIENTO'
+                """
             
-            cursor.execute(update_operacion_sql, {
+                cursor.execute(update_operacion_sql, {
+                    'id': id,
+                    'fecha': fecha_mantenimiento,
+                    'ingreso': data.get('ingreso'),
+                    'egreso': data.get('egreso')
+                })
+                actualizar_resumen(cursor, [id], previas)
+        
+            # Actualizar tabla MANTENIMIENTOS
+            update_mantenimiento_sql = """
+                UPDATE mantenimientos 
+                SET descripcion = COALESCE(:descripcion, descripcion), 
+                    frecuencia = COALESCE(:frecuencia, frecuencia), 
+                    prox_mantenimiento = COALESCE(:prox_mantenimiento, prox_mantenimiento),
+                    tipo_mantenimiento = COALESCE(:tipo_mantenimiento, tipo_mantenimiento)
+                WHERE id_operacion = :id
+            """
+        
+            cursor.execute(update_mantenimiento_sql, {
                 'id': id,
-                'fecha': fecha_mantenimiento,
-                'ingreso': data.get('ingreso'),
-                'egreso': data.get('egreso')
+                'descripcion': data.get('descripcion'),
+                'frecuencia': data.get('frecuencia'),
+                'prox_mantenimiento': prox_mantenimiento,
+                'tipo_mantenimiento': data.get('tipo_mantenimiento')
             })
         
-        # Actualizar tabla MANTENIMIENTOS
-        update_mantenimiento_sql = """
-            UPDATE mantenimientos 
-            SET descripcion = COALESCE(:descripcion, descripcion), 
-                frecuencia = COALESCE(:frecuencia, frecuencia), 
-                prox_mantenimiento = COALESCE(:prox_mantenimiento, prox_mantenimiento),
-                tipo_mantenimiento = COALESCE(:tipo_mantenimiento, tipo_mantenimiento)
-            WHERE id_operacion = :id
-        """
+            if cursor.rowcount == 0:
+                return jsonify(error="Mantenimiento no encontrado"), 404
+            
+            # Si hay id_dispositivo, actualizar en mantenimiento_dispositivo y en el mirror
+            id_dispositivo = data.get('id_dispositivo')
+            if id_dispositivo is not None:
+                # Actualizar o insertar según corresponda
+                cursor.execute("SELECT COUNT(*) FROM mantenimiento_dispositivo WHERE id_operacion = :id", {'id': id})
+                existe = cursor.fetchone()[0]
+                if existe:
+                    update_mant_disp_sql = """
+                        UPDATE mantenimiento_dispositivo
+                        SET id_dispositivo = :id_dispositivo
+                        WHERE id_operacion = :id_operacion
+                    """
+                    cursor.execute(update_mant_disp_sql, {
+                        'id_operacion': id,
+                        'id_dispositivo': id_dispositivo
+                    })
+                else:
+                    insert_mant_disp_sql = """
+                        INSERT INTO mantenimiento_dispositivo (id_operacion, id_dispositivo)
+                        VALUES (:id_operacion, :id_dispositivo)
+                    """
+                    cursor.execute(insert_mant_disp_sql, {
+                        'id_operacion': id,
+                        'id_dispositivo': id_dispositivo
+                    })
         
-        cursor.execute(update_mantenimiento_sql, {
-            'id': id,
-            'descripcion': data.get('descripcion'),
-            'frecuencia': data.get('frecuencia'),
-            'prox_mantenimiento': prox_mantenimiento,
-            'tipo_mantenimiento': data.get('tipo_mantenimiento')
-        })
+            conn.commit()
+            cursor.close()
         
-        if cursor.rowcount == 0:
-            return jsonify(error="Mantenimiento no encontrado"), 404
-            
-        # Si hay id_dispositivo, actualizar en mantenimiento_dispositivo y en el mirror
-        id_dispositivo = data.get('id_dispositivo')
+        # MIRROR: Actualizar o crear en mantenimiento_dispositivo
         if id_dispositivo is not None:
-            # Actualizar o insertar según corresponda
-            cursor.execute("SELECT COUNT(*) FROM mantenimiento_dispositivo WHERE id_operacion = :id", {'id': id})
-            existe = cursor.fetchone()[0]
+            fila_disp = {
+                "ID_OPERACION": id,
+                "ID_DISPOSITIVO": id_dispositivo
+            }
             if existe:
-                update_mant_disp_sql = """
-                    UPDATE mantenimiento_dispositivo
-                    SET id_dispositivo = :id_dispositivo
-                    WHERE id_operacion = :id_operacion
-                """
-                cursor.execute(update_mant_disp_sql, {
-                    'id_operacion': id,
-                    'id_dispositivo': id_dispositivo
-                })
-                # MIRROR: Actualizar en mantenimiento_dispositivo
-                update_record('MANTENIMIENTO_DISPOSITIVO', id, {
-                    "ID_OPERACION": id,
-                    "ID_DISPOSITIVO": id_dispositivo
-                }, MANTENIMIENTO_DISPOSITIVO_FIELDS)
+                update_record('MANTENIMIENTO_DISPOSITIVO', id, fila_disp, MANTENIMIENTO_DISPOSITIVO_FIELDS)
             else:
-                insert_mant_disp_sql = """
-                    INSERT INTO mantenimiento_dispositivo (id_operacion, id_dispositivo)
-                    VALUES (:id_operacion, :id_dispositivo)
-                """
-                cursor.execute(insert_mant_disp_sql, {
-                    'id_operacion': id,
-                    'id_dispositivo': id_dispositivo
-                })
-                # MIRROR: Crear en mantenimiento_dispositivo
-                create_record('MANTENIMIENTO_DISPOSITIVO', {
-                    "ID_OPERACION": id,
-                    "ID_DISPOSITIVO": id_dispositivo
-                }, MANTENIMIENTO_DISPOSITIVO_FIELDS)
-        
-        conn.commit()
-        cursor.close()
-        
+                create_record('MANTENIMIENTO_DISPOSITIVO', fila_disp, MANTENIMIENTO_DISPOSITIVO_FIELDS)
         # MIRROR: Actualizar en OPERACIONES y MANTENIMIENTOS
         update_record('OPERACIONES', id, {
             "ID_OPERACION": id,
@@ -334,67 +358,68 @@ def update_mantenimiento(id):
         return jsonify(message="Mantenimiento actualizado exitosamente")
         
     except Exception as e:
-        if conn:
-            conn.rollback()
         current_app.logger.error(f"Error al actualizar mantenimiento {id}: {e}")
         return jsonify(error=str(e)), 500
 
 def delete_mantenimiento(id):
     """Eliminar un mantenimiento con eliminación en cascada correcta"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with conexion() as conn:
+            cursor = conn.cursor()
         
-        # Verificar si el mantenimiento existe
-        cursor.execute("""
-            SELECT COUNT(*) FROM operaciones 
-            WHERE id_operacion = :id AND tipo_operacion = 'MANTENIMIENTO'
-        """, {'id': id})
+            # Verificar si el mantenimiento existe
+            cursor.execute("""
+                SELECT COUNT(*) FROM operaciones 
+                WHERE id_operacion = :id AND tipo_operacion = 'MANTENIMIENTO'
+            """, {'id': id})
         
-        if cursor.fetchone()[0] == 0:
-            cursor.close()
-            return jsonify(error="Mantenimiento no encontrado"), 404
+            if cursor.fetchone()[0] == 0:
+                cursor.close()
+                return jsonify(error="Mantenimiento no encontrado"), 404
         
-        # Iniciar transacción
-        conn.begin()
+            # Iniciar transacción
+            conn.begin()
         
-        try:
-            # 1. Eliminar de MANTENIMIENTO_DISPOSITIVO primero (por FK constraint)
-            cursor.execute("DELETE FROM mantenimiento_dispositivo WHERE id_operacion = :id", {'id': id})
-            current_app.logger.info(f"Eliminados {cursor.rowcount} registros de mantenimiento_dispositivo")
-            
-            # 2. Eliminar de MANTENIMIENTOS
-            cursor.execute("DELETE FROM mantenimientos WHERE id_operacion = :id", {'id': id})
-            if cursor.rowcount == 0:
-                raise Exception("No se pudo eliminar el mantenimiento")
-            current_app.logger.info(f"Eliminado mantenimiento con id_operacion: {id}")
+            try:
+                # 1. Eliminar de MANTENIMIENTO_DISPOSITIVO primero (por FK constraint)
+                cursor.execute("DELETE FROM mantenimiento_dispositivo WHERE id_operacion = :id", {'id': id})
+                current_app.logger.info(f"Eliminados {cursor.rowcount} registros de mantenimiento_dispositivo")
             
-            # 3. Eliminar de OPERACIONES
-            cursor.execute("DELETE FROM operaciones WHERE id_operacion = :id AND tipo_operacion = 'MANTENIMIENTO'", {'id': id})
-            if cursor.rowcount == 0:
-                raise Exception("No se pudo eliminar la operación")
-            current_app.logger.info(f"Eliminada operación con id_operacion: {id}")
+                # 2. Eliminar de MANTENIMIENTOS
+                cursor.execute("DELETE FROM mantenimientos WHERE id_operacion = :id", {'id': id})
+                if cursor.rowcount == 0:
+                    raise Exception("No se pudo eliminar el mantenimiento")
+                current_app.logger.info(f"Eliminado mantenimiento con id_operacion: {id}")
             
-            # Confirmar transacción
-            conn.commit()
-            cursor.close()
+                # 3. Eliminar de OPERACIONES y recalcular su grupo del resumen mensual
+                previas = claves_operaciones(cursor, [id])
+                cursor.execute("DELETE FROM operaciones WHERE id_operacion = :id AND tipo_operacion = 'MANTENIMIENTO'", {'id': id})
+                if cursor.rowcount == 0:
+                    raise Exception("No se pudo eliminar la operación")
+                actualizar_resumen(cursor, [], previas)
+                current_app.logger.info(f"Eliminada operación con id_operacion: {id}")
             
-            # MIRROR: Eliminar en archivos de texto (después de confirmar la transacción)
-            try:
-                delete_record('MANTENIMIENTO_DISPOSITIVO', id, MANTENIMIENTO_DISPOSITIVO_FIELDS)
-                delete_record('MANTENIMIENTOS', id, MANTENIMIENTOS_FIELDS)
-                delete_record('OPERACIONES', id, OPERACIONES_FIELDS)
-            except Exception as mirror_error:
-                current_app.logger.warning(f"Error en mirror al eliminar mantenimiento {id}: {mirror_error}")
-            
-            return jsonify(message="Mantenimiento eliminado exitosamente")
+                # Confirmar transacción
+                conn.commit()
+                cursor.close()
             
-        except Exception as inner_e:
-            # Rollback en caso de error
-            conn.rollback()
-            cursor.close()
-            current_app.logger.error(f"Error durante eliminación de mantenimiento {id}: {inner_e}")
-            return jsonify(error=f"Error al eliminar mantenimiento: {str(inner_e)}"), 500
+            except Exception as inner_e:
+                # Rollback en caso de error
+                conn.rollback()
+                cursor.close()
+                current_app.logger.error(f"Error durante eliminación de mantenimiento {id}: {inner_e}")
+                return jsonify(error=f"Error al eliminar mantenimiento: {str(inner_e)}"), 500
+        
+        # MIRROR: Eliminar en archivos de texto (después de confirmar la transacción
+        # y devolver la conexión al pool)
+        try:
+            delete_record('MANTENIMIENTO_DISPOSITIVO', id, MANTENIMIENTO_DISPOSITIVO_FIELDS)
+            delete_record('MANTENIMIENTOS', id, MANTENIMIENTOS_FIELDS)
+            delete_record('OPERACIONES', id, OPERACIONES_FIELDS)
+        except Exception as mirror_error:
+            current_app.logger.warning(f"Error en mirror al eliminar mantenimiento {id}: {mirror_error}")
+        
+        return jsonify(message="Mantenimiento eliminado exitosamente")
         
     except Exception as e:
         current_app.logger.error(f"Error al eliminar mantenimiento {id}: {e}")
@@ -439,6 +464,7 @@ def cleanup_orphaned_records():
         current_app.logger.error(f"Error en cleanup_orphaned_records: {e}")
         return None
 
+@con_etag(['MANTENIMIENTOS', 'OPERACIONES', 'CLIENTES', 'MANTENIMIENTO_DISPOSITIVO', 'DISPOSITIVOS'])
 def search_mantenimientos():
     """Buscar mantenimientos por término, incluyendo equipo asociado"""
     try:
@@ -482,60 +508,44 @@ def search_mantenimientos():
         ORDER BY o.fecha DESC
         """
         search_param = f"%{search_term}%"
+        cursor.outputtypehandler = fechas_iso
         cursor.execute(query, {'search': search_param})
-        columns = [col[0].lower() for col in cursor.description]
-        rows = cursor.fetchall()
-        mantenimientos = []
-        for row in rows:
-            mantenimiento = {col: serialize_dates(val) for col, val in zip(columns, row)}
-            mantenimientos.append(mantenimiento)
+        filas_como_dict(cursor, minusculas=True)
+        mantenimientos = cursor.fetchall()
         cursor.close()
         return jsonify(mantenimientos)
     except Exception as e:
         current_app.logger.error(f"Error al buscar mantenimientos: {e}")
         return jsonify(error=str(e)), 500
 
+def _lpad(valor, largo):
+    # Igual que LPAD(valor, largo, '0') en Oracle (que también recorta)
+    return str(valor).rjust(largo, '0')[:largo]
+
 def get_mantenimientos_proximos_vencer():
-    """Obtener mantenimientos próximos a vencer"""
+    """Obtener mantenimientos próximos a vencer (desde el índice de vencimientos en memoria)"""
     try:
         dias = request.args.get('dias', 7, type=int)
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-        SELECT 
-            o.id_operacion,
-            'MP' || LPAD(o.id_operacion, 3, '0') as mant_prev,
-            'CL' || LPAD(c.id_cliente, 3, '0') as cod_cliente,
-            c.nombre || ' ' || c.apellido as nombre_cliente,
-            o.fecha,
-            o.ingreso,
-            o.egreso,
-            m.descripcion as equipos,
-            m.frecuencia,
-            m.prox_mantenimiento,
-            m.tipo_mantenimiento,
-            o.id_cliente
-        FROM operaciones o
-        INNER JOIN mantenimientos m ON o.id_operacion = m.id_operacion
-        INNER JOIN clientes c ON o.id_cliente = c.id_cliente
-        WHERE o.tipo_operacion = 'MANTENIMIENTO'
-        AND m.prox_mantenimiento IS NOT NULL
-        AND m.prox_mantenimiento <= SYSDATE + :dias
-        ORDER BY m.prox_mantenimiento ASC
-        """
-        
-        cursor.execute(query, {'dias': dias})
-        columns = [col[0].lower() for col in cursor.description]
-        rows = cursor.fetchall()
-        
-        mantenimientos = []
-        for row in rows:
-            mantenimiento = {col: serialize_dates(val) for col, val in zip(columns, row)}
-            mantenimientos.append(mantenimiento)
-        
-        cursor.close()
+        fin = datetime.now() + timedelta(days=dias)
+        
+        mantenimientos = [
+            {
+                'id_operacion': e['id_operacion'],
+                'mant_prev': 'MP' + _lpad(e['id_operacion'], 3),
+                'cod_cliente': 'CL' + _lpad(e['id_cliente'], 3),
+                'nombre_cliente': f"{e['nombre']} {e['apellido']}",
+                'fecha': e['fecha_operacion'].isoformat() if e['fecha_operacion'] else None,
+                'ingreso': e['ingreso'],
+                'egreso': e['egreso'],
+                'equipos': e['descripcion'],
+                'frecuencia': e['frecuencia'],
+                'prox_mantenimiento': e['fecha'].isoformat(),
+                'tipo_mantenimiento': e['tipo_mantenimiento'],
+                'id_cliente': e['id_cliente']
+            }
+            for e in mantenimientos_entre(None, fin)
+            if e['tipo_operacion'] == 'MANTENIMIENTO'
+        ]
         return jsonify(mantenimientos)
         
     except Exception as e:
@@ -0,0 +1,214 @@
+# mirror_fallback.py
+# Respaldo de lectura: cuando no se obtiene una conexión del pool a tiempo, las
+# rutas de listado/búsqueda responden con los datos del mirror en memoria.
+import time
+from datetime import datetime
+from functools import wraps
+from flask import jsonify, request, current_app
+from db import ConexionNoDisponible
+from db_mirror import get_records, get_record, last_update
+from paginacion import parametros_pagina, paginar_lista, sin_claves_pagina, cuerpo_pagina, CursorInvalido
+from serializacion import respuesta_filas
+
+
+def _numero(texto):
+    """Convierte el texto del mirror al número que devolvería la BD ('' -> None)."""
+    if texto in (None, ''):
+        return None
+    try:
+        return int(texto)
+    except ValueError:
+        try:
+            return float(texto)
+        except ValueError:
+            return texto
+
+def _fecha_iso(texto):
+    """Fecha del mirror ('2025-05-17 00:00:00') en el formato isoformat de la API."""
+    if not texto:
+        return None
+    try:
+        return datetime.fromisoformat(texto).isoformat()
+    except ValueError:
+        return texto
+
+def _lpad3(valor):
+    """Equivalente a LPAD(valor, 3, '0') de Oracle (que también recorta)."""
+    return str(valor).rjust(3, '0')[:3]
+
+def _nombre_cliente(cliente):
+    if not cliente:
+        return ''
+    return f"{cliente.get('NOMBRE', '')} {cliente.get('APELLIDO', '')}"
+
+def _fecha_clave(texto):
+    """Clave de orden pag_fecha: como NVL(FECHA, DATE '1900-01-01') de las rutas."""
+    return _fecha_iso(texto) or datetime(1900, 1, 1).isoformat()
+
+def _clientes_por_id():
+    return {c['ID_CLIENTE']: c for c in get_records('CLIENTES')}
+
+
+# --- Lectores: reproducen la respuesta de cada ruta a partir del mirror ---
+
+def leer_clientes():
+    """Equivalente de GET /clientes/."""
+    return [
+        {
+            "id_cliente": _numero(c['ID_CLIENTE']),
+            "nombre": c['NOMBRE'],
+            "apellido": c['APELLIDO'],
+            "celular": c['CELULAR'],
+            "direccion": c['DIRECCION'],
+            "correo": c['CORREO']
+        }
+        for c in get_records('CLIENTES')
+    ]
+
+def leer_clientes_texto():
+    """Equivalente de GET /api/clientes (todos los valores como texto)."""
+    return get_records('CLIENTES')
+
+def leer_dispositivos():
+    """Equivalente de GET /api/dispositivos."""
+    return [
+        {**d, 'ID_DISPOSITIVO': _numero(d['ID_DISPOSITIVO']), 'ID_CLIENTE': _numero(d['ID_CLIENTE'])}
+        for d in get_records('DISPOSITIVOS')
+    ]
+
+def buscar_dispositivos():
+    """Equivalente de GET /api/dispositivos/search."""
+    termino = request.args.get('search', '').strip()
+    if not termino:
+        return []
+    buscado = termino.upper()
+    clientes = _clientes_por_id()
+    resultados = []
+    for d in get_records('DISPOSITIVOS'):
+        cliente = clientes.get(d['ID_CLIENTE'])
+        if cliente is None:
+            continue
+        nombre = _nombre_cliente(cliente)
+        textos = (d['TIPO_DISPOSITIVO'], d['MARCA'], d['MODELO'], nombre)
+        if any(buscado in t.upper() for t in textos) or termino in d['ID_DISPOSITIVO'] or termino in d['ID_CLIENTE']:
+            resultados.append({
+                'ID_DISPOSITIVO': _numero(d['ID_DISPOSITIVO']),
+                'ID_CLIENTE': _numero(d['ID_CLIENTE']),
+                'TIPO_DISPOSITIVO': d['TIPO_DISPOSITIVO'],
+                'MARCA': d['MARCA'],
+                'MODELO': d['MODELO'],
+                'NOMBRE_CLIENTE': nombre
+            })
+    resultados.sort(key=lambda r: r['ID_DISPOSITIVO'] or 0, reverse=True)
+    return resultados
+
+def leer_servicios():
+    """Equivalente de GET /api/servicios."""
+    clientes = _clientes_por_id()
+    servicios = []
+    for s in get_records('SERVICIOS'):
+        o = get_record('OPERACIONES', s['ID_OPERACION'])
+        if o is None or o['TIPO_OPERACION'] != 'SERVICIO' or o['ID_CLIENTE'] not in clientes:
+            continue
+        servicios.append({
+            'id_operacion': _numero(o['ID_OPERACION']),
+            'id_servicio': 'SV' + _lpad3(o['ID_OPERACION']),
+            'cliente': _nombre_cliente(clientes[o['ID_CLIENTE']]),
+            'detalle': s['DETALLE_SERVICIO'],
+            'tecnico_encargado': s['TECNICO_ENCARGADO'] or None,
+            'duracion_estimada': s['DURACION_ESTIMADA'] or None,
+            'fecha': _fecha_iso(o['FECHA']),
+            'ingreso': _numero(o['INGRESO']),
+            'egreso': _numero(o['EGRESO']),
+            'id_cliente': _numero(o['ID_CLIENTE']),
+            'pag_fecha': _fecha_clave(o['FECHA'])
+        })
+    servicios.sort(key=lambda s: s['fecha'] or '', reverse=True)
+    return servicios
+
+def leer_mantenimientos():
+    """Equivalente de GET /api/mantenimientos."""
+    clientes = _clientes_por_id()
+    # Como el LEFT JOIN de la ruta: una fila por equipo del mantenimiento (o una sin equipo)
+    equipos = {}
+    for md in get_records('MANTENIMIENTO_DISPOSITIVO'):
+        equipos.setdefault(md['ID_OPERACION'], []).append(md['ID_DISPOSITIVO'])
+    mantenimientos = []
+    for m in get_records('MANTENIMIENTOS'):
+        o = get_record('OPERACIONES', m['ID_OPERACION'])
+        if o is None or o['TIPO_OPERACION'] != 'MANTENIMIENTO' or o['ID_CLIENTE'] not in clientes:
+            continue
+        for id_dispositivo in equipos.get(m['ID_OPERACION']) or [None]:
+            d = get_record('DISPOSITIVOS', id_dispositivo) if id_dispositivo else None
+            d = d or {}
+            mantenimientos.append({
+                'id_operacion': _numero(o['ID_OPERACION']),
+                'mant_prev': 'MP' + _lpad3(o['ID_OPERACION']),
+                'cod_cliente': 'CL' + _lpad3(o['ID_CLIENTE']),
+                'nombre_cliente': _nombre_cliente(clientes[o['ID_CLIENTE']]),
+                'fecha': _fecha_iso(o['FECHA']),
+                'ingreso': _numero(o['INGRESO']),
+                'egreso': _numero(o['EGRESO']),
+                'equipos': m['DESCRIPCION'],
+                'frecuencia': m['FRECUENCIA'],
+                'prox_mantenimiento': _fecha_iso(m['PROX_MANTENIMIENTO']),
+                'tipo_mantenimiento': m['TIPO_MANTENIMIENTO'],
+                'id_cliente': _numero(o['ID_CLIENTE']),
+                'equipo_asociado': f"{d.get('TIPO_DISPOSITIVO', '')} {d.get('MARCA', '')} {d.get('MODELO', '')}",
+                'pag_fecha': _fecha_clave(o['FECHA']),
+                'pag_dispositivo': _numero(id_dispositivo) or 0
+            })
+    mantenimientos.sort(key=lambda m: m['fecha'] or '', reverse=True)
+    return mantenimientos
+
+
+def respuesta_desde_mirror(datos, tablas):
+    """
+    Respuesta servida desde el mirror (en el formato pedido, ver respuesta_filas).
+    X-Mirror-Age indica los segundos desde el dato más antiguo recibido por las
+    tablas usadas (cuánto puede estar atrasada).
+    """
+    fechas = [last_update(t) for t in tablas]
+    if isinstance(datos, dict):
+        respuesta = respuesta_filas(datos['data'], envoltura=datos)
+    else:
+        respuesta = respuesta_filas(datos)
+    respuesta.headers['X-Mirror-Fallback'] = 'true'
+    if all(fechas):
+        respuesta.headers['X-Mirror-Age'] = str(int(time.time() - min(fechas)))
+    respuesta.headers['Warning'] = '110 - "Respuesta obsoleta servida desde el mirror"'
+    return respuesta
+
+def con_respaldo_mirror(lector, tablas, orden=None):
+    """
+    Decorador para rutas de lectura: ejecuta la vista y, si el pool no le
+    entrega una conexión a tiempo (ConexionNoDisponible), responde con lector()
+    usando los datos del mirror de las tablas indicadas. La vista debe dejar
+    pasar ConexionNoDisponible (no atraparla en su except genérico).
+    Si la ruta pagina (paginacion.py), `orden` son las claves [(campo, sentido)]
+    con las que se pagina también la respuesta del mirror: las mismas, en el
+    mismo orden, que las de consulta_paginada (los campos pag_ del lector hacen
+    de NVL y de columnas PAG_, y no se devuelven).
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            try:
+                return vista(*args, **kwargs)
+            except ConexionNoDisponible as e:
+                current_app.logger.warning(f"Sirviendo {request.path} desde el mirror: {e}")
+                try:
+                    datos = lector(*args, **kwargs)
+                    pagina = parametros_pagina() if orden else None
+                    if pagina:
+                        datos = cuerpo_pagina(*paginar_lista(datos, orden, pagina))
+                    elif orden:
+                        datos = sin_claves_pagina(datos)
+                    return respuesta_desde_mirror(datos, tablas)
+                except CursorInvalido as e_cursor:
+                    return jsonify(error=str(e_cursor)), 400
+                except Exception as e_mirror:
+                    current_app.logger.error(f"Error al leer el mirror para {request.path}: {e_mirror}")
+                    return jsonify(error=str(e)), 503
+        return envoltura
+    return decorador
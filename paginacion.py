@@ -0,0 +1,199 @@
+# paginacion.py
+# Paginación por cursor (keyset) compartida por las rutas de listado:
+#   ?limit=N           tamaño de página (sin ?after: primera página)
+#   ?after=<cursor>    continúa después de la última fila de la página anterior
+#   ?count=1           incluye el total de filas (consulta aparte)
+# Sin ?limit ni ?after las rutas mantienen la respuesta completa de siempre.
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request
+
+LIMITE_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+Pagina = namedtuple('Pagina', 'limite despues contar')
+
+
+class CursorInvalido(ValueError):
+    """El parámetro ?after no es un cursor emitido por esta API."""
+
+
+def _a_json(valor):
+    if isinstance(valor, datetime):
+        return {'d': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': datetime(valor.year, valor.month, valor.day).isoformat()}
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+def _de_json(valor):
+    # Solo escalares o {'d': iso}: cualquier otra cosa llegaría tal cual a los binds
+    if isinstance(valor, dict):
+        if list(valor) != ['d'] or not isinstance(valor['d'], str):
+            raise ValueError
+        return datetime.fromisoformat(valor['d'])
+    if valor is not None and (isinstance(valor, bool) or not isinstance(valor, (str, int, float))):
+        raise ValueError
+    return valor
+
+def codificar_cursor(valores):
+    """Cursor opaco (base64 de los valores de orden de la última fila)."""
+    texto = json.dumps([_a_json(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decodificar_cursor(token):
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno).decode('utf-8'))
+        if not isinstance(valores, list):
+            raise ValueError
+        return [_de_json(v) for v in valores]
+    except Exception:
+        raise CursorInvalido("Cursor de paginación inválido")
+
+def parametros_pagina():
+    """Pagina pedida en la query string, o None si la petición no pagina."""
+    if 'after' not in request.args and 'limit' not in request.args:
+        return None
+    limite = request.args.get('limit', default=LIMITE_DEFECTO, type=int)
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    token = request.args.get('after')
+    despues = decodificar_cursor(token) if token else None
+    contar = bool(request.args.get('count', default=0, type=int))
+    return Pagina(limite, despues, contar)
+
+def cuerpo_pagina(datos, siguiente, total=None):
+    """Cuerpo JSON de una página: siguiente es None en la última."""
+    cuerpo = {'data': datos, 'siguiente': siguiente}
+    if total is not None:
+        cuerpo['total'] = total
+    return cuerpo
+
+
+def consulta_paginada(cursor, sql, claves, pagina, params=None, minusculas=False, texto=False):
+    """
+    Ejecuta una página de `sql` (consulta base sin ORDER BY).
+
+    claves: [(expresión, 'ASC' | 'DESC'), ...] sobre las columnas que devuelve
+    `sql`; juntas deben identificar una fila (la última suele ser el ID) y no
+    ser NULL (usa NVL). Se filtra con la comparación por tuplas expandida y se
+    pide una fila de más para saber si hay página siguiente. Las columnas de
+    `sql` que empiecen por PAG_ solo sirven de clave y no se devuelven.
+
+    Las filas se devuelven como dicts {columna: valor}, con los mismos
+    minusculas/texto que serializacion.filas_como_dict.
+    Devuelve (columnas, filas, siguiente_cursor, total).
+    """
+    params = dict(params or {})
+    n = len(claves)
+    seleccion = ", ".join(f"{expr} AS PAG_K{i}" for i, (expr, _) in enumerate(claves))
+    filtro = ""
+    if pagina.despues is not None:
+        if len(pagina.despues) != n:
+            raise CursorInvalido("Cursor de paginación inválido")
+        alternativas = []
+        for i, (_, sentido) in enumerate(claves):
+            operador = '<' if sentido.upper() == 'DESC' else '>'
+            partes = [f"PAG_K{j} = :pag_k{j}" for j in range(i)]
+            partes.append(f"PAG_K{i} {operador} :pag_k{i}")
+            alternativas.append("(" + " AND ".join(partes) + ")")
+        filtro = "WHERE " + " OR ".join(alternativas)
+        params.update({f"pag_k{i}": v for i, v in enumerate(pagina.despues)})
+    orden = ", ".join(f"PAG_K{i} {sentido}" for i, (_, sentido) in enumerate(claves))
+    params['pag_limite'] = pagina.limite + 1
+    cursor.execute(f"""
+        SELECT * FROM (SELECT q.*, {seleccion} FROM ({sql}) q)
+        {filtro}
+        ORDER BY {orden}
+        FETCH FIRST :pag_limite ROWS ONLY
+    """, params)
+    nombres = [d[0] for d in cursor.description]
+    visibles = [i for i, nombre in enumerate(nombres[:-n]) if not nombre.upper().startswith('PAG_')]
+    filas = cursor.fetchall()
+    siguiente = None
+    if len(filas) > pagina.limite:
+        filas = filas[:pagina.limite]
+        siguiente = codificar_cursor(filas[-1][-n:])
+    columnas = [nombres[i].lower() if minusculas else nombres[i] for i in visibles]
+    if texto:
+        filas = [dict(zip(columnas, (str(fila[i]) for i in visibles))) for fila in filas]
+    else:
+        filas = [dict(zip(columnas, (fila[i] for i in visibles))) for fila in filas]
+
+    total = None
+    if pagina.contar:
+        base = {k: v for k, v in params.items() if not k.startswith('pag_')}
+        cursor.execute(f"SELECT COUNT(*) FROM ({sql})", base)
+        total = cursor.fetchone()[0]
+    return columnas, filas, siguiente, total
+
+
+def _comparable(valor):
+    # Orden común para textos del mirror, números y fechas; None va primero
+    if valor is None or valor == '':
+        return (0, 0)
+    if isinstance(valor, (int, float, Decimal)):
+        return (1, float(valor))
+    if isinstance(valor, (datetime, date)):
+        return (2, valor.isoformat())
+    try:
+        return (1, float(valor))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return (2, datetime.fromisoformat(valor).isoformat())
+    except ValueError:
+        return (3, str(valor))
+
+def _valor_cursor(valor):
+    # Los textos del mirror se guardan en el cursor con el tipo que tendrían en la BD
+    if not isinstance(valor, str):
+        return valor
+    for conversion in (int, float, datetime.fromisoformat):
+        try:
+            return conversion(valor)
+        except ValueError:
+            continue
+    return valor
+
+def sin_claves_pagina(items):
+    """Quita de cada dict los campos pag_ (solo sirven de clave, como las columnas PAG_)."""
+    return [{k: v for k, v in item.items() if not k.lower().startswith('pag_')} for item in items]
+
+def paginar_lista(items, claves, pagina):
+    """
+    Equivalente de consulta_paginada para una lista de dicts ya en memoria (p. ej.
+    la respuesta de respaldo del mirror). claves: [(campo, 'ASC' | 'DESC'), ...],
+    una por cada clave de la consulta, para que los cursores sirvan en ambas.
+    Los campos pag_ de los items no se devuelven.
+    Devuelve (items, siguiente_cursor, total).
+    """
+    if pagina.despues is not None and len(pagina.despues) != len(claves):
+        raise CursorInvalido("Cursor de paginación inválido")
+
+    def clave(item):
+        return tuple(_comparable(item.get(campo)) for campo, _ in claves)
+
+    def tras_cursor(valores):
+        for (campo, sentido), valor, limite in zip(claves, valores, pagina.despues):
+            limite = _comparable(limite)
+            if valor != limite:
+                return valor < limite if sentido.upper() == 'DESC' else valor > limite
+        return False
+
+    ordenados = list(items)
+    # Orden estable por claves de derecha a izquierda, cada una en su sentido
+    for i in reversed(range(len(claves))):
+        ordenados.sort(key=lambda item: clave(item)[i], reverse=claves[i][1].upper() == 'DESC')
+    if pagina.despues is not None:
+        ordenados = [item for item in ordenados if tras_cursor(clave(item))]
+    pagina_items = ordenados[:pagina.limite]
+    siguiente = None
+    if len(ordenados) > pagina.limite:
+        siguiente = codificar_cursor([_valor_cursor(pagina_items[-1].get(campo)) for campo, _ in claves])
+    total = len(items) if pagina.contar else None
+    return sin_claves_pagina(pagina_items), siguiente, total
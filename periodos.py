@@ -0,0 +1,89 @@
+# periodos.py
+# Filtros de periodo para las consultas de estadísticas. Siempre se generan como
+# rango semiabierto sobre la columna sin funciones (FECHA >= inicio AND FECHA < fin),
+# así Oracle puede usar un índice sobre la fecha (ver sql/indices_estadisticas.sql)
+# en lugar de recorrer la tabla completa como con EXTRACT(MONTH FROM FECHA).
+#   ?desde=AAAA-MM-DD | AAAA-MM    primer día incluido (un mes: su día 1)
+#   ?hasta=AAAA-MM-DD | AAAA-MM    último día incluido (un mes: hasta su último día)
+# Sin parámetros cada ruta usa su periodo por defecto (normalmente el mes actual).
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import request
+
+MESES_ABREV = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+# inicio/fin: datetime (fin excluido) o None si el extremo queda abierto.
+# mes: desplazamiento respecto del mes actual de la BD (0, -1...) en lugar de inicio/fin
+Periodo = namedtuple('Periodo', 'inicio fin mes', defaults=(None,))
+
+
+class PeriodoInvalido(ValueError):
+    """?desde/?hasta con formato incorrecto o rango vacío."""
+
+
+def mes_relativo(desplazamiento=0):
+    """Mes calendario según el reloj de la BD: 0 el actual, -1 el anterior..."""
+    return Periodo(None, None, desplazamiento)
+
+def etiqueta_mes(fecha):
+    """'Ene 2025': mismo texto que TO_CHAR(fecha, 'Mon YYYY') en español."""
+    return f"{MESES_ABREV[fecha.month - 1]} {fecha.year}"
+
+def sumar_meses(fecha, meses):
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    return fecha.replace(year=total // 12, month=total % 12 + 1)
+
+def _leer_fecha(texto, nombre, fin):
+    try:
+        if len(texto) == 7:
+            fecha = datetime.strptime(texto, '%Y-%m')
+            return sumar_meses(fecha, 1) if fin else fecha
+        fecha = datetime.strptime(texto[:10], '%Y-%m-%d')
+        return fecha + timedelta(days=1) if fin else fecha
+    except ValueError:
+        raise PeriodoInvalido(f"Parámetro {nombre} inválido: use AAAA-MM-DD o AAAA-MM")
+
+def periodo_pedido(defecto=None):
+    """
+    Periodo de ?desde/?hasta, o `defecto` (mes_relativo(0) si no se indica)
+    cuando no viene ninguno. Un extremo que falta queda abierto hacia ese lado.
+    """
+    desde, hasta = request.args.get('desde'), request.args.get('hasta')
+    if not desde and not hasta:
+        return defecto if defecto is not None else mes_relativo(0)
+    inicio = _leer_fecha(desde, 'desde', fin=False) if desde else None
+    fin = _leer_fecha(hasta, 'hasta', fin=True) if hasta else None
+    if inicio is not None and fin is not None and fin <= inicio:
+        raise PeriodoInvalido("El rango de fechas está vacío: hasta es anterior a desde")
+    return Periodo(inicio, fin)
+
+def periodo_anterior(periodo):
+    """
+    Periodo inmediatamente anterior y de la misma duración: el mes previo para
+    mes_relativo o rangos de meses completos, los mismos días antes en otro caso.
+    """
+    if periodo.mes is not None:
+        return mes_relativo(periodo.mes - 1)
+    if periodo.inicio is None or periodo.fin is None:
+        raise PeriodoInvalido("Para comparar con el periodo anterior se requieren desde y hasta")
+    inicio, fin = periodo.inicio, periodo.fin
+    if inicio.day == 1 and fin.day == 1:
+        meses = (fin.year - inicio.year) * 12 + fin.month - inicio.month
+        return Periodo(sumar_meses(inicio, -meses), inicio)
+    return Periodo(inicio - (fin - inicio), inicio)
+
+def filtro_periodo(columna, periodo, nombre='periodo'):
+    """
+    (condición SQL, binds) que limita `columna` al periodo. Los binds se llaman
+    :<nombre>_inicio y :<nombre>_fin; usar otro `nombre` si la consulta filtra
+    por más de un periodo. Sin extremos devuelve '1 = 1'.
+    """
+    if periodo.mes is not None:
+        return (f"{columna} >= ADD_MONTHS(TRUNC(SYSDATE, 'MM'), {int(periodo.mes)}) "
+                f"AND {columna} < ADD_MONTHS(TRUNC(SYSDATE, 'MM'), {int(periodo.mes) + 1})"), {}
+    partes, params = [], {}
+    for extremo, operador, valor in (('inicio', '>=', periodo.inicio), ('fin', '<', periodo.fin)):
+        if valor is not None:
+            partes.append(f"{columna} {operador} :{nombre}_{extremo}")
+            params[f"{nombre}_{extremo}"] = valor
+    return (" AND ".join(partes) or "1 = 1"), params
@@ -0,0 +1,233 @@
+# programador.py
+# Tareas periódicas dentro del proceso: avisos de vencimiento de licencias y
+# recordatorios de próximos mantenimientos (alertas.py), cada una con su
+# expresión cron (PROGRAMADOR_CRON_*). Así los recorridos de vencimientos no
+# dependen de que alguien llame a verificar-vencimientos.
+#
+# Con varios workers de gunicorn solo corre las tareas el que tiene el bloqueo
+# del archivo PROGRAMADOR_LOCK (el "líder"); los demás reintentan tomarlo cada
+# minuto, así que si el líder muere otro lo reemplaza. El registro de alertas
+# evita avisos repetidos aun si dos procesos llegaran a correr la misma tarea.
+# Cada ejecución se retrasa al azar hasta PROGRAMADOR_JITTER segundos para no
+# coincidir con otras tareas a la hora en punto.
+# El historial se guarda junto al archivo de bloqueo para que cualquier worker
+# pueda mostrarlo en /api/admin/programador.
+import json
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from alertas import verificar_vencimientos, verificar_mantenimientos
+
+logger = logging.getLogger(__name__)
+
+REINTENTO_LIDER = 60  # segundos entre intentos de tomar el bloqueo
+
+_config = {}
+_tareas = {}          # nombre -> {'cron': ExpresionCron, 'funcion': callable}
+_hilo = None
+_lider = None         # archivo abierto con el bloqueo tomado
+_historial_lock = threading.Lock()
+
+
+class CronInvalido(ValueError):
+    """Expresión cron mal formada."""
+
+
+def _campo(texto, minimo, maximo):
+    valores = set()
+    for parte in texto.split(','):
+        rango, _, paso = parte.partition('/')
+        paso = int(paso) if paso else 1
+        if rango == '*':
+            inicio, fin = minimo, maximo
+        elif '-' in rango:
+            inicio, fin = (int(x) for x in rango.split('-', 1))
+        else:
+            inicio = int(rango)
+            fin = maximo if paso > 1 else inicio
+        if inicio < minimo or fin > maximo or inicio > fin or paso < 1:
+            raise CronInvalido(f"Valor fuera de rango en '{texto}' ({minimo}-{maximo})")
+        valores.update(range(inicio, fin + 1, paso))
+    return valores
+
+class ExpresionCron:
+    """'minuto hora día mes día_semana' (0 o 7 = domingo), con *, listas, rangos y /paso."""
+
+    def __init__(self, expresion):
+        campos = expresion.split()
+        if len(campos) != 5:
+            raise CronInvalido(f"Se esperaban 5 campos en la expresión cron '{expresion}'")
+        try:
+            self.minutos = _campo(campos[0], 0, 59)
+            self.horas = _campo(campos[1], 0, 23)
+            self.dias = _campo(campos[2], 1, 31)
+            self.meses = _campo(campos[3], 1, 12)
+            self.dias_semana = {d % 7 for d in _campo(campos[4], 0, 7)}
+        except ValueError as e:
+            raise CronInvalido(f"Expresión cron no válida '{expresion}': {e}") from e
+        self.expresion = expresion
+        # Como en cron: si se restringen día del mes y de la semana, basta con uno
+        self._ambos_dias = campos[2] != '*' and campos[4] != '*'
+
+    def _dia_valido(self, fecha):
+        en_mes = fecha.day in self.dias
+        en_semana = (fecha.weekday() + 1) % 7 in self.dias_semana
+        return (en_mes or en_semana) if self._ambos_dias else (en_mes and en_semana)
+
+    def siguiente(self, desde):
+        """Primer momento posterior a `desde` que cumple la expresión."""
+        fecha = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = fecha + timedelta(days=366 * 5)
+        while fecha < limite:
+            if fecha.month not in self.meses:
+                fecha = (fecha.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._dia_valido(fecha):
+                fecha = fecha.replace(hour=0, minute=0) + timedelta(days=1)
+            elif fecha.hour not in self.horas:
+                fecha = fecha.replace(minute=0) + timedelta(hours=1)
+            elif fecha.minute not in self.minutos:
+                fecha += timedelta(minutes=1)
+            else:
+                return fecha
+        raise CronInvalido(f"La expresión cron '{self.expresion}' no tiene próximas ejecuciones")
+
+
+def _dias_aviso():
+    # La ventana cubre el mayor umbral, así cada vencimiento se avisa al entrar en cada uno
+    return max(_config['ALERTA_UMBRALES_DIAS'] or [7])
+
+def init_programador(app):
+    """Registra las tareas con su cron y, si PROGRAMADOR_ACTIVO, arranca el hilo."""
+    global _hilo
+    _config.update({k: v for k, v in app.config.items()
+                    if k.startswith('PROGRAMADOR_') or k == 'ALERTA_UMBRALES_DIAS'})
+    _tareas.update({
+        'vencimientos_licencias': {
+            'cron': ExpresionCron(_config['PROGRAMADOR_CRON_LICENCIAS']),
+            'funcion': lambda: verificar_vencimientos(_dias_aviso()),
+        },
+        'proximos_mantenimientos': {
+            'cron': ExpresionCron(_config['PROGRAMADOR_CRON_MANTENIMIENTOS']),
+            'funcion': lambda: verificar_mantenimientos(_dias_aviso()),
+        },
+    })
+    if not _config.get('PROGRAMADOR_ACTIVO'):
+        logger.info("PROGRAMADOR: desactivado (PROGRAMADOR_ACTIVO=0)")
+        return
+    if _hilo is None:
+        _hilo = threading.Thread(target=_bucle, args=(app,), name='programador', daemon=True)
+        _hilo.start()
+
+
+def _tomar_liderazgo():
+    """True si este proceso tiene (o acaba de tomar) el bloqueo del líder."""
+    global _lider
+    if _lider is not None:
+        return True
+    archivo = open(_config['PROGRAMADOR_LOCK'], 'a+')
+    try:
+        if fcntl is not None:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            archivo.seek(0)
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        archivo.close()
+        return False
+    # El archivo queda abierto: el bloqueo dura lo que dure el proceso
+    _lider = archivo
+    logger.info(f"PROGRAMADOR: el proceso {os.getpid()} toma el rol de líder")
+    return True
+
+def _programar(tarea, desde):
+    jitter = random.uniform(0, _config.get('PROGRAMADOR_JITTER', 0))
+    return tarea['cron'].siguiente(desde) + timedelta(seconds=jitter)
+
+def _bucle(app):
+    proximas = {}
+    while True:
+        if not _tomar_liderazgo():
+            time.sleep(REINTENTO_LIDER)
+            continue
+        ahora = datetime.now()
+        for nombre, tarea in _tareas.items():
+            if nombre not in proximas:
+                proximas[nombre] = _programar(tarea, ahora)
+        nombre, momento = min(proximas.items(), key=lambda item: item[1])
+        espera = (momento - ahora).total_seconds()
+        if espera > 0:
+            time.sleep(min(espera, REINTENTO_LIDER))
+            continue
+        with app.app_context():
+            _ejecutar(nombre)
+        proximas[nombre] = _programar(_tareas[nombre], datetime.now())
+
+
+def _archivo_historial():
+    return _config['PROGRAMADOR_LOCK'] + '.historial.json'
+
+def _leer_historial():
+    try:
+        with open(_archivo_historial(), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _registrar(ejecucion):
+    with _historial_lock:
+        historial = _leer_historial()
+        historial.append(ejecucion)
+        historial = historial[-_config.get('PROGRAMADOR_HISTORIAL', 100):]
+        temporal = _archivo_historial() + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(historial, f, ensure_ascii=False)
+        os.replace(temporal, _archivo_historial())
+
+def _ejecutar(nombre):
+    inicio = datetime.now()
+    ejecucion = {'tarea': nombre, 'inicio': inicio.isoformat(timespec='seconds'), 'pid': os.getpid()}
+    try:
+        informe = _tareas[nombre]['funcion']()
+        ejecucion.update(estado='ok', trabajo=informe.get('trabajo'),
+                         enviadas=informe.get('enviadas'), omitidas=informe.get('omitidas'))
+        logger.info(f"PROGRAMADOR: {nombre} terminó: {informe.get('enviadas')} aviso(s) encolado(s), "
+                    f"{informe.get('omitidas')} omitido(s)")
+    except Exception as e:
+        ejecucion.update(estado='error', error=str(e))
+        logger.error(f"PROGRAMADOR: error en la tarea {nombre}: {e}")
+        logger.error(traceback.format_exc())
+    ejecucion['duracionSegundos'] = round((datetime.now() - inicio).total_seconds(), 2)
+    try:
+        _registrar(ejecucion)
+    except OSError as e:
+        logger.error(f"PROGRAMADOR: no se pudo guardar el historial: {e}")
+    return ejecucion
+
+
+def estado_programador():
+    """Tareas con su cron y próxima ejecución, si este proceso es el líder y el historial."""
+    ahora = datetime.now()
+    return {
+        'activo': bool(_config.get('PROGRAMADOR_ACTIVO')),
+        'lider': _lider is not None,
+        'pid': os.getpid(),
+        'jitterSegundos': _config.get('PROGRAMADOR_JITTER'),
+        'tareas': [{
+            'nombre': nombre,
+            'cron': tarea['cron'].expresion,
+            # Sin el retraso al azar, que solo conoce el líder
+            'proxima': tarea['cron'].siguiente(ahora).isoformat(timespec='minutes'),
+        } for nombre, tarea in _tareas.items()],
+        'historial': list(reversed(_leer_historial())),
+    }
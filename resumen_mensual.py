@@ -0,0 +1,141 @@
+# resumen_mensual.py
+# Resumen mensual de OPERACIONES (tabla OPERACIONES_MES, ver sql/operaciones_mes.sql):
+# una fila por (mes, TIPO_OPERACION, ID_CLIENTE) con las sumas de INGRESO, EGRESO,
+# INGRESO - EGRESO y la cantidad de operaciones. Las rutas que escriben en
+# OPERACIONES recalculan, dentro de su misma transacción, solo los grupos que
+# tocaron; las estadísticas por meses completos leen de aquí en lugar de
+# agregar OPERACIONES en cada petición.
+import logging
+import threading
+import oracledb
+
+logger = logging.getLogger(__name__)
+
+ORA_TABLA_NO_EXISTE = 942
+
+# Misma forma que OPERACIONES_MES, calculada al vuelo: para periodos que no son
+# meses completos o si la tabla de resumen no existe
+_OPERACIONES_COMO_RESUMEN = """(
+    SELECT FECHA, TIPO_OPERACION, ID_CLIENTE, INGRESO, EGRESO,
+           INGRESO - NVL(EGRESO, 0) AS NETO, 1 AS OPERACIONES
+    FROM OPERACIONES
+)"""
+
+# Agregado de un grupo (o de toda la tabla, con condicion = '1 = 1')
+_SELECT_GRUPOS = """
+    SELECT TRUNC(FECHA, 'MM'), TIPO_OPERACION, ID_CLIENTE,
+           SUM(INGRESO), SUM(EGRESO), SUM(INGRESO - NVL(EGRESO, 0)), COUNT(*)
+    FROM OPERACIONES
+    WHERE FECHA IS NOT NULL AND {condicion}
+    GROUP BY TRUNC(FECHA, 'MM'), TIPO_OPERACION, ID_CLIENTE
+"""
+
+# DECODE compara NULL = NULL como iguales
+_CONDICION_GRUPO = """FECHA >= :mes AND FECHA < ADD_MONTHS(:mes, 1)
+      AND DECODE(TIPO_OPERACION, :tipo, 1, 0) = 1 AND DECODE(ID_CLIENTE, :cliente, 1, 0) = 1"""
+
+_INSERT = """
+    INSERT INTO OPERACIONES_MES (MES, TIPO_OPERACION, ID_CLIENTE, INGRESO, EGRESO, NETO, OPERACIONES)
+"""
+
+_lock = threading.Lock()
+_disponible = None  # None: aún no comprobado
+
+
+def _codigo_error(e):
+    error = e.args[0] if e.args else None
+    return getattr(error, 'code', None)
+
+def disponible(cursor):
+    """True si existe OPERACIONES_MES (se comprueba una vez por proceso)."""
+    global _disponible
+    if _disponible is None:
+        with _lock:
+            if _disponible is None:
+                try:
+                    cursor.execute("SELECT 1 FROM OPERACIONES_MES WHERE ROWNUM = 1")
+                    cursor.fetchall()
+                    _disponible = True
+                except oracledb.DatabaseError as e:
+                    if _codigo_error(e) != ORA_TABLA_NO_EXISTE:
+                        raise
+                    logger.warning("OPERACIONES_MES no existe (ver sql/operaciones_mes.sql); "
+                                   "las estadísticas se calcularán sobre OPERACIONES.")
+                    _disponible = False
+    return _disponible
+
+
+def _meses_completos(periodo):
+    if periodo is None or periodo.mes is not None:
+        return True
+    return all(extremo is None or (extremo.day == 1 and extremo.time() == extremo.time().min)
+               for extremo in (periodo.inicio, periodo.fin))
+
+def origen_operaciones(cursor, periodo=None, diario=False):
+    """
+    (origen, columna_fecha) para usar en FROM: OPERACIONES_MES y su columna MES
+    si el periodo cubre meses completos (periodo None: la ruta filtra por meses
+    por su cuenta), o una vista de OPERACIONES con las mismas columnas y FECHA.
+    Con diario=True (agrupación por día o semana) siempre la segunda.
+    Columnas: TIPO_OPERACION, ID_CLIENTE, INGRESO, EGRESO, NETO, OPERACIONES.
+    """
+    if not diario and _meses_completos(periodo) and disponible(cursor):
+        return 'OPERACIONES_MES', 'MES'
+    return _OPERACIONES_COMO_RESUMEN, 'FECHA'
+
+
+def claves_operaciones(cursor, ids):
+    """Grupos (mes, tipo, cliente) a los que pertenecen hoy las operaciones `ids`."""
+    ids = [i for i in ids if i is not None]
+    if not ids or not disponible(cursor):
+        return set()
+    marcadores = ", ".join(f":id{n}" for n in range(len(ids)))
+    cursor.execute(f"""
+        SELECT DISTINCT TRUNC(FECHA, 'MM'), TIPO_OPERACION, ID_CLIENTE FROM OPERACIONES
+        WHERE ID_OPERACION IN ({marcadores}) AND FECHA IS NOT NULL
+    """, {f"id{n}": i for n, i in enumerate(ids)})
+    return set(cursor.fetchall())
+
+def actualizar_resumen(cursor, ids, previas=()):
+    """
+    Recalcula los grupos de las operaciones `ids` tras escribirlas, más los de
+    `previas` (claves_operaciones() tomado antes de un UPDATE o DELETE, porque la
+    operación pudo cambiar de mes o desaparecer). No confirma: va en la misma
+    transacción que la escritura.
+    """
+    claves = claves_operaciones(cursor, ids) | set(previas)
+    if not claves:
+        return
+    params = [{'mes': mes, 'tipo': tipo, 'cliente': cliente} for mes, tipo, cliente in sorted(claves, key=str)]
+    for intento in range(2):
+        try:
+            cursor.executemany("""
+                DELETE FROM OPERACIONES_MES
+                WHERE MES = :mes AND DECODE(TIPO_OPERACION, :tipo, 1, 0) = 1
+                  AND DECODE(ID_CLIENTE, :cliente, 1, 0) = 1
+            """, params)
+            cursor.executemany(_INSERT + _SELECT_GRUPOS.format(condicion=_CONDICION_GRUPO), params)
+            return
+        except oracledb.IntegrityError:
+            # Otra transacción creó el mismo grupo a la vez; al repetir, el DELETE
+            # espera a que confirme y la reemplaza con el cálculo completo
+            if intento:
+                raise
+
+def reconstruir_resumen(conn):
+    """
+    Vuelve a generar OPERACIONES_MES completa desde OPERACIONES y confirma.
+    Sirve tras crear la tabla o si OPERACIONES se modificó fuera de esta API.
+    Devuelve la cantidad de grupos.
+    """
+    global _disponible
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM OPERACIONES_MES")
+        cursor.execute(_INSERT + _SELECT_GRUPOS.format(condicion="1 = 1"))
+        filas = cursor.rowcount
+        conn.commit()
+        _disponible = True
+        return filas
+    finally:
+        cursor.close()
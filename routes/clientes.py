@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
-from db import get_db  # Cambia la importación aquí
+from db import get_db, ConexionNoDisponible  # Cambia la importación aquí
 from db_mirror import create_record, update_record, delete_record
+from mirror_fallback import con_respaldo_mirror, leer_clientes
+from paginacion import parametros_pagina, consulta_paginada, cuerpo_pagina, CursorInvalido
+from serializacion import filas_como_dict, respuesta_filas
+from cache_http import con_etag
 
 clientes_bp = Blueprint('clientes', __name__)
 
@@ -9,32 +13,37 @@ CLIENTES_FIELDS = ["ID_CLIENTE", "NOMBRE", "APELLIDO", "CELULAR", "DIRECCION", "
 
 # Obtener todos los clientes
 @clientes_bp.route('/', methods=['GET'])
+@con_respaldo_mirror(leer_clientes, ['CLIENTES'], orden=[('id_cliente', 'ASC')])
+@con_etag(['CLIENTES'])
 def get_clientes():
     try:
+        pagina = parametros_pagina()
         conn = get_db()
         cursor = conn.cursor()
-        cursor.execute("""
+        sql = """
             SELECT ID_CLIENTE, NOMBRE, APELLIDO, CELULAR, DIRECCION, CORREO FROM CLIENTES
-        """)
-        clientes = [
-            {
-                "id_cliente": row[0],
-                "nombre": row[1],
-                "apellido": row[2],
-                "celular": row[3],
-                "direccion": row[4],
-                "correo": row[5]
-            }
-            for row in cursor.fetchall()
-        ]
+        """
+        # Las columnas en minúsculas ya son las claves de la respuesta
+        if pagina:
+            columnas, clientes, siguiente, total = consulta_paginada(
+                cursor, sql, [('ID_CLIENTE', 'ASC')], pagina, minusculas=True)
+        else:
+            cursor.execute(sql)
+            columnas = filas_como_dict(cursor, minusculas=True)
+            clientes = cursor.fetchall()
         cursor.close()
-        return jsonify(clientes)
+        return respuesta_filas(clientes, columnas, cuerpo_pagina(clientes, siguiente, total) if pagina else None)
+    except CursorInvalido as e:
+        return jsonify(error=str(e)), 400
+    except ConexionNoDisponible:
+        raise  # Lo atiende con_respaldo_mirror
     except Exception as e:
         current_app.logger.error(f"Error al obtener clientes: {e}")
         return jsonify(error=str(e)), 500
 
 # Obtener un cliente por ID
 @clientes_bp.route('/<int:id_cliente>', methods=['GET'])
+@con_etag(['CLIENTES'])
 def get_cliente(id_cliente):
     try:
         conn = get_db()
@@ -0,0 +1,104 @@
+# serializacion.py
+# Capa común de serialización de filas y JSON:
+#  - ProveedorJSON: proveedor JSON de Flask que usa orjson si está instalado
+#    (dependencia opcional) y produce lo mismo que el proveedor por defecto.
+#  - fechas_iso: outputtypehandler de oracledb que entrega DATE/TIMESTAMP ya
+#    como texto ISO, sin revisar cada celda desde Python.
+#  - filas_como_dict: rowfactory para que fetch* devuelva dicts directamente.
+#  - respuesta_filas: respuesta de un listado en el formato pedido: JSON normal,
+#    ?format=columnar ({columns, rows}) o MessagePack (Accept: application/x-msgpack).
+from datetime import datetime
+import oracledb
+from flask import Response, current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Sin orjson se usa el json de la librería estándar
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Sin msgpack solo se ofrecen los formatos JSON
+    msgpack = None
+
+_TIPOS_FECHA = (oracledb.DB_TYPE_DATE, oracledb.DB_TYPE_TIMESTAMP)
+MSGPACK = 'application/x-msgpack'
+_TIPOS_MSGPACK = (MSGPACK, 'application/msgpack')
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    """
+    Mismas reglas que DefaultJSONProvider (fechas en formato HTTP, Decimal como
+    texto, claves ordenadas), con orjson para la codificación. Las respuestas
+    con sangría (modo debug) siguen pasando por json.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'separators'}:
+            return super().dumps(obj, **kwargs)
+        opciones = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=opciones).decode('utf-8')
+
+
+def fechas_iso(cursor, metadata):
+    """
+    outputtypehandler: las columnas de fecha se reciben como isoformat(), que es
+    el formato que la API devuelve en los listados. No aplica a las columnas
+    PAG_ de paginacion.py, que deben seguir siendo fechas para el cursor.
+    """
+    if metadata.type_code in _TIPOS_FECHA and not metadata.name.upper().startswith('PAG_'):
+        return cursor.var(metadata.type_code, arraysize=cursor.arraysize, outconverter=datetime.isoformat)
+
+def filas_como_dict(cursor, minusculas=False, texto=False):
+    """
+    Tras execute(): hace que fetch* devuelva {columna: valor}. Con texto=True
+    cada valor pasa por str() (formato de /api/clientes y /api/table/.../data).
+    Devuelve la lista de columnas.
+    """
+    columnas = [d[0].lower() if minusculas else d[0] for d in cursor.description]
+    if texto:
+        cursor.rowfactory = lambda *fila: dict(zip(columnas, map(str, fila)))
+    else:
+        cursor.rowfactory = lambda *fila: dict(zip(columnas, fila))
+    return columnas
+
+
+def formato_respuesta():
+    """'msgpack', 'columnar' o 'json' según el Accept y ?format de la petición."""
+    if msgpack is not None and any(tipo in _TIPOS_MSGPACK for tipo, _ in request.accept_mimetypes):
+        return 'msgpack'
+    if request.args.get('format') == 'columnar':
+        return 'columnar'
+    return 'json'
+
+def a_columnas(filas, columnas=None):
+    """{columns, rows}: los nombres una sola vez y cada fila como lista."""
+    if columnas is None:
+        columnas = list(filas[0]) if filas else []
+    return {'columns': columnas, 'rows': [list(fila.values()) for fila in filas]}
+
+def respuesta_filas(filas, columnas=None, envoltura=None):
+    """
+    Respuesta de un listado de dicts en el formato pedido (formato_respuesta).
+    `envoltura` es el cuerpo JSON habitual cuando la lista no va sola, con las
+    filas bajo 'data' (p. ej. cuerpo_pagina); en columnar/msgpack se conservan
+    sus demás claves y 'data' se reemplaza por columns/rows. MessagePack usa
+    las mismas conversiones que el JSON (fechas, Decimal).
+    """
+    formato = formato_respuesta()
+    if formato == 'json':
+        respuesta = jsonify(filas if envoltura is None else envoltura)
+    else:
+        cuerpo = {k: v for k, v in (envoltura or {}).items() if k != 'data'}
+        cuerpo.update(a_columnas(filas, columnas))
+        if formato == 'msgpack':
+            respuesta = Response(msgpack.packb(cuerpo, default=current_app.json.default, use_bin_type=True),
+                                 mimetype=MSGPACK)
+        else:
+            respuesta = jsonify(cuerpo)
+    # El cuerpo depende del Accept: las cachés no deben mezclar formatos
+    respuesta.vary.add('Accept')
+    return respuesta
@@ -3,14 +3,16 @@
 from flask import g, jsonify, request, current_app
 import oracledb
 from datetime import datetime, date
+from db import conexion, ConexionNoDisponible
 from db_mirror import create_record, update_record, delete_record
+from mirror_fallback import con_respaldo_mirror, leer_servicios
+from paginacion import parametros_pagina, consulta_paginada, cuerpo_pagina, CursorInvalido
+from streaming import quiere_stream, cursor_stream, respuesta_en_stream
+from serializacion import fechas_iso, filas_como_dict, respuesta_filas
+from cache_http import con_etag
+from resumen_mensual import actualizar_resumen, claves_operaciones
 
 # --- Funciones Helper (sin cambios) ---
-def serialize_dates(obj):
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    return obj
-
 def parse_date_for_oracle(date_string):
     if not date_string: return None
     try:
@@ -32,11 +34,22 @@ def get_db_connection():
 
 # --- Lógica de Servicios ---
 
+# Más recientes primero; el ID desempata para poder paginar por cursor
+ORDEN_SERVICIOS = [("NVL(FECHA, DATE '1900-01-01')", 'DESC'), ('ID_OPERACION', 'DESC')]
+# Las mismas claves sobre las filas del mirror (campo pag_fecha de leer_servicios)
+ORDEN_SERVICIOS_MIRROR = [('pag_fecha', 'DESC'), ('id_operacion', 'DESC')]
+
+@con_respaldo_mirror(leer_servicios, ['SERVICIOS', 'OPERACIONES', 'CLIENTES'],
+                     orden=ORDEN_SERVICIOS_MIRROR)
+@con_etag(['SERVICIOS', 'OPERACIONES', 'CLIENTES'])
 def get_servicios():
-    """Obtener todos los servicios con información de cliente"""
+    """Obtener todos los servicios con información de cliente (?limit/?after para paginar, ?stream=1 o NDJSON)"""
     try:
+        pagina = parametros_pagina()
+        stream = quiere_stream() and not pagina
         conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = cursor_stream(conn) if stream else conn.cursor()
+        cursor.outputtypehandler = fechas_iso
         
         query = """
         SELECT 
@@ -54,18 +67,25 @@ def get_servicios():
         INNER JOIN servicios s ON o.id_operacion = s.id_operacion
         INNER JOIN clientes c ON o.id_cliente = c.id_cliente
         WHERE o.tipo_operacion = 'SERVICIO'
-        ORDER BY o.fecha DESC
         """
         
-        cursor.execute(query)
-        columns = [col[0].lower() for col in cursor.description]
-        rows = cursor.fetchall()
-        
-        servicios = [{col: serialize_dates(val) for col, val in zip(columns, row)} for row in rows]
+        if pagina:
+            columnas, servicios, siguiente, total = consulta_paginada(
+                cursor, query, ORDEN_SERVICIOS, pagina, minusculas=True)
+        else:
+            cursor.execute(query + " ORDER BY o.fecha DESC")
+            columnas = filas_como_dict(cursor, minusculas=True)
+            if stream:
+                return respuesta_en_stream(cursor, columnas=columnas)
+            servicios = cursor.fetchall()
         
         cursor.close()
-        return jsonify(servicios)
+        return respuesta_filas(servicios, columnas, cuerpo_pagina(servicios, siguiente, total) if pagina else None)
         
+    except CursorInvalido as e:
+        return jsonify(error=str(e)), 400
+    except ConexionNoDisponible:
+        raise  # Lo atiende con_respaldo_mirror
     except Exception as e:
         current_app.logger.error(f"Error al obtener servicios: {e}")
         return jsonify(error=str(e)), 500
@@ -82,41 +102,42 @@ def create_servicio():
         if not all(field in data for field in ['id_cliente', 'detalle']):
             return jsonify(error="Campos requeridos: id_cliente, detalle"), 400
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with conexion() as conn:
+            cursor = conn.cursor()
         
-        # <<< CORRECCIÓN CLAVE: Asegurar que los valores numéricos sean siempre números >>>
-        ingreso_valor = data.get('ingreso') or 0
-        egreso_valor = data.get('egreso') or 0
+            # <<< CORRECCIÓN CLAVE: Asegurar que los valores numéricos sean siempre números >>>
+            ingreso_valor = data.get('ingreso') or 0
+            egreso_valor = data.get('egreso') or 0
         
-        # 1. Insertar en OPERACIONES
-        id_operacion_var = cursor.var(oracledb.NUMBER)
-        cursor.execute("""
-            INSERT INTO operaciones (id_cliente, fecha, tipo_operacion, ingreso, egreso)
-            VALUES (:id_cliente, :fecha, 'SERVICIO', :ingreso, :egreso)
-            RETURNING id_operacion INTO :id_operacion
-        """, {
-            'id_cliente': data['id_cliente'],
-            'fecha': parse_date_for_oracle(data.get('fecha')) or date.today(),
-            'ingreso': ingreso_valor, # Usar el valor seguro
-            'egreso': egreso_valor,   # Usar el valor seguro
-            'id_operacion': id_operacion_var
-        })
-        id_operacion = id_operacion_var.getvalue()[0]
+            # 1. Insertar en OPERACIONES
+            id_operacion_var = cursor.var(oracledb.NUMBER)
+            cursor.execute("""
+                INSERT INTO operaciones (id_cliente, fecha, tipo_operacion, ingreso, egreso)
+                VALUES (:id_cliente, :fecha, 'SERVICIO', :ingreso, :egreso)
+                RETURNING id_operacion INTO :id_operacion
+            """, {
+                'id_cliente': data['id_cliente'],
+                'fecha': parse_date_for_oracle(data.get('fecha')) or date.today(),
+                'ingreso': ingreso_valor, # Usar el valor seguro
+                'egreso': egreso_valor,   # Usar el valor seguro
+                'id_operacion': id_operacion_var
+            })
+            id_operacion = id_operacion_var.getvalue()[0]
+            actualizar_resumen(cursor, [id_operacion])
         
-        # 2. Insertar en SERVICIOS
-        cursor.execute("""
-            INSERT INTO servicios (id_operacion, detalle_servicio, tecnico_encargado, duracion_estimada)
-            VALUES (:id_operacion, :detalle_servicio, :tecnico_encargado, :duracion_estimada)
-        """, {
-            'id_operacion': id_operacion,
-            'detalle_servicio': data['detalle'],
-            'tecnico_encargado': data.get('tecnico_encargado'),
-            'duracion_estimada': data.get('duracion_estimada')
-        })
+            # 2. Insertar en SERVICIOS
+            cursor.execute("""
+                INSERT INTO servicios (id_operacion, detalle_servicio, tecnico_encargado, duracion_estimada)
+                VALUES (:id_operacion, :detalle_servicio, :tecnico_encargado, :duracion_estimada)
+            """, {
+                'id_operacion': id_operacion,
+                'detalle_servicio': data['detalle'],
+                'tecnico_encargado': data.get('tecnico_encargado'),
+                'duracion_estimada': data.get('duracion_estimada')
+            })
         
-        conn.commit()
-        cursor.close()
+            conn.commit()
+            cursor.close()
         # MIRROR: Crear en OPERACIONES y SERVICIOS
         create_record('OPERACIONES', {
             "ID_OPERACION": id_operacion,
@@ -135,7 +156,6 @@ def create_servicio():
         return jsonify({'message': 'Servicio creado exitosamente', 'id_operacion': id_operacion}), 201
         
     except Exception as e:
-        if 'conn' in locals() and conn: conn.rollback()
         current_app.logger.error(f"Error al crear servicio: {e}")
         return jsonify(error=str(e)), 500
 
@@ -143,39 +163,41 @@ def update_servicio(id):
     """Actualizar un servicio existente"""
     try:
         data = request.get_json()
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with conexion() as conn:
+            cursor = conn.cursor()
 
-        # 1. Actualizar OPERACIONES
-        cursor.execute("""
-            UPDATE operaciones SET 
-                fecha = COALESCE(:fecha, fecha), 
-                ingreso = COALESCE(:ingreso, ingreso), 
-                egreso = COALESCE(:egreso, egreso)
-            WHERE id_operacion = :id AND tipo_operacion = 'SERVICIO'
-        """, {
-            'id': id,
-            'fecha': parse_date_for_oracle(data.get('fecha')),
-            'ingreso': data.get('ingreso'), # COALESCE maneja bien los None aquí
-            'egreso': data.get('egreso')
-        })
+            # 1. Actualizar OPERACIONES (y su grupo en el resumen mensual, antes y después)
+            previas = claves_operaciones(cursor, [id])
+            cursor.execute("""
+                UPDATE operaciones SET 
+                    fecha = COALESCE(:fecha, fecha), 
+                    ingreso = COALESCE(:ingreso, ingreso), 
+                    egreso = COALESCE(:egreso, egreso)
+                WHERE id_operacion = :id AND tipo_operacion = 'SERVICIO'
+            """, {
+                'id': id,
+                'fecha': parse_date_for_oracle(data.get('fecha')),
+                'ingreso': data.get('ingreso'), # COALESCE maneja bien los None aquí
+                'egreso': data.get('egreso')
+            })
+            actualizar_resumen(cursor, [id], previas)
         
-        # 2. Actualizar SERVICIOS de forma robusta
-        cursor.execute("""
-            UPDATE servicios SET 
-                detalle_servicio = COALESCE(:detalle_servicio, detalle_servicio),
-                tecnico_encargado = COALESCE(:tecnico_encargado, tecnico_encargado),
-                duracion_estimada = COALESCE(:duracion_estimada, duracion_estimada)
-            WHERE id_operacion = :id
-        """, {
-            'id': id, 
-            'detalle_servicio': data.get('detalle'),
-            'tecnico_encargado': data.get('tecnico_encargado'),
-            'duracion_estimada': data.get('duracion_estimada')
-        })
+            # 2. Actualizar SERVICIOS de forma robusta
+            cursor.execute("""
+                UPDATE servicios SET 
+                    detalle_servicio = COALESCE(:detalle_servicio, detalle_servicio),
+                    tecnico_encargado = COALESCE(:tecnico_encargado, tecnico_encargado),
+                    duracion_estimada = COALESCE(:duracion_estimada, duracion_estimada)
+                WHERE id_operacion = :id
+            """, {
+                'id': id, 
+                'detalle_servicio': data.get('detalle'),
+                'tecnico_encargado': data.get('tecnico_encargado'),
+                'duracion_estimada': data.get('duracion_estimada')
+            })
             
-        conn.commit()
-        cursor.close()
+            conn.commit()
+            cursor.close()
         # MIRROR: Actualizar en OPERACIONES y SERVICIOS
         update_record('OPERACIONES', id, {
             "ID_OPERACION": id,
@@ -192,7 +214,6 @@ def update_servicio(id):
         return jsonify(message="Servicio actualizado exitosamente")
         
     except Exception as e:
-        if 'conn' in locals() and conn: conn.rollback()
         current_app.logger.error(f"Error al actualizar servicio {id}: {e}")
         return jsonify(error=str(e)), 500
 
@@ -203,23 +224,25 @@ def update_servicio(id):
 def delete_servicio(id):
     """Eliminar un servicio"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM servicios WHERE id_operacion = :id", {'id': id})
-        cursor.execute("DELETE FROM operaciones WHERE id_operacion = :id AND tipo_operacion = 'SERVICIO'", {'id': id})
-        if cursor.rowcount == 0:
-            return jsonify(error="Servicio no encontrado"), 404
-        conn.commit()
-        cursor.close()
+        with conexion() as conn:
+            cursor = conn.cursor()
+            previas = claves_operaciones(cursor, [id])
+            cursor.execute("DELETE FROM servicios WHERE id_operacion = :id", {'id': id})
+            cursor.execute("DELETE FROM operaciones WHERE id_operacion = :id AND tipo_operacion = 'SERVICIO'", {'id': id})
+            if cursor.rowcount == 0:
+                return jsonify(error="Servicio no encontrado"), 404
+            actualizar_resumen(cursor, [], previas)
+            conn.commit()
+            cursor.close()
         # MIRROR: Eliminar en SERVICIOS y OPERACIONES
         delete_record('SERVICIOS', id, SERVICIOS_FIELDS)
         delete_record('OPERACIONES', id, OPERACIONES_FIELDS)
         return jsonify(message="Servicio eliminado exitosamente")
     except Exception as e:
-        if 'conn' in locals() and conn: conn.rollback()
         current_app.logger.error(f"Error al eliminar servicio {id}: {e}")
         return jsonify(error=str(e)), 500
 
+@con_etag(['SERVICIOS', 'OPERACIONES', 'CLIENTES'])
 def search_servicios():
     """Buscar servicios por un término de búsqueda"""
     try:
@@ -245,9 +268,10 @@ def search_servicios():
         )
         ORDER BY o.fecha DESC
         """
+        cursor.outputtypehandler = fechas_iso
         cursor.execute(query, {'search': f"%{search_term}%"})
-        columns = [col[0].lower() for col in cursor.description]
-        servicios = [{col: serialize_dates(val) for col, val in zip(columns, row)} for row in cursor.fetchall()]
+        filas_como_dict(cursor, minusculas=True)
+        servicios = cursor.fetchall()
         cursor.close()
         return jsonify(servicios)
     except Exception as e:
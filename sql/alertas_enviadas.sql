@@ -0,0 +1,30 @@
+-- Registro de avisos de vencimiento enviados (alertas.py).
+-- Una fila por licencia, tipo de alerta, umbral de días (ALERTA_UMBRALES_DIAS;
+-- -1 = aún fuera de los umbrales) y FECHA_FIN avisada: si la licencia se
+-- renueva, la nueva FECHA_FIN vuelve a generar avisos.
+-- Los recordatorios de mantenimiento (TIPO_ALERTA = 'PROX_MANTENIMIENTO') guardan
+-- 'MP-<ID_OPERACION>' en ID_LICENCIA y PROX_MANTENIMIENTO en FECHA_FIN.
+-- ESTADO: 'PENDIENTE' desde que una verificación reclama el aviso hasta que el
+-- servidor SMTP acepta el correo ('ENVIADO'); FECHA_ENVIO es el momento del
+-- reclamo y luego el del envío. Un PENDIENTE con más de ALERTA_PENDIENTE_MINUTOS
+-- (p. ej. el proceso se reinició con el correo en cola) se vuelve a reclamar.
+-- Organizada como índice: el INSERT con que la verificación reclama cada aviso
+-- choca por clave primaria con los ya enviados sin acceder a otra estructura.
+CREATE TABLE ALERTAS_ENVIADAS (
+    ID_LICENCIA  VARCHAR2(20)  NOT NULL,
+    TIPO_ALERTA  VARCHAR2(30)  NOT NULL,
+    DIAS_UMBRAL  NUMBER        NOT NULL,
+    FECHA_FIN    DATE          NOT NULL,
+    CORREO       VARCHAR2(100),
+    FECHA_ENVIO  DATE          DEFAULT SYSDATE NOT NULL,
+    ESTADO       VARCHAR2(10)  DEFAULT 'ENVIADO' NOT NULL
+                 CONSTRAINT CK_ALERTAS_ENVIADAS_ESTADO CHECK (ESTADO IN ('PENDIENTE', 'ENVIADO')),
+    CONSTRAINT PK_ALERTAS_ENVIADAS PRIMARY KEY (ID_LICENCIA, TIPO_ALERTA, DIAS_UMBRAL, FECHA_FIN)
+) ORGANIZATION INDEX;
+
+-- Tablas creadas antes de la columna ESTADO (las filas existentes quedan como enviadas):
+-- ALTER TABLE ALERTAS_ENVIADAS ADD (ESTADO VARCHAR2(10) DEFAULT 'ENVIADO' NOT NULL
+--     CONSTRAINT CK_ALERTAS_ENVIADAS_ESTADO CHECK (ESTADO IN ('PENDIENTE', 'ENVIADO')));
+
+-- Limpieza periódica opcional: los avisos de vencimientos ya pasados no se vuelven a consultar
+-- DELETE FROM ALERTAS_ENVIADAS WHERE FECHA_FIN < TRUNC(SYSDATE) - 90;
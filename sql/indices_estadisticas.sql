@@ -0,0 +1,28 @@
+-- Índices para las consultas de estadísticas y vencimientos (periodos.py,
+-- dashboard_routes.py). Los filtros de periodo se escriben como rango sobre la
+-- columna (FECHA >= :inicio AND FECHA < :fin), así que un índice normal sobre
+-- la fecha basta; no hacen falta índices por función.
+-- Si alguna columna ya está indexada (p. ej. por una FK), omitir esa sentencia.
+
+-- Estadísticas por periodo: rango sobre FECHA
+CREATE INDEX IX_OPERACIONES_FECHA ON OPERACIONES (FECHA);
+
+-- Top de clientes y estadísticas por cliente: el rango se resuelve dentro de cada cliente
+CREATE INDEX IX_OPERACIONES_CLIENTE_FECHA ON OPERACIONES (ID_CLIENTE, FECHA);
+
+-- Joins desde OPERACIONES hacia las ventas y las licencias vendidas
+CREATE INDEX IX_VENTAS_OPERACION ON VENTAS (ID_OPERACION);
+CREATE INDEX IX_VENTAS_LICENCIA ON VENTAS (ID_LICENCIA);
+
+-- Vencimientos próximos (FECHA_FIN BETWEEN TRUNC(SYSDATE) AND TRUNC(SYSDATE) + N)
+CREATE INDEX IX_ANTIVIRUS_FECHA_FIN ON ANTIVIRUS (FECHA_FIN);
+CREATE INDEX IX_MICROSOFT365_FECHA_FIN ON MICROSOFT365 (FECHA_FIN);
+CREATE INDEX IX_WINDOWS_FECHA_FIN ON WINDOWS (FECHA_FIN);
+CREATE INDEX IX_MANTENIMIENTOS_PROX ON MANTENIMIENTOS (PROX_MANTENIMIENTO);
+
+-- Actualizar estadísticas del optimizador tras crear los índices
+BEGIN
+    DBMS_STATS.GATHER_TABLE_STATS(USER, 'OPERACIONES', cascade => TRUE);
+    DBMS_STATS.GATHER_TABLE_STATS(USER, 'VENTAS', cascade => TRUE);
+END;
+/
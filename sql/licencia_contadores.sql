@@ -0,0 +1,24 @@
+-- Contadores para los IDs de licencia (licencias.py).
+-- ULTIMO es el último número ya reservado para el prefijo; la aplicación lo
+-- avanza por bloques (LICENCIA_ID_BLOQUE) con UPDATE ... RETURNING.
+-- Si no se siembran aquí, la aplicación crea cada fila la primera vez a partir
+-- del mayor ID existente.
+CREATE TABLE LICENCIA_CONTADORES (
+    PREFIJO VARCHAR2(5) NOT NULL,
+    ULTIMO  NUMBER      NOT NULL,
+    CONSTRAINT PK_LICENCIA_CONTADORES PRIMARY KEY (PREFIJO)
+);
+
+INSERT INTO LICENCIA_CONTADORES (PREFIJO, ULTIMO)
+SELECT 'A-', NVL(MAX(TO_NUMBER(SUBSTR(ID_LICENCIA, 3))), 0) FROM ANTIVIRUS
+WHERE REGEXP_LIKE(ID_LICENCIA, '^A-[0-9]+$');
+
+INSERT INTO LICENCIA_CONTADORES (PREFIJO, ULTIMO)
+SELECT 'M-', NVL(MAX(TO_NUMBER(SUBSTR(ID_LICENCIA, 3))), 0) FROM MICROSOFT365
+WHERE REGEXP_LIKE(ID_LICENCIA, '^M-[0-9]+$');
+
+INSERT INTO LICENCIA_CONTADORES (PREFIJO, ULTIMO)
+SELECT 'W-', NVL(MAX(TO_NUMBER(SUBSTR(ID_LICENCIA, 3))), 0) FROM WINDOWS
+WHERE REGEXP_LIKE(ID_LICENCIA, '^W-[0-9]+$');
+
+COMMIT;
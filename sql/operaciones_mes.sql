@@ -0,0 +1,23 @@
+-- Resumen mensual de OPERACIONES (resumen_mensual.py).
+-- Una fila por mes, tipo de operación y cliente. La aplicación la mantiene al
+-- escribir operaciones y puede regenerarla con POST /api/admin/resumen-mensual/reconstruir.
+CREATE TABLE OPERACIONES_MES (
+    MES            DATE          NOT NULL,
+    TIPO_OPERACION VARCHAR2(50),
+    ID_CLIENTE     NUMBER,
+    INGRESO        NUMBER,
+    EGRESO         NUMBER,
+    NETO           NUMBER,
+    OPERACIONES    NUMBER        NOT NULL,
+    CONSTRAINT UQ_OPERACIONES_MES UNIQUE (MES, TIPO_OPERACION, ID_CLIENTE)
+);
+
+-- Carga inicial desde las operaciones existentes
+INSERT INTO OPERACIONES_MES (MES, TIPO_OPERACION, ID_CLIENTE, INGRESO, EGRESO, NETO, OPERACIONES)
+SELECT TRUNC(FECHA, 'MM'), TIPO_OPERACION, ID_CLIENTE,
+       SUM(INGRESO), SUM(EGRESO), SUM(INGRESO - NVL(EGRESO, 0)), COUNT(*)
+FROM OPERACIONES
+WHERE FECHA IS NOT NULL
+GROUP BY TRUNC(FECHA, 'MM'), TIPO_OPERACION, ID_CLIENTE;
+
+COMMIT;
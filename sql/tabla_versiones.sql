@@ -0,0 +1,33 @@
+-- Versión por tabla para validar cachés (versiones_tablas.py: ETag de
+-- cache_http.py y caché de consultas de cache_consultas.py).
+-- Un trigger por sentencia suma 1 a VERSION con cada INSERT/UPDATE/DELETE,
+-- venga de esta API, de otro worker o de otra aplicación; la aplicación la
+-- lee por clave primaria, sin recorrer la tabla versionada.
+-- El UPDATE del trigger bloquea la fila de la tabla hasta el COMMIT de quien
+-- escribe: las escrituras concurrentes sobre una misma tabla se esperan entre
+-- sí (las transacciones de la API son cortas).
+-- Las tablas sin fila aquí se sirven sin ETag.
+CREATE TABLE TABLA_VERSIONES (
+    TABLA   VARCHAR2(128) NOT NULL,
+    VERSION NUMBER        DEFAULT 0 NOT NULL,
+    CONSTRAINT PK_TABLA_VERSIONES PRIMARY KEY (TABLA)
+) ORGANIZATION INDEX;
+
+INSERT INTO TABLA_VERSIONES (TABLA)
+SELECT TABLE_NAME FROM USER_TABLES
+WHERE TABLE_NAME IN ('CLIENTES', 'DISPOSITIVOS', 'OPERACIONES', 'VENTAS', 'SERVICIOS',
+                     'MANTENIMIENTOS', 'MANTENIMIENTO_DISPOSITIVO',
+                     'ANTIVIRUS', 'MICROSOFT365', 'WINDOWS');
+
+COMMIT;
+
+BEGIN
+    FOR t IN (SELECT TABLA FROM TABLA_VERSIONES) LOOP
+        EXECUTE IMMEDIATE
+            'CREATE OR REPLACE TRIGGER TV_' || t.TABLA ||
+            ' AFTER INSERT OR UPDATE OR DELETE ON ' || t.TABLA ||
+            ' BEGIN UPDATE TABLA_VERSIONES SET VERSION = VERSION + 1' ||
+            ' WHERE TABLA = ''' || t.TABLA || '''; END;';
+    END LOOP;
+END;
+/
@@ -0,0 +1,72 @@
+# streaming.py
+# Respuestas JSON en stream para listados grandes: las filas se leen del cursor
+# por bloques (fetchmany) y se envían a medida que se serializan, sin armar la
+# lista completa en memoria. Se activa con ?stream=1 (array JSON en chunks) o
+# con Accept: application/x-ndjson (un objeto JSON por línea).
+from flask import Response, current_app, request, stream_with_context
+from serializacion import formato_respuesta
+
+STREAM_ARRAYSIZE = 500
+NDJSON = 'application/x-ndjson'
+
+
+def pide_ndjson():
+    # Solo si el cliente lo nombra explícitamente (no basta con */*)
+    return any(tipo == NDJSON for tipo, _ in request.accept_mimetypes)
+
+def quiere_stream():
+    return pide_ndjson() or bool(request.args.get('stream', default=0, type=int))
+
+def cursor_stream(conn):
+    """Cursor preparado para recorrerse por bloques de STREAM_ARRAYSIZE filas."""
+    cursor = conn.cursor()
+    cursor.arraysize = STREAM_ARRAYSIZE
+    cursor.prefetchrows = STREAM_ARRAYSIZE
+    return cursor
+
+def respuesta_en_stream(cursor, convertir=None, prefijo='', sufijo='', columnas=None):
+    """
+    Respuesta que recorre `cursor` (ya ejecutado) con fetchmany y envía cada
+    fila, o convertir(fila) si se indica, serializada con el proveedor JSON de
+    la app, igual que jsonify. Lo normal es haber aplicado antes
+    serializacion.filas_como_dict para que las filas ya lleguen como dicts.
+    En modo array, prefijo/sufijo envuelven la lista (p. ej. '{"data":' y
+    '}'); en NDJSON se omiten. Con ?format=columnar y `columnas`, el array
+    se envía como {"columns": [...], "rows": [[...], ...]}. El cursor se
+    cierra al terminar.
+    La conexión debe seguir abierta durante el stream: stream_with_context
+    mantiene el contexto (y g.db) hasta que se envía la última fila.
+    """
+    ndjson = pide_ndjson()
+    dumps = current_app.json.dumps
+    if convertir is None:
+        convertir = lambda fila: fila
+    if not ndjson and columnas is not None and formato_respuesta() == 'columnar':
+        prefijo, sufijo = '{"columns":' + dumps(columnas) + ',"rows":', '}'
+        a_dict = convertir
+        convertir = lambda fila: list(a_dict(fila).values())
+
+    def generar():
+        try:
+            if not ndjson:
+                yield prefijo + '['
+            primero = True
+            while True:
+                filas = cursor.fetchmany()
+                if not filas:
+                    break
+                if ndjson:
+                    yield ''.join(dumps(convertir(fila)) + '\n' for fila in filas)
+                else:
+                    bloque = ','.join(dumps(convertir(fila)) for fila in filas)
+                    yield bloque if primero else ',' + bloque
+                    primero = False
+            if not ndjson:
+                yield ']' + sufijo
+        except Exception as e:
+            # Los encabezados ya se enviaron: solo queda cortar la respuesta
+            current_app.logger.error(f"Error durante la respuesta en stream de {request.path}: {e}")
+        finally:
+            cursor.close()
+
+    return Response(stream_with_context(generar()), mimetype=NDJSON if ndjson else 'application/json')
@@ -0,0 +1,49 @@
+# versiones_tablas.py
+# Versión de cada tabla en la BD (tabla TABLA_VERSIONES, ver
+# sql/tabla_versiones.sql), compartida por todos los workers: la suben triggers
+# con cualquier escritura y se lee por clave primaria. Valida el ETag de
+# cache_http.py y las entradas de cache_consultas.py.
+import logging
+import threading
+import oracledb
+
+logger = logging.getLogger(__name__)
+
+ORA_TABLA_NO_EXISTE = 942
+
+_lock = threading.Lock()
+_disponible = None  # None: aún no comprobado
+
+
+def _codigo_error(e):
+    error = e.args[0] if e.args else None
+    return getattr(error, 'code', None)
+
+def versiones(cursor, tablas):
+    """
+    Tupla ordenada de (tabla, versión) de `tablas`, o None si alguna no tiene
+    fila en TABLA_VERSIONES o si la tabla no existe (se avisa una vez).
+    """
+    global _disponible
+    if _disponible is False:
+        return None
+    nombres = sorted({str(t).upper() for t in tablas})
+    marcadores = ", ".join(f":t{n}" for n in range(len(nombres)))
+    try:
+        cursor.execute(f"SELECT TABLA, VERSION FROM TABLA_VERSIONES WHERE TABLA IN ({marcadores})",
+                       {f"t{n}": t for n, t in enumerate(nombres)})
+        filas = cursor.fetchall()
+    except oracledb.DatabaseError as e:
+        if _codigo_error(e) != ORA_TABLA_NO_EXISTE:
+            raise
+        with _lock:
+            if _disponible is None:
+                logger.warning("TABLA_VERSIONES no existe (ver sql/tabla_versiones.sql); "
+                               "las respuestas se sirven sin ETag y las cachés de consultas "
+                               "se renuevan solo por tiempo.")
+            _disponible = False
+        return None
+    _disponible = True
+    if len(filas) != len(nombres):
+        return None
+    return tuple(sorted((tabla, int(version)) for tabla, version in filas))